@@ -0,0 +1,144 @@
+function toggleAll(checked) {
+  document.querySelectorAll("input.filecheck").forEach(cb => {
+    if (!cb.disabled) cb.checked = checked;
+  });
+  updateCount();
+}
+
+function updateCount() {
+  const n = document.querySelectorAll("input.filecheck:checked").length;
+  const el = document.getElementById("selCount");
+  if (el) el.textContent = n;
+}
+
+function getSelectedFiles() {
+  return Array.from(document.querySelectorAll("input.filecheck:checked"))
+    .map(cb => cb.value);
+}
+
+async function downloadSelected() {
+  const files = getSelectedFiles();
+  if (!files.length) {
+    alert("No files selected");
+    return;
+  }
+
+  const modeEl = document.getElementById("dlMode");
+  const mode = modeEl ? modeEl.value : "zip";
+
+  if (mode === "zip") {
+    const form = document.getElementById("selectForm");
+    if (form) form.submit();
+    return;
+  }
+
+  const token = new URLSearchParams(location.search).get("token") || "";
+  for (let i = 0; i < files.length; i++) {
+    const rel = files[i];
+    const url = `/download/${encodeURIComponent(rel)}?token=${encodeURIComponent(token)}`;
+
+    const a = document.createElement("a");
+    a.href = url;
+    a.download = "";
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+
+    await new Promise(r => setTimeout(r, 400));
+  }
+}
+
+// Prevent navigation when clicking checkbox sitting on top of a link/card
+document.addEventListener("click", (e) => {
+  const t = e.target;
+  if (t && t.classList && t.classList.contains("filecheck")) {
+    e.stopPropagation();
+    updateCount();
+  }
+}, true);
+
+document.addEventListener("change", (e) => {
+  const t = e.target;
+  if (t && t.classList && t.classList.contains("filecheck")) updateCount();
+});
+
+document.addEventListener("DOMContentLoaded", updateCount);
+
+// File view: prefetch the Prev/Next previews at the tier this screen's srcset will pick,
+// and tell the server that tier so it can render neighbours ahead of time.
+function prefetchNeighbours() {
+  const el = document.getElementById("neighbours");
+  if (!el) return;
+  const tiers = el.dataset.tiers.split(",").map(Number);
+  const want = window.innerWidth * (window.devicePixelRatio || 1);
+  const tier = tiers.find(t => t >= want) || tiers[tiers.length - 1];
+  document.cookie = `preview_w=${tier}; path=/; max-age=31536000; SameSite=Lax`;
+
+  for (const url of el.dataset.previews.split(" ").filter(Boolean)) {
+    const link = document.createElement("link");
+    link.rel = "prefetch";
+    link.as = "image";
+    link.href = url.replace("{w}", tier);
+    document.head.appendChild(link);
+  }
+}
+
+document.addEventListener("DOMContentLoaded", prefetchNeighbours);
+
+// Browse views: follow changes to the folder over /events and patch the entries in
+// place. Each delta lists removed entries and (re)rendered ones with the entry they go
+// before; inserting from the end keeps those anchors in place.
+function followFolder() {
+  const box = document.querySelector("[data-live]");
+  if (!box || !window.EventSource) return;
+  const byRel = rel => box.querySelector(`[data-rel="${CSS.escape(rel)}"]`);
+  const source = new EventSource(box.dataset.live);
+
+  source.addEventListener("delta", (e) => {
+    const delta = JSON.parse(e.data);
+    for (const rel of delta.removed) {
+      const el = byRel(rel);
+      if (el) el.remove();
+    }
+    for (const item of delta.upsert.slice().reverse()) {
+      const old = byRel(item.rel);
+      const checked = old && old.querySelector("input.filecheck:checked");
+      if (old) old.remove();
+      const tpl = document.createElement("template");
+      tpl.innerHTML = item.html.trim();
+      const el = tpl.content.firstElementChild;
+      if (checked) {
+        const cb = el.querySelector("input.filecheck");
+        if (cb) cb.checked = true;
+      }
+      const anchor = item.before && byRel(item.before);
+      box.insertBefore(el, anchor || null);
+    }
+    updateCount();
+  });
+  source.addEventListener("reload", () => {
+    source.close();
+    location.reload();
+  });
+}
+
+document.addEventListener("DOMContentLoaded", followFolder);
+
+// Optional service worker (SERVICE_WORKER=1, assets/sw.js): thumbnails and folder pages
+// cached on this device. Browsers only allow it over HTTPS or on localhost. Once it is
+// switched off, earlier registrations and their caches are removed.
+function setupServiceWorker() {
+  if (!("serviceWorker" in navigator)) return;
+  const meta = document.querySelector('meta[name="service-worker"]');
+  if (meta) {
+    navigator.serviceWorker.register(meta.content).catch(() => {});
+    return;
+  }
+  navigator.serviceWorker.getRegistrations().then(regs => {
+    if (!regs.length) return;
+    regs.forEach(r => r.unregister());
+    caches.keys().then(names => names.filter(n => n.startsWith("lfe-")).forEach(n => caches.delete(n)));
+  });
+}
+
+document.addEventListener("DOMContentLoaded", setupServiceWorker);
@@ -0,0 +1,111 @@
+// Service worker, served at /sw.js when SERVICE_WORKER=1 (registered by app.js).
+// Thumbnail and preview URLs carry a content version (v=, see content_version in
+// routes_browse.py), so a cached one stays valid until the file changes and its URL with
+// it: those are answered from the device without asking the server. Folder pages are
+// served stale-while-revalidate: the cached copy renders at once while a conditional
+// request refreshes it, which costs a 304 when nothing changed (the live stream then
+// reports what did).
+const THUMB_LIMIT = Number(new URL(self.location).searchParams.get("thumbs")) || 2000;
+const PAGE_LIMIT = 200;
+const THUMBS = "lfe-thumbs-v1";
+const PAGES = "lfe-pages-v1";
+const TRIM_EVERY = 50; // puts between trims, so the bound is approximate
+
+const refreshing = new Map(); // page URL -> revalidation in flight
+const putsSinceTrim = {[THUMBS]: 0, [PAGES]: 0};
+
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", (e) => {
+  e.waitUntil((async () => {
+    for (const name of await caches.keys()) {
+      if (name.startsWith("lfe-") && name !== THUMBS && name !== PAGES) await caches.delete(name);
+    }
+    await trim(THUMBS, THUMB_LIMIT);
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener("fetch", (e) => {
+  const req = e.request;
+  if (req.method !== "GET") return;
+  const url = new URL(req.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (/^\/(thumb|vthumb|preview)\//.test(url.pathname) && url.searchParams.has("v")) {
+    e.respondWith(cacheFirst(e));
+  } else if (req.mode === "navigate" && (url.pathname === "/" || url.pathname.startsWith("/browse/"))) {
+    e.respondWith(staleWhileRevalidate(e));
+  }
+});
+
+// Oldest entries first: Cache.keys() lists them in insertion order.
+async function trim(name, limit) {
+  const cache = await caches.open(name);
+  const keys = await cache.keys();
+  for (const key of keys.slice(0, Math.max(0, keys.length - limit))) await cache.delete(key);
+}
+
+async function put(name, limit, key, res) {
+  const cache = await caches.open(name);
+  await cache.put(key, res);
+  if (++putsSinceTrim[name] >= TRIM_EVERY) {
+    putsSinceTrim[name] = 0;
+    await trim(name, limit);
+  }
+}
+
+async function cacheFirst(e) {
+  const hit = await caches.match(e.request, {cacheName: THUMBS});
+  if (hit) return hit;
+  const res = await fetch(e.request);
+  const type = res.headers.get("Content-Type") || "";
+  // placeholders (SVG) and errors are not kept: the thumbnail may work next time
+  if (res.status === 200 && type.startsWith("image/") && !type.startsWith("image/svg")) {
+    e.waitUntil(put(THUMBS, THUMB_LIMIT, e.request, res.clone()));
+  }
+  return res;
+}
+
+async function revalidate(url, cached) {
+  const headers = {};
+  const etag = cached && cached.headers.get("ETag");
+  if (etag) headers["If-None-Match"] = etag;
+  const res = await fetch(url, {headers, credentials: "same-origin"});
+  if (res.status === 304) return null;
+  const type = res.headers.get("Content-Type") || "";
+  if (res.status === 200 && !res.redirected && type.startsWith("text/html")) {
+    await put(PAGES, PAGE_LIMIT, url, res.clone());
+  } else {
+    // gone, or the token in the URL no longer works: never show it from the cache again
+    const cache = await caches.open(PAGES);
+    await cache.delete(url);
+  }
+  return res;
+}
+
+async function staleWhileRevalidate(e) {
+  const url = e.request.url;
+  const cached = await caches.match(url, {cacheName: PAGES});
+  const inFlight = refreshing.get(url);
+  if (inFlight) {
+    // asked again while the copy just shown is being refreshed, typically because the
+    // live stream found it stale and the page reloaded: wait for the fresh copy
+    try {
+      await inFlight;
+    } catch (err) {
+      // offline: fall through to the cached copy
+    }
+    return (await caches.match(url, {cacheName: PAGES})) || fetch(e.request);
+  }
+
+  const refresh = revalidate(url, cached);
+  refreshing.set(url, refresh);
+  const done = refresh.catch(() => null).finally(() => refreshing.delete(url));
+  if (!cached) {
+    const res = await refresh;
+    return res && !res.redirected ? res : fetch(e.request);
+  }
+  e.waitUntil(done);
+  return cached;
+}
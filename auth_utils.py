@@ -2,7 +2,9 @@ from pathlib import Path
 
 from flask import abort, request
 
+import stat_cache
 from config import ACCESS_TOKEN, root_path
+from tracing import span
 
 
 def require_token() -> None:
@@ -13,7 +15,8 @@ def require_token() -> None:
 
 def safe_resolve(rel: str) -> Path:
     rel = rel.lstrip("/").replace("\\", "/")
-    target = (root_path / rel).resolve()
+    with span("resolve"):
+        target = stat_cache.resolve(root_path / rel)
     if root_path not in target.parents and target != root_path:
         abort(403, "Forbidden: path outside shared root")
     return target
@@ -0,0 +1,282 @@
+"""
+Concurrent load test with tail-latency regression gates.
+
+Starts the app in a subprocess on a synthetic tree (or targets --url), then drives a
+weighted mix of browse, thumbnail, ranged /raw and /download-zip traffic from
+--concurrency threads and reports p50/p95/p99 and throughput per route.
+
+    python -m bench.load --duration 30 --save-baseline load_baseline.json
+    python -m bench.load --duration 30 --baseline load_baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from bench.synth_tree import generate_tree
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = "browse=4,thumb=20,raw=3,zip=1"
+THUMB_SIZES = (256, 160, 96, 64)
+
+
+def percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    # nearest-rank
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(pct / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(root: Path, workdir: Path, token: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ, ROOT_DIR=str(root), ACCESS_TOKEN=token, HOST="127.0.0.1", PORT=str(port))
+    env.setdefault("INDEX_DIR", str(workdir / ".index"))
+    proc = subprocess.Popen(
+        [sys.executable, str(REPO_DIR / "localFileExplorerApp.py")],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start listening within 60s")
+
+
+class LoadRunner:
+    def __init__(self, base_url: str, token: str, root: Path, mix: Dict[str, int], zip_size: int, seed: int):
+        self.base = base_url.rstrip("/")
+        self.token = token
+        self.mix = mix
+        self.zip_size = zip_size
+        self.seed = seed
+        files = [p for p in root.rglob("*") if p.is_file()]
+        self.rels = [str(p.relative_to(root)).replace("\\", "/") for p in files]
+        self.images = [r for r in self.rels if r.rsplit("/", 1)[-1].startswith("IMG_")]
+        self.videos = [r for r in self.rels if r.rsplit("/", 1)[-1].startswith("VID_")]
+        self.folders = sorted({r.rpartition("/")[0] for r in self.rels})
+        self.large = sorted(files, key=lambda p: p.stat().st_size, reverse=True)[:20]
+        self.large_rels = [str(p.relative_to(root)).replace("\\", "/") for p in self.large]
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {r: [] for r in mix}
+        self.errors: Dict[str, int] = {r: 0 for r in mix}
+        self.bytes: Dict[str, int] = {r: 0 for r in mix}
+
+    def _url(self, path: str, **params) -> str:
+        q = urllib.parse.urlencode(dict(token=self.token, **params))
+        return f"{self.base}{urllib.parse.quote(path)}?{q}"
+
+    def _request(self, rng: random.Random, route: str) -> urllib.request.Request:
+        if route == "browse":
+            folder = rng.choice(self.folders)
+            path = f"/browse/{folder}" if folder else "/"
+            return urllib.request.Request(self._url(path, view=rng.choice((2, 5, 6))))
+        if route == "thumb":
+            if self.videos and rng.random() < 0.2:
+                return urllib.request.Request(self._url(f"/vthumb/{rng.choice(self.videos)}", s=160))
+            return urllib.request.Request(
+                self._url(f"/thumb/{rng.choice(self.images)}", s=rng.choice(THUMB_SIZES))
+            )
+        if route == "raw":
+            start = rng.randint(0, 64 * 1024)
+            req = urllib.request.Request(self._url(f"/raw/{rng.choice(self.large_rels)}"))
+            req.add_header("Range", f"bytes={start}-{start + 256 * 1024 - 1}")
+            return req
+        if route == "zip":
+            picks = rng.sample(self.rels, min(self.zip_size, len(self.rels)))
+            body = urllib.parse.urlencode([("files", r) for r in picks]).encode()
+            return urllib.request.Request(self._url("/download-zip"), data=body, method="POST")
+        raise ValueError(route)
+
+    def _worker(self, idx: int, deadline: float) -> None:
+        rng = random.Random(self.seed + idx)
+        routes = list(self.mix)
+        weights = [self.mix[r] for r in routes]
+        while time.monotonic() < deadline:
+            route = rng.choices(routes, weights)[0]
+            req = self._request(rng, route)
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=120) as resp:
+                    n = 0
+                    while True:
+                        chunk = resp.read(256 * 1024)
+                        if not chunk:
+                            break
+                        n += len(chunk)
+                ok = True
+            except (urllib.error.URLError, OSError):
+                ok, n = False, 0
+            dt = time.perf_counter() - t0
+            with self.lock:
+                if ok:
+                    self.samples[route].append(dt)
+                    self.bytes[route] += n
+                else:
+                    self.errors[route] += 1
+
+    def run(self, concurrency: int, duration: float) -> Dict[str, dict]:
+        deadline = time.monotonic() + duration
+        threads = [threading.Thread(target=self._worker, args=(i, deadline)) for i in range(concurrency)]
+        t0 = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - t0
+
+        report = {}
+        for route, vals in self.samples.items():
+            vals.sort()
+            report[route] = {
+                "requests": len(vals),
+                "errors": self.errors[route],
+                "rps": round(len(vals) / elapsed, 2),
+                "mb_per_s": round(self.bytes[route] / elapsed / 1e6, 2),
+                "p50": percentile(vals, 50),
+                "p95": percentile(vals, 95),
+                "p99": percentile(vals, 99),
+            }
+        return report
+
+
+def _error_rate(r: dict) -> float:
+    attempts = r["requests"] + r["errors"]
+    return r["errors"] / attempts if attempts else 0.0
+
+
+def check_baseline(report: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Returns a message per baseline route that regressed: no successful requests, more
+    errors (count or rate) than baseline * (1 + tolerance), or p95/p99 past that limit.
+    Failed requests are not in the latency samples, so a route that fails fast would
+    otherwise pass and even look faster.
+    """
+    failures = []
+    for route, base in baseline.items():
+        cur = report.get(route)
+        if not cur or not cur["requests"]:
+            errors = cur["errors"] if cur else 0
+            failures.append(f"{route}: no successful requests ({errors} errors)")
+            continue
+        base_errors = base.get("errors", 0)
+        if cur["errors"] > base_errors * (1 + tolerance):
+            failures.append(f"{route} errors: {cur['errors']} > {base_errors * (1 + tolerance):.0f} allowed")
+        elif _error_rate(cur) > _error_rate(base) * (1 + tolerance):
+            failures.append(
+                f"{route} error rate: {_error_rate(cur):.1%} > {_error_rate(base) * (1 + tolerance):.1%} allowed"
+            )
+        for q in ("p95", "p99"):
+            limit = base[q] * (1 + tolerance)
+            if cur[q] > limit:
+                failures.append(f"{route} {q}: {cur[q] * 1000:.1f} ms > {limit * 1000:.1f} ms allowed")
+    return failures
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip():
+            mix[name.strip()] = int(weight or 1)
+    unknown = set(mix) - {"browse", "thumb", "raw", "zip"}
+    if unknown:
+        raise SystemExit(f"unknown routes in --mix: {', '.join(sorted(unknown))}")
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Local File Explorer load test")
+    ap.add_argument("--url", help="target an already running server instead of starting one")
+    ap.add_argument("--root", type=Path, help="ROOT_DIR of the target (default: synthetic tree)")
+    ap.add_argument("--token", default="load-token")
+    ap.add_argument("--files", type=int, default=400)
+    ap.add_argument("--videos", type=int, default=4)
+    ap.add_argument("--image-size", default="2400x1600")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"route weights (default {DEFAULT_MIX})")
+    ap.add_argument("--zip-size", type=int, default=40, help="files per /download-zip request")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", type=Path, help="write the report JSON here")
+    ap.add_argument("--baseline", type=Path, help="fail if errors or p95/p99 regress past this report")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over baseline")
+    ap.add_argument("--save-baseline", type=Path, help="store this run as the new baseline")
+    args = ap.parse_args()
+
+    workdir: Optional[Path] = None
+    proc = None
+    root = args.root
+    try:
+        if root is None:
+            workdir = Path(tempfile.mkdtemp(prefix="lfe_load_"))
+            root = workdir / "root"
+            w, h = (int(x) for x in args.image_size.lower().split("x"))
+            print("generating tree:", generate_tree(root, files=args.files, image_size=(w, h), videos=args.videos))
+        if args.url:
+            base = args.url
+        else:
+            workdir = workdir or Path(tempfile.mkdtemp(prefix="lfe_load_"))
+            proc, base = start_server(root, workdir, args.token)
+
+        runner = LoadRunner(base, args.token, root, parse_mix(args.mix), args.zip_size, args.seed)
+        print(f"driving {base} with {args.concurrency} clients for {args.duration:.0f}s: {runner.mix}")
+        report = runner.run(args.concurrency, args.duration)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'route':8} {'reqs':>7} {'err':>5} {'req/s':>8} {'MB/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, r in report.items():
+        print(
+            f"{route:8} {r['requests']:7d} {r['errors']:5d} {r['rps']:8.1f} {r['mb_per_s']:7.2f} "
+            f"{r['p50'] * 1000:9.1f} {r['p95'] * 1000:9.1f} {r['p99'] * 1000:9.1f}"
+        )
+
+    doc = {"params": {k: str(v) for k, v in vars(args).items()}, "routes": report}
+    if args.out:
+        args.out.write_text(json.dumps(doc, indent=2))
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(doc, indent=2))
+        print(f"baseline saved to {args.save_baseline}")
+    if args.baseline:
+        failures = check_baseline(report, json.loads(args.baseline.read_text())["routes"], args.tolerance)
+        for f in failures:
+            print("REGRESSION:", f)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
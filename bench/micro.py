@@ -0,0 +1,286 @@
+"""
+Offline micro-benchmarks for the hot paths, driven through the Flask test client.
+
+    python -m bench.micro --out bench_results.json
+    python -m bench.micro --out new.json --compare bench_results.json --max-regression 0.15
+
+Everything runs inside a temporary work dir (synthetic ROOT_DIR, thumbnail cache and
+indexes), so the real cache and .env settings are not touched.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from bench.load import start_server
+from bench.synth_tree import generate_tree
+
+TOKEN = "bench-token"
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def _stats(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    return {
+        "n": len(s),
+        "min": s[0],
+        "median": statistics.median(s),
+        "mean": statistics.fmean(s) if hasattr(statistics, "fmean") else statistics.mean(s),
+        "p95": s[min(len(s) - 1, int(round(0.95 * (len(s) - 1))))],
+        "max": s[-1],
+    }
+
+
+def _timeit(fn: Callable[[], None], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _stats(samples)
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        return out.stdout.decode().strip() or None
+    except OSError:
+        return None
+
+
+def _load_app(workdir: Path, root: Path):
+    """
+    config.py reads the environment and resolves cache paths at import time,
+    so the environment and cwd must be set before the app modules are imported.
+    """
+    os.environ["ROOT_DIR"] = str(root)
+    os.environ["ACCESS_TOKEN"] = TOKEN
+    os.environ["INDEX_DIR"] = str(workdir / ".index")
+    os.chdir(workdir)
+    if str(REPO_DIR) not in sys.path:
+        sys.path.insert(0, str(REPO_DIR))
+
+    import routes_browse  # noqa: F401  (registers routes)
+    import routes_download  # noqa: F401
+    import routes_thumbs  # noqa: F401
+    import compression  # noqa: F401
+    from config import app
+
+    return app
+
+
+def _check(resp, name: str) -> None:
+    if resp.status_code >= 400:
+        raise RuntimeError(f"{name}: HTTP {resp.status_code}")
+
+
+def run_benchmarks(args) -> Dict[str, Dict[str, float]]:
+    workdir = Path(tempfile.mkdtemp(prefix="lfe_bench_"))
+    root = workdir / "root"
+    w, h = (int(x) for x in args.image_size.lower().split("x"))
+
+    t0 = time.perf_counter()
+    counts = generate_tree(
+        root,
+        files=args.files,
+        depth=args.depth,
+        fanout=args.fanout,
+        image_size=(w, h),
+        videos=args.videos,
+    )
+    flat = root / "flat"
+    flat.mkdir()
+    for i in range(args.flat):
+        (flat / f"entry_{i:06d}.jpg").write_bytes(b"")
+    print(f"tree: {counts}, flat folder: {args.flat} entries ({time.perf_counter() - t0:.1f}s)")
+
+    app = _load_app(workdir, root)
+    import dir_cache
+    from config import THUMB_CACHE_DIR
+    from thumb_cache import cleanup_thumb_cache_age, enforce_thumb_cache_size_limit, ensure_thumb_cache_dir
+
+    client = app.test_client()
+    results: Dict[str, Dict[str, float]] = {}
+
+    images = sorted(p for p in root.rglob("IMG_*") if p.is_file())[: args.thumbs]
+    videos = sorted(p for p in root.rglob("VID_*") if p.is_file())[: args.thumbs]
+
+    def rel(p: Path) -> str:
+        return str(p.relative_to(root)).replace("\\", "/")
+
+    # listing: cold (listing cache dropped) and warm, details and icon views
+    for view in (6, 2):
+        url = f"/browse/flat?token={TOKEN}&view={view}"
+
+        def cold() -> None:
+            dir_cache.invalidate_tree(root)
+            _check(client.get(url), "browse")
+
+        results[f"browse_flat_view{view}_cold"] = _timeit(cold, args.repeat)
+        results[f"browse_flat_view{view}_warm"] = _timeit(lambda: _check(client.get(url), "browse"), args.repeat)
+    results["browse_root_view6"] = _timeit(lambda: _check(client.get(f"/?token={TOKEN}"), "browse"), args.repeat)
+
+    if images:
+        file_url = f"/browse/{rel(images[0])}?token={TOKEN}"
+        results["file_view"] = _timeit(lambda: _check(client.get(file_url), "file_view"), args.repeat)
+
+    # thumbnails: first request per file (cold) then the same requests again (warm)
+    for kind, files in (("thumb", images), ("vthumb", videos)):
+        if not files:
+            continue
+        shutil.rmtree(THUMB_CACHE_DIR, ignore_errors=True)
+        ensure_thumb_cache_dir()
+        for phase in ("cold", "warm"):
+            samples = []
+            for p in files:
+                t = time.perf_counter()
+                _check(client.get(f"/{kind}/{rel(p)}?token={TOKEN}&s=160"), kind)
+                samples.append(time.perf_counter() - t)
+            results[f"{kind}_{phase}"] = _stats(samples)
+
+    # cache maintenance over a synthetic cache of args.cache_files entries
+    def fill_cache() -> None:
+        shutil.rmtree(THUMB_CACHE_DIR, ignore_errors=True)
+        ensure_thumb_cache_dir()
+        now = time.time()
+        blob = os.urandom(8 * 1024)
+        for i in range(args.cache_files):
+            f = THUMB_CACHE_DIR / f"{i:064x}.jpg"
+            f.write_bytes(blob)
+            age = (i % 48) * 3600
+            os.utime(f, (now - age, now - age))
+
+    def timed_after_fill(fn: Callable[[], None]) -> Dict[str, float]:
+        samples = []
+        for _ in range(max(1, args.repeat // 5)):
+            fill_cache()
+            t = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t)
+        return _stats(samples)
+
+    cache_mb = max(1, args.cache_files * 8 // 1024 // 2)  # forces evicting about half
+    results["cache_enforce_size_limit"] = timed_after_fill(lambda: enforce_thumb_cache_size_limit(max_mb=cache_mb))
+    results["cache_cleanup_age"] = timed_after_fill(lambda: cleanup_thumb_cache_age(max_age_days=1))
+
+    # startup: time until the port accepts connections, and until /readyz says ready,
+    # with the cache still holding args.cache_files entries
+    if args.startup_runs:
+        fill_cache()
+        listen, ready = [], []
+        for _ in range(args.startup_runs):
+            t = time.perf_counter()
+            proc, base = start_server(root, workdir, TOKEN)
+            listen.append(time.perf_counter() - t)
+            try:
+                while True:
+                    try:
+                        with urllib.request.urlopen(f"{base}/readyz", timeout=5):
+                            break
+                    except urllib.error.HTTPError:
+                        time.sleep(0.01)
+                ready.append(time.perf_counter() - t)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+        results["startup_listening"] = _stats(listen)
+        results["startup_ready"] = _stats(ready)
+
+    # ZIP building
+    zip_files = sorted(p for p in root.rglob("*") if p.is_file() and p.parent != flat)[: args.zip_files]
+    if zip_files:
+        form = {"files": [rel(p) for p in zip_files]}
+        results["download_zip"] = _timeit(
+            lambda: _check(client.post(f"/download-zip?token={TOKEN}", data=form), "download_zip"),
+            max(1, args.repeat // 5),
+        )
+
+    if not args.keep:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        print(f"work dir kept: {workdir}")
+    return results
+
+
+def compare(new: Dict[str, dict], old: Dict[str, dict], max_regression: Optional[float]) -> int:
+    """
+    Prints median ratios new/old; returns the number of benchmarks that regressed
+    by more than max_regression (a fraction, e.g. 0.15 for +15%).
+    """
+    failures = 0
+    print(f"{'benchmark':40} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for name in sorted(set(new) & set(old)):
+        o, n = old[name]["median"], new[name]["median"]
+        ratio = n / o if o else float("inf")
+        flag = ""
+        if max_regression is not None and ratio > 1 + max_regression:
+            flag = "  REGRESSION"
+            failures += 1
+        print(f"{name:40} {o * 1000:10.2f} {n * 1000:10.2f} {ratio:7.2f}{flag}")
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Local File Explorer micro-benchmarks")
+    ap.add_argument("--files", type=int, default=300, help="files in the synthetic tree")
+    ap.add_argument("--depth", type=int, default=2)
+    ap.add_argument("--fanout", type=int, default=3)
+    ap.add_argument("--image-size", default="1600x1200", help="WIDTHxHEIGHT of generated images")
+    ap.add_argument("--videos", type=int, default=4, help="clips to generate (needs ffmpeg)")
+    ap.add_argument("--flat", type=int, default=5000, help="entries in the large flat folder")
+    ap.add_argument("--thumbs", type=int, default=50, help="images/videos used by thumbnail benchmarks")
+    ap.add_argument("--cache-files", type=int, default=5000, help="entries in the maintenance benchmark cache")
+    ap.add_argument("--zip-files", type=int, default=100)
+    ap.add_argument("--startup-runs", type=int, default=3, help="server launches timed (0 to skip)")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out", type=Path, help="write results JSON here")
+    ap.add_argument("--compare", type=Path, help="earlier results JSON to compare against")
+    ap.add_argument("--max-regression", type=float, help="fail if a median grows by more than this fraction")
+    ap.add_argument("--keep", action="store_true", help="keep the temporary work dir")
+    args = ap.parse_args()
+
+    results = run_benchmarks(args)
+    doc = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        },
+        "results": results,
+    }
+
+    for name, r in sorted(results.items()):
+        print(f"{name:40} median {r['median'] * 1000:9.2f} ms   p95 {r['p95'] * 1000:9.2f} ms   n={r['n']}")
+
+    if args.out:
+        args.out.write_text(json.dumps(doc, indent=2))
+        print(f"results written to {args.out}")
+
+    if args.compare:
+        old = json.loads(args.compare.read_text())["results"]
+        if compare(results, old, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Deterministic synthetic media tree for the benchmarks.
+
+    python -m bench.synth_tree /tmp/bench_root --files 2000 --depth 3 --fanout 4
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+IMAGE_EXTS = (".jpg", ".png")
+OTHER_EXTS = (".txt", ".pdf", ".bin")
+
+
+def _folders(root: Path, depth: int, fanout: int) -> List[Path]:
+    folders = [root]
+    level = [root]
+    for d in range(depth):
+        nxt = []
+        for parent in level:
+            for i in range(fanout):
+                nxt.append(parent / f"dir_{d}_{i}")
+        folders.extend(nxt)
+        level = nxt
+    return folders
+
+
+def _make_image(path: Path, size: Tuple[int, int], rng: random.Random) -> None:
+    from PIL import Image
+
+    w, h = size
+    # A small noisy tile scaled up: compresses like a photo rather than a flat colour
+    tile = Image.frombytes("RGB", (32, 32), bytes(rng.getrandbits(8) for _ in range(32 * 32 * 3)))
+    im = tile.resize((w, h), Image.BILINEAR)
+    if path.suffix == ".png":
+        im.save(path, format="PNG")
+    else:
+        im.save(path, format="JPEG", quality=85)
+
+
+def _make_video(path: Path, ffmpeg: str, seconds: int) -> bool:
+    cmd = [
+        ffmpeg,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        f"testsrc=duration={seconds}:size=640x360:rate=24",
+        "-pix_fmt",
+        "yuv420p",
+        str(path),
+    ]
+    try:
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+    except OSError:
+        return False
+
+
+def find_ffmpeg() -> Optional[str]:
+    return os.getenv("FFMPEG_BIN") or shutil.which("ffmpeg")
+
+
+def generate_tree(
+    root: Path,
+    files: int = 1000,
+    depth: int = 2,
+    fanout: int = 4,
+    image_ratio: float = 0.6,
+    image_size: Tuple[int, int] = (1600, 1200),
+    videos: int = 0,
+    seed: int = 1234,
+) -> Dict[str, int]:
+    """
+    Creates `files` files spread evenly over a depth/fanout folder tree below root.
+    image_ratio of them are real JPEG/PNG images of image_size; the rest are small
+    opaque files. `videos` short clips are added with local ffmpeg when it is available.
+    Returns counts of what was written.
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    folders = _folders(root, depth, fanout)
+    for f in folders:
+        f.mkdir(parents=True, exist_ok=True)
+
+    counts = {"folders": len(folders), "images": 0, "other": 0, "videos": 0}
+    for i in range(files):
+        folder = folders[i % len(folders)]
+        if rng.random() < image_ratio:
+            path = folder / f"IMG_{i:06d}{rng.choice(IMAGE_EXTS)}"
+            _make_image(path, image_size, rng)
+            counts["images"] += 1
+        else:
+            path = folder / f"file_{i:06d}{rng.choice(OTHER_EXTS)}"
+            path.write_bytes(os.urandom(rng.randint(1_000, 200_000)))
+            counts["other"] += 1
+
+    ffmpeg = find_ffmpeg() if videos else None
+    for i in range(videos if ffmpeg else 0):
+        if _make_video(folders[i % len(folders)] / f"VID_{i:04d}.mp4", ffmpeg, seconds=4):
+            counts["videos"] += 1
+    return counts
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Generate a synthetic media tree.")
+    ap.add_argument("root", type=Path)
+    ap.add_argument("--files", type=int, default=1000)
+    ap.add_argument("--depth", type=int, default=2)
+    ap.add_argument("--fanout", type=int, default=4)
+    ap.add_argument("--image-ratio", type=float, default=0.6)
+    ap.add_argument("--image-size", default="1600x1200", help="WIDTHxHEIGHT")
+    ap.add_argument("--videos", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    w, h = (int(x) for x in args.image_size.lower().split("x"))
+    counts = generate_tree(
+        args.root,
+        files=args.files,
+        depth=args.depth,
+        fanout=args.fanout,
+        image_ratio=args.image_ratio,
+        image_size=(w, h),
+        videos=args.videos,
+        seed=args.seed,
+    )
+    print(counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import gzip
+import zlib
+from typing import Iterable, Iterator
+
+from flask import request
+
+from config import COMPRESS_LEVEL, COMPRESS_MIN_BYTES, app
+from static_assets import brotli
+
+# Negotiated gzip/brotli for generated HTML/JSON. Media routes are skipped: their
+# bodies are already compressed (JPEG, video, ZIP) and are streamed from disk.
+COMPRESS_MIMETYPES = {"text/html", "application/json", "text/plain"}
+SKIP_ENDPOINTS = {"thumb", "vthumb", "preview", "raw", "download", "download_zip", "asset", "service_worker"}
+
+# Same 1-9 scale for brotli: its top qualities (10-11) are too slow per response
+BROTLI_QUALITY = COMPRESS_LEVEL
+
+
+def _pick_encoding() -> str:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return ""
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def _encoded(chunks: Iterable) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+def _compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    try:
+        if encoding == "br":
+            comp = brotli.Compressor(quality=BROTLI_QUALITY)
+            for chunk in _encoded(chunks):
+                out = comp.process(chunk) + comp.flush()
+                if out:
+                    yield out
+            yield comp.finish()
+        else:
+            comp = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+            for chunk in _encoded(chunks):
+                # sync flush keeps streamed pages rendering progressively
+                out = comp.compress(chunk) + comp.flush(zlib.Z_SYNC_FLUSH)
+                if out:
+                    yield out
+            yield comp.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+@app.after_request
+def compress_response(response):
+    if (
+        request.endpoint in SKIP_ENDPOINTS
+        or response.direct_passthrough
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _pick_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(_compress(data, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+    if response.get_etag()[0]:
+        # the compressed body is a different representation of the same resource
+        etag, _weak = response.get_etag()
+        response.set_etag(etag, weak=True)
+    return response
@@ -13,30 +13,15 @@ load_dotenv()
 FFMPEG_BIN = r"C:\ffmpeg\bin\ffmpeg.exe"
 FFPROBE_BIN = r"C:\ffmpeg\bin\ffprobe.exe"
 
-# ----------------------------
-# OPTIONAL: HEIC/HEIF SUPPORT
-# ----------------------------
-HEIF_OK = False
-try:
-    from PIL import Image
-
-    try:
-        import pillow_heif  # noqa: F401
-
-        pillow_heif.register_heif_opener()
-        HEIF_OK = True
-    except Exception:
-        HEIF_OK = False
-except Exception:
-    Image = None  # type: ignore[assignment]
-    HEIF_OK = False
-
 # ----------------------------
 # CONFIG (from environment, with defaults)
 # ----------------------------
 FFMPEG_BIN = os.getenv("FFMPEG_BIN")
 FFPROBE_BIN = os.getenv("FFPROBE_BIN")
 
+# Seconds before an ffprobe run is killed (truncated files, stalled network mounts)
+FFPROBE_TIMEOUT = float(os.getenv("FFPROBE_TIMEOUT", "30"))
+
 ROOT_DIR = os.getenv("ROOT_DIR")  # folder to share
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
@@ -45,6 +30,69 @@ ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")  # set a strong token
 # Thumbnail cache folder (on disk)
 THUMB_CACHE_DIR = Path(".thumb_cache").resolve()
 
+# Thumbnail cache maintenance: runs in the background, at most BUDGET seconds per slice
+THUMB_CACHE_MAX_AGE_DAYS = int(os.getenv("THUMB_CACHE_MAX_AGE_DAYS", "1"))
+THUMB_CACHE_MAX_MB = int(os.getenv("THUMB_CACHE_MAX_MB", "500"))
+THUMB_MAINTENANCE_INTERVAL = int(os.getenv("THUMB_MAINTENANCE_INTERVAL", "600"))
+THUMB_MAINTENANCE_BUDGET = float(os.getenv("THUMB_MAINTENANCE_BUDGET", "0.5"))
+
+# Seconds a failed thumbnail is answered with the placeholder before it is retried
+# (see thumb_failures.py); edited files are retried at once
+THUMB_FAILURE_TTL = int(os.getenv("THUMB_FAILURE_TTL", "21600"))
+
+# Thumbnail generation threads shared by all requests (see thumb_queue.py), and the
+# processes doing their Pillow work (see image_pool.py; 0 = decode in-process)
+THUMB_WORKERS = max(1, int(os.getenv("THUMB_WORKERS", str(os.cpu_count() or 1))))
+IMAGE_WORKERS = max(0, int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1))))
+
+# Shared resolve()/stat() cache lifetime in seconds (see stat_cache.py)
+STAT_CACHE_TTL = float(os.getenv("STAT_CACHE_TTL", "2"))
+
+# Persistent indexes (SQLite) built by background walkers
+INDEX_DIR = Path(os.getenv("INDEX_DIR", ".index")).resolve()
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "8"))
+SEARCH_REFRESH_SECONDS = int(os.getenv("SEARCH_REFRESH_SECONDS", "300"))
+
+# Filesystem watcher for cache invalidation: off / auto / inotify / poll
+FS_WATCH = os.getenv("FS_WATCH", "off").lower()
+FS_WATCH_POLL_SECONDS = int(os.getenv("FS_WATCH_POLL_SECONDS", "30"))
+
+# Live folder updates in open browse pages (see routes_events.py); without the watcher
+# the folder is re-checked every LIVE_POLL_SECONDS
+LIVE_UPDATES = os.getenv("LIVE_UPDATES", "1") == "1"
+LIVE_POLL_SECONDS = max(1.0, float(os.getenv("LIVE_POLL_SECONDS", "5")))
+
+# Optional service worker (assets/sw.js): keeps up to SW_THUMB_CACHE_ITEMS thumbnails on
+# each device and serves folder pages from there while revalidating them
+SERVICE_WORKER = os.getenv("SERVICE_WORKER", "0") == "1"
+SW_THUMB_CACHE_ITEMS = max(100, int(os.getenv("SW_THUMB_CACHE_ITEMS", "2000")))
+
+# Response compression for generated HTML/JSON (see compression.py)
+COMPRESS_LEVEL = max(1, min(9, int(os.getenv("COMPRESS_LEVEL", "6"))))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Bandwidth caps for downloads/ZIPs/raw files in MB/s, 0 = unlimited (see transfer_scheduler.py)
+RATE_LIMIT_GLOBAL_MBPS = float(os.getenv("RATE_LIMIT_GLOBAL_MBPS", "0"))
+RATE_LIMIT_CLIENT_MBPS = float(os.getenv("RATE_LIMIT_CLIENT_MBPS", "0"))
+RATE_LIMIT_MIN_BYTES = int(os.getenv("RATE_LIMIT_MIN_BYTES", str(1024 * 1024)))  # smaller bodies are never delayed
+RATE_LIMIT_BURST_BYTES = int(os.getenv("RATE_LIMIT_BURST_BYTES", str(512 * 1024)))
+
+# Opt-in request tracing (see tracing.py): requests slower than TRACE_SLOW_MS (0 = off)
+# are logged with their phase breakdown as JSON lines to TRACE_SLOW_LOG (default: stdout);
+# with TRACE_DIR set they are also saved as Chrome trace-event files
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "0"))
+TRACE_SLOW_LOG = os.getenv("TRACE_SLOW_LOG", "")
+TRACE_DIR = Path(os.environ["TRACE_DIR"]).resolve() if os.getenv("TRACE_DIR") else None
+TRACE_MAX_FILES = int(os.getenv("TRACE_MAX_FILES", "200"))
+
+# Opt-in request profiling (see profiling.py)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests, 0..1
+PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER", "0") == "1"  # honour "X-Profile: 1"
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile").lower()  # cprofile / sample
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", ".profiles")).resolve()
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
 # Media extensions
 MEDIA_EXTS_IMG = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".heic", ".heif"}
 MEDIA_EXTS_VID = {".mp4", ".webm", ".ogg", ".mov", ".m4v", ".mkv", ".avi"}  # browser support varies
@@ -0,0 +1,36 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+_local = threading.local()
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """
+    Returns a per-thread SQLite connection for db_path.
+    WAL mode lets the background walkers write while request threads read.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    conn = conns.get(db_path)
+    if conn is None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conns[db_path] = conn
+    return conn
+
+
+def child_rel(parent: str, name: str) -> str:
+    return f"{parent}/{name}" if parent else name
+
+
+def subtree_clause(column: str, sep: str = "/") -> str:
+    """
+    SQL condition matching a path and everything below it (binds the path three times).
+    Avoids LIKE so '%' and '_' in folder names need no escaping.
+    """
+    return f"({column} = ? OR substr({column}, 1, length(?) + 1) = ? || '{sep}')"
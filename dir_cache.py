@@ -0,0 +1,109 @@
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from media_utils import is_media
+
+
+class ListingEntry(NamedTuple):
+    name: str
+    is_dir: bool
+    size: int
+    mtime_ns: int
+
+
+class _Listing(NamedTuple):
+    mtime_ns: int
+    names: List[Tuple[str, bool]]  # (name, is_dir), sorted like browse(): folders first
+    entries: List[ListingEntry]  # the same order, stat'ed at scan time
+    media: List[str]  # media file names, sorted by name (prev/next order)
+
+
+_lock = threading.Lock()
+_cache: Dict[Path, _Listing] = {}
+_MAX_FOLDERS = 256
+
+# Set by fs_watcher while an inotify watch covers the whole tree. Cached listings are
+# then trusted without re-stat'ing anything, since every change arrives as an event.
+# Otherwise only the names are reused while the folder mtime is unchanged: a file
+# rewritten in place does not bump it, so sizes and mtimes are stat'ed on every listing.
+trust_events = False
+
+
+def _scan(folder: Path, mtime_ns: int) -> _Listing:
+    entries = []
+    with os.scandir(folder) as it:
+        for de in it:
+            try:
+                st = de.stat()
+                entries.append(ListingEntry(de.name, de.is_dir(), st.st_size, st.st_mtime_ns))
+            except OSError:
+                continue
+
+    entries.sort(key=lambda e: (not e.is_dir, e.name.lower()))
+    media = [e.name for e in entries if not e.is_dir and is_media(Path(e.name))]
+    media.sort(key=str.lower)
+    return _Listing(mtime_ns, [(e.name, e.is_dir) for e in entries], entries, media)
+
+
+def _restat(folder: Path, names: List[Tuple[str, bool]]) -> List[ListingEntry]:
+    entries = []
+    for name, is_dir in names:
+        try:
+            st = os.stat(folder / name)
+        except OSError:
+            continue  # removed since the scan; the folder mtime catches that next time
+        entries.append(ListingEntry(name, is_dir, st.st_size, st.st_mtime_ns))
+    return entries
+
+
+def _listing(folder: Path) -> Tuple[_Listing, bool]:
+    """
+    The cached listing of folder, rescanned if the folder changed, and whether its
+    entries are current (just scanned, or kept current by the inotify watcher).
+    """
+    if trust_events:
+        cached = _cache.get(folder)
+        if cached is not None:
+            return cached, True
+
+    mtime_ns = folder.stat().st_mtime_ns
+    cached = _cache.get(folder)
+    if cached is not None and cached.mtime_ns == mtime_ns:
+        return cached, trust_events
+
+    listing = _scan(folder, mtime_ns)
+    with _lock:
+        if len(_cache) >= _MAX_FOLDERS:
+            _cache.pop(next(iter(_cache)))
+        _cache[folder] = listing
+    return listing, True
+
+
+def list_dir(folder: Path) -> List[ListingEntry]:
+    """
+    Directory entries of folder (already sorted for display), cached per folder.
+    Revalidated against the folder mtime, and the entries re-stat'ed, unless the
+    inotify watcher is active.
+    """
+    listing, current = _listing(folder)
+    return listing.entries if current else _restat(folder, listing.names)
+
+
+def list_media(folder: Path) -> List[str]:
+    """
+    Names of the media files in folder, sorted case-insensitively (gallery order).
+    """
+    return _listing(folder)[0].media
+
+
+def invalidate(folder: Path) -> None:
+    with _lock:
+        _cache.pop(folder, None)
+
+
+def invalidate_tree(folder: Path) -> None:
+    with _lock:
+        for p in [p for p in _cache if p == folder or folder in p.parents]:
+            del _cache[p]
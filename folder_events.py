@@ -0,0 +1,43 @@
+import threading
+from pathlib import Path
+from typing import Dict
+
+import fs_watcher
+
+# Change counters per folder, bumped by fs_watcher events, so live listings
+# (routes_events.py) wake up as soon as something in their folder changes instead of
+# re-listing it on a timer. A RESYNC bumps every folder.
+
+_cond = threading.Condition()
+_versions: Dict[Path, int] = {}
+_epoch = 0
+
+
+def _on_change(kind: str, path: Path, is_dir: bool) -> None:
+    global _epoch
+    with _cond:
+        if kind == fs_watcher.RESYNC:
+            _epoch += 1
+        else:
+            _versions[path.parent] = _versions.get(path.parent, 0) + 1
+            if is_dir:
+                _versions[path] = _versions.get(path, 0) + 1
+        _cond.notify_all()
+
+
+fs_watcher.subscribe(_on_change)
+
+
+def version(folder: Path) -> int:
+    with _cond:
+        return _epoch + _versions.get(folder, 0)
+
+
+def wait_for_change(folder: Path, seen: int, timeout: float) -> int:
+    """
+    Blocks until folder's version differs from seen or timeout seconds pass; returns
+    the current version.
+    """
+    with _cond:
+        _cond.wait_for(lambda: _epoch + _versions.get(folder, 0) != seen, timeout)
+        return _epoch + _versions.get(folder, 0)
@@ -0,0 +1,40 @@
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Set
+
+
+class FolderQueue:
+    """
+    Background worker running fn(folder) once per queued folder. A folder queued
+    again before its pass has run is not queued twice.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Path], None]) -> None:
+        self.name = name
+        self.fn = fn
+        self._pending: "queue.Queue[Path]" = queue.Queue()
+        self._queued: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def put(self, folder: Path) -> None:
+        with self._lock:
+            if folder in self._queued:
+                return
+            self._queued.add(folder)
+            if not self._started:
+                threading.Thread(target=self._run, name=self.name, daemon=True).start()
+                self._started = True
+        self._pending.put(folder)
+
+    def _run(self) -> None:
+        while True:
+            folder = self._pending.get()
+            try:
+                self.fn(folder)
+            except Exception as e:
+                print(f"{self.name} pass failed for {folder}: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(folder)
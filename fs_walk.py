@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+from config import SCAN_WORKERS
+from db_utils import child_rel
+
+# known(rel, dir_mtime_ns) -> stored subdir names if the directory is unchanged, else None
+KnownFn = Callable[[str, int], Optional[List[str]]]
+
+
+class FileEntry(NamedTuple):
+    name: str
+    is_dir: bool
+    size: int
+    mtime_ns: int
+
+
+class DirScan(NamedTuple):
+    rel: str
+    mtime_ns: int
+    entries: Optional[List[FileEntry]]  # None when the directory was unchanged (not re-listed)
+    subdirs: List[str]
+
+
+def scan_dir(root: Path, rel: str, known: Optional[KnownFn] = None) -> Optional[DirScan]:
+    path = root / rel if rel else root
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    if known is not None:
+        subdirs = known(rel, st.st_mtime_ns)
+        if subdirs is not None:
+            return DirScan(rel, st.st_mtime_ns, None, subdirs)
+
+    entries: List[FileEntry] = []
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for de in it:
+                try:
+                    # Never follow directory symlinks: avoids loops and escaping the root
+                    if de.is_dir(follow_symlinks=False):
+                        dst = de.stat(follow_symlinks=False)
+                        entries.append(FileEntry(de.name, True, 0, dst.st_mtime_ns))
+                        subdirs.append(de.name)
+                    elif de.is_file():
+                        fst = de.stat()
+                        entries.append(FileEntry(de.name, False, fst.st_size, fst.st_mtime_ns))
+                except OSError:
+                    continue
+    except OSError:
+        return None
+
+    return DirScan(rel, st.st_mtime_ns, entries, subdirs)
+
+
+def walk_tree(
+    root: Path,
+    start_rel: str = "",
+    known: Optional[KnownFn] = None,
+    workers: int = SCAN_WORKERS,
+) -> Iterator[DirScan]:
+    """
+    Parallel breadth-first scandir walk below root/start_rel.
+    Directories are listed on a thread pool (scandir/stat release the GIL, which matters
+    on network filesystems); results are yielded to the caller's thread in completion order.
+    Unchanged directories (see `known`) are not re-listed but their subdirs are still visited,
+    so a refresh of an unchanged tree costs one stat() per directory.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan") as pool:
+        pending = {pool.submit(scan_dir, root, start_rel, known)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                scan = fut.result()
+                if scan is None:
+                    continue
+                for name in scan.subdirs:
+                    pending.add(pool.submit(scan_dir, root, child_rel(scan.rel, name), known))
+                yield scan
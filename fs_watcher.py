@@ -0,0 +1,285 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import dir_cache
+import stat_cache
+from config import FS_WATCH, FS_WATCH_POLL_SECONDS, root_path
+from fs_walk import walk_tree
+from search_index import request_refresh
+from thumb_cache import purge_thumbs_for, queue_thumb_warmup
+
+# Event kinds passed to subscribers: (kind, absolute path, is_dir)
+CREATED = "created"
+WRITING = "writing"  # a new file still being written (inotify); MODIFIED follows on close
+MODIFIED = "modified"
+DELETED = "deleted"
+RESYNC = "resync"  # events were lost; drop everything cached
+
+Listener = Callable[[str, Path, bool], None]
+
+_listeners: List[Listener] = []
+_mode = "off"
+
+# <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+_EVENT_HDR = struct.Struct("iIII")
+
+
+def subscribe(listener: Listener) -> None:
+    _listeners.append(listener)
+
+
+def watch_mode() -> str:
+    """
+    "inotify", "poll" or "off".
+    """
+    return _mode
+
+
+def _emit(kind: str, path: Path, is_dir: bool) -> None:
+    for listener in _listeners:
+        try:
+            listener(kind, path, is_dir)
+        except Exception as e:
+            print(f"Watcher listener failed for {kind} {path}: {e}")
+
+
+# ----------------------------
+# inotify (Linux)
+# ----------------------------
+class _WatchLimitReached(Exception):
+    pass
+
+
+class _Inotify:
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths: Dict[int, Path] = {}
+
+    def add(self, path: Path) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise _WatchLimitReached(str(path))
+            return  # vanished or unreadable; its parent's events still cover it
+        self.paths[wd] = path
+
+    def add_tree(self, rel: str = "") -> None:
+        for scan in walk_tree(root_path, rel):
+            self.add(root_path / scan.rel if scan.rel else root_path)
+
+    def read_events(self) -> List[Tuple[int, int, str]]:
+        buf = os.read(self.fd, 64 * 1024)
+        events = []
+        off = 0
+        while off < len(buf):
+            wd, mask, _cookie, name_len = _EVENT_HDR.unpack_from(buf, off)
+            off += _EVENT_HDR.size
+            name = buf[off : off + name_len].split(b"\0", 1)[0]
+            off += name_len
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+
+def _inotify_loop(ino: _Inotify) -> None:
+    """
+    Emits the tree's inotify events until reading them fails, then falls back to
+    polling: cached listings are only trusted while every change arrives as an event.
+    """
+    global _mode
+    try:
+        _read_inotify(ino)
+    except _WatchLimitReached:
+        reason = "inotify watch limit reached"
+    except Exception as e:
+        reason = f"inotify watcher stopped ({e})"
+    print(f"{reason}; falling back to polling")
+    _mode = "poll"
+    dir_cache.trust_events = False
+    try:
+        os.close(ino.fd)
+    except OSError:
+        pass
+    _emit(RESYNC, root_path, True)
+    _start_thread(_poll_loop, FS_WATCH_POLL_SECONDS)
+
+
+def _read_inotify(ino: _Inotify) -> None:
+    while True:
+        try:
+            events = ino.read_events()
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                _emit(RESYNC, root_path, True)
+                continue
+            if mask & IN_IGNORED:
+                ino.paths.pop(wd, None)
+                continue
+            base = ino.paths.get(wd)
+            if base is None or not name:
+                continue
+
+            path = base / name
+            is_dir = bool(mask & IN_ISDIR)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if is_dir:
+                    rel = str(path.relative_to(root_path)).replace("\\", "/")
+                    ino.add_tree(rel)
+                # a file is usually still being written when IN_CREATE arrives
+                _emit(WRITING if mask & IN_CREATE and not is_dir else CREATED, path, is_dir)
+            elif mask & (IN_CLOSE_WRITE | IN_ATTRIB):
+                _emit(MODIFIED, path, is_dir)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                _emit(DELETED, path, is_dir)
+
+
+# ----------------------------
+# polling fallback
+# ----------------------------
+def _poll_loop(interval: int) -> None:
+    """
+    Re-walks the tree every `interval` seconds, re-listing only folders whose mtime
+    changed, and diffs their entries against the previous pass.
+    """
+    snapshot: Dict[str, Tuple[int, Dict[str, Tuple[bool, int, int]]]] = {}
+
+    def known(rel: str, mtime_ns: int) -> Optional[List[str]]:
+        prev = snapshot.get(rel)
+        if prev is not None and prev[0] == mtime_ns:
+            return [name for name, (is_dir, _s, _m) in prev[1].items() if is_dir]
+        return None
+
+    first = True
+    while True:
+        seen = set()
+        for scan in walk_tree(root_path, "", known):
+            seen.add(scan.rel)
+            if scan.entries is None:
+                continue
+            entries = {e.name: (e.is_dir, e.size, e.mtime_ns) for e in scan.entries}
+            prev = snapshot.get(scan.rel)
+            snapshot[scan.rel] = (scan.mtime_ns, entries)
+            if first or prev is None:
+                continue
+
+            folder = root_path / scan.rel if scan.rel else root_path
+            old = prev[1]
+            for name, info in entries.items():
+                if name not in old:
+                    _emit(CREATED, folder / name, info[0])
+                elif old[name] != info and not info[0]:
+                    _emit(MODIFIED, folder / name, False)
+            for name, info in old.items():
+                if name not in entries:
+                    _emit(DELETED, folder / name, info[0])
+
+        for rel in [r for r in snapshot if r not in seen]:
+            del snapshot[rel]
+        first = False
+        time.sleep(interval)
+
+
+# ----------------------------
+# cache layers
+# ----------------------------
+def _on_change(kind: str, path: Path, is_dir: bool) -> None:
+    if kind == RESYNC:
+        dir_cache.invalidate_tree(root_path)
+        stat_cache.clear()
+        request_refresh()
+        return
+
+    # listings and prev/next of the containing folder
+    dir_cache.invalidate(path.parent)
+    stat_cache.invalidate(path.parent)
+    if is_dir:
+        dir_cache.invalidate_tree(path)
+        stat_cache.invalidate_tree(path)
+    else:
+        stat_cache.invalidate(path)
+
+    # search index and folder totals (a rewritten file does not bump its folder's mtime)
+    try:
+        parent_rel = str(path.parent.relative_to(root_path)).replace("\\", "/")
+    except ValueError:
+        parent_rel = None
+    request_refresh(parent_rel if parent_rel != "." else "")
+
+    # thumbnails (a file being written is warmed once it is closed, as MODIFIED)
+    if kind == DELETED:
+        purge_thumbs_for(path, recursive=is_dir)
+    elif kind == MODIFIED and not is_dir:
+        purge_thumbs_for(path)
+        queue_thumb_warmup(path)
+    elif kind == CREATED and not is_dir:
+        queue_thumb_warmup(path)
+
+
+# Registered first, at import, so the caches are already invalidated when later
+# subscribers (folder_events, which wakes the live listings) hear about a change.
+subscribe(_on_change)
+
+
+def _start_thread(target, *args) -> None:
+    threading.Thread(target=target, args=args, name="fs-watcher", daemon=True).start()
+
+
+def start_fs_watcher(mode: str = FS_WATCH) -> str:
+    """
+    Starts the watcher in the background. mode: "auto" (inotify on Linux, polling
+    elsewhere or past the inotify watch limit), "inotify", "poll" or "off".
+    Returns the mode actually in use.
+    """
+    global _mode
+    if mode == "off":
+        return _mode
+
+    if mode in ("auto", "inotify") and sys.platform.startswith("linux"):
+        try:
+            ino = _Inotify()
+            ino.add_tree()
+            _mode = "inotify"
+            dir_cache.trust_events = True
+            _start_thread(_inotify_loop, ino)
+            return _mode
+        except _WatchLimitReached:
+            print("inotify watch limit reached; falling back to polling")
+            os.close(ino.fd)
+        except OSError as e:
+            print(f"inotify unavailable ({e}); falling back to polling")
+
+    _mode = "poll"
+    _start_thread(_poll_loop, FS_WATCH_POLL_SECONDS)
+    return _mode
@@ -0,0 +1,184 @@
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import stat_cache
+from config import INDEX_DIR
+from db_utils import connect
+from dir_cache import ListingEntry, list_dir
+from folder_queue import FolderQueue
+from image_pool import read_headers
+from imaging import pillow_available
+from media_utils import is_image
+
+# EXIF/header details per image (date taken, dimensions, orientation, camera), keyed by
+# (path, mtime_ns, size). Read in the background from headers only, never by decoding
+# pixels, one folder at a time when browse() shows images that are not indexed yet.
+# browse() sorts and filters a folder with one query against this table.
+IMAGE_META_DB = INDEX_DIR / "image_meta.sqlite3"
+
+_BATCH = 200  # files per image worker round trip
+
+
+class ImageMeta(NamedTuple):
+    taken: Optional[str]  # "YYYY-MM-DD HH:MM:SS", camera local time
+    width: Optional[int]
+    height: Optional[int]
+    orientation: int
+    camera: Optional[str]
+
+    @property
+    def dimensions(self) -> Optional[Tuple[int, int]]:
+        """
+        Width and height as displayed, i.e. after EXIF rotation.
+        """
+        if not (self.width and self.height):
+            return None
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+    def describe(self) -> str:
+        """
+        Short summary for the views, e.g. "4032×3024 • 2023-05-01 14:22 • Canon EOS R5".
+        """
+        parts = []
+        if self.dimensions:
+            parts.append("{}×{}".format(*self.dimensions))
+        if self.taken:
+            parts.append(self.taken[:16])
+        if self.camera:
+            parts.append(self.camera)
+        return " • ".join(parts)
+
+
+_COLUMNS = "taken, width, height, orientation, camera"
+_schema_ready = False
+
+
+def _db():
+    global _schema_ready
+    conn = connect(IMAGE_META_DB)
+    if not _schema_ready:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS image_meta (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                name TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                taken TEXT,
+                width INTEGER,
+                height INTEGER,
+                orientation INTEGER NOT NULL DEFAULT 1,
+                camera TEXT
+            );
+            CREATE INDEX IF NOT EXISTS image_meta_parent ON image_meta(parent, taken);
+            """
+        )
+        _schema_ready = True
+    return conn
+
+
+def _store(rows: Iterable[tuple]) -> None:
+    try:
+        conn = _db()
+        conn.executemany(
+            f"INSERT OR REPLACE INTO image_meta(path, parent, name, mtime_ns, size, {_COLUMNS}) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+    except sqlite3.Error:
+        pass
+
+
+def _stored(folder: Path) -> Dict[str, tuple]:
+    """
+    name -> (mtime_ns, size, taken, width, height, orientation, camera), one query.
+    """
+    try:
+        rows = _db().execute(
+            f"SELECT name, mtime_ns, size, {_COLUMNS} FROM image_meta WHERE parent = ?",
+            (str(folder),),
+        ).fetchall()
+    except sqlite3.Error:
+        return {}
+    return {r[0]: r[1:] for r in rows}
+
+
+def lookup(fpath: Path) -> Optional[ImageMeta]:
+    """
+    Indexed details for fpath if they match the file's current mtime and size.
+    """
+    try:
+        st = stat_cache.stat(fpath)
+        row = _db().execute(
+            f"SELECT {_COLUMNS} FROM image_meta WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (str(fpath), st.st_mtime_ns, st.st_size),
+        ).fetchone()
+    except (OSError, sqlite3.Error):
+        return None
+    return ImageMeta(*row) if row else None
+
+
+def folder_meta(folder: Path, entries: List[ListingEntry]) -> Tuple[Dict[str, ImageMeta], int]:
+    """
+    Indexed details for the images among a folder's listing entries, by name, and the
+    number of images not indexed yet (or changed since), which are queued for a
+    background pass.
+    """
+    stored = _stored(folder)
+    out: Dict[str, ImageMeta] = {}
+    missing = 0
+    for e in entries:
+        if e.is_dir or not is_image(Path(e.name)):
+            continue
+        r = stored.get(e.name)
+        if r is not None and r[0] == e.mtime_ns and r[1] == e.size:
+            out[e.name] = ImageMeta(*r[2:])
+        else:
+            missing += 1
+    if missing and pillow_available():
+        _passes.put(folder)
+    return out, missing
+
+
+def _index_folder(folder: Path) -> None:
+    try:
+        entries = list_dir(folder)
+    except OSError:
+        return
+    stored = _stored(folder)
+    todo = [
+        e
+        for e in entries
+        if not e.is_dir
+        and is_image(Path(e.name))
+        and (stored.get(e.name) or (None, None))[:2] != (e.mtime_ns, e.size)
+    ]
+    for i in range(0, len(todo), _BATCH):
+        batch = todo[i : i + _BATCH]
+        headers = read_headers([folder / e.name for e in batch])
+        rows = []
+        for e, h in zip(batch, headers):
+            h = h or {}
+            rows.append(
+                (
+                    str(folder / e.name),
+                    str(folder),
+                    e.name,
+                    e.mtime_ns,
+                    e.size,
+                    h.get("taken"),
+                    h.get("width"),
+                    h.get("height"),
+                    h.get("orientation", 1),
+                    h.get("camera"),
+                )
+            )
+        _store(rows)
+
+
+_passes = FolderQueue("image-meta", _index_folder)
@@ -0,0 +1,205 @@
+import errno
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import IMAGE_WORKERS
+from imaging import load_image_module
+from media_utils import Cancelled, encode_preview, encode_thumbs, observe_stages, read_image_header
+
+# Pillow decode/resize/encode in worker processes, so image work scales with cores
+# instead of contending for the GIL with request threads. Workers write the JPEGs
+# straight to their cache files (temp name + rename) and only the sizes and stage
+# timings travel back; the route then serves the file from disk.
+# IMAGE_WORKERS=0 keeps everything in-process.
+
+_executor: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def pool_enabled() -> bool:
+    return IMAGE_WORKERS > 0
+
+
+def _init_worker() -> None:
+    load_image_module()
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+class CacheWriteError(Exception):
+    """
+    Raised when a rendition could not be written to its cache file (disk full, cache
+    folder deleted), which says nothing about the source file.
+    """
+
+
+def _write_atomic(dests: List[str], write) -> List[int]:
+    """
+    Calls write(temp paths) and renames each temp file onto its destination; no
+    destination is touched unless every write succeeded. Temp files are unique per
+    call, so concurrent jobs writing the same destination do not share one.
+    Failures to create, write or rename them raise CacheWriteError.
+    """
+    tmps: List[str] = []
+    try:
+        try:
+            for dest in dests:
+                fd, tmp = tempfile.mkstemp(
+                    dir=os.path.dirname(dest), prefix=os.path.basename(dest) + ".", suffix=".tmp"
+                )
+                os.close(fd)
+                tmps.append(tmp)
+        except OSError as e:
+            raise CacheWriteError(str(e)) from e
+        try:
+            write(tmps)
+        except OSError as e:
+            # errors opening the source or decoding it are the file's own
+            if e.filename not in tmps and e.errno != errno.ENOSPC:
+                raise
+            raise CacheWriteError(str(e)) from e
+        try:
+            for tmp, dest in zip(tmps, dests):
+                os.replace(tmp, dest)
+            return [os.path.getsize(dest) for dest in dests]
+        except OSError as e:
+            raise CacheWriteError(str(e)) from e
+    except BaseException:
+        for tmp in tmps:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+        raise
+
+
+def _encode_thumbs(
+    src: Path, targets: List[Tuple[int, str]], timings: Dict[str, float], cancel=None
+) -> List[int]:
+    sizes = [size for size, _dest in targets]
+    return _write_atomic(
+        [dest for _size, dest in targets],
+        lambda tmps: encode_thumbs(src, list(zip(sizes, tmps)), timings, cancel),
+    )
+
+
+def _thumbs_to_files(src: str, targets: List[Tuple[int, str]]) -> Tuple[List[int], Dict[str, float]]:
+    timings: Dict[str, float] = {}
+    return _encode_thumbs(Path(src), targets, timings), timings
+
+
+def _preview_to_file(src: str, dest: str) -> Tuple[int, Dict[str, float]]:
+    timings: Dict[str, float] = {}
+    (n,) = _write_atomic([dest], lambda tmps: encode_preview(Path(src), tmps[0], timings))
+    return n, timings
+
+
+def _headers(paths: List[str]) -> List[Optional[dict]]:
+    return [read_image_header(Path(p)) for p in paths]
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: forking a multi-threaded server can copy held locks into the child
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def _run(fn, *args, cancel: Optional[threading.Event] = None):
+    global _executor
+    pool = _pool()
+    try:
+        fut = pool.submit(fn, *args)
+        while True:
+            try:
+                return fut.result(timeout=0.1)
+            except FutureTimeout:
+                # only jobs that have not reached a worker yet can be withdrawn
+                if cancel is not None and cancel.is_set() and fut.cancel():
+                    raise Cancelled()
+    except BrokenProcessPool:
+        # a worker died (e.g. a decoder crash); start a fresh pool next time
+        with _lock:
+            if _executor is pool:
+                _executor = None
+        raise RuntimeError("image worker process died")
+
+
+def warm_image_pool() -> None:
+    """
+    Starts every worker process and imports Pillow in each, so the first
+    thumbnails do not pay for process startup.
+    """
+    if not pool_enabled():
+        load_image_module()
+        return
+    pool = _pool()
+    for fut in [pool.submit(_noop) for _ in range(IMAGE_WORKERS)]:
+        fut.result()
+
+
+def render_thumbs(
+    src: Path, targets: List[Tuple[int, Path]], cancel: Optional[threading.Event] = None
+) -> List[int]:
+    """
+    Writes JPEG thumbnails of src for each (size, dest) in targets from a single
+    decode; returns their sizes in bytes.
+    """
+    str_targets = [(size, str(dest)) for size, dest in targets]
+    if not pool_enabled():
+        timings: Dict[str, float] = {}
+        try:
+            return _encode_thumbs(src, str_targets, timings, cancel)
+        finally:
+            observe_stages("thumb", timings)
+    sizes, timings = _run(_thumbs_to_files, str(src), str_targets, cancel=cancel)
+    observe_stages("thumb", timings)
+    return sizes
+
+
+def render_preview(src: Path, dest: Path) -> int:
+    """
+    Writes a full-size JPEG of src (HEIC/HEIF) to dest; returns its size in bytes.
+    """
+    if not pool_enabled():
+        timings: Dict[str, float] = {}
+        try:
+            (n,) = _write_atomic([str(dest)], lambda tmps: encode_preview(src, tmps[0], timings))
+            return n
+        finally:
+            observe_stages("heic_preview", timings)
+    n, timings = _run(_preview_to_file, str(src), str(dest))
+    observe_stages("heic_preview", timings)
+    return n
+
+
+def write_cache_file(dest: Path, data: bytes) -> int:
+    """
+    Writes bytes rendered elsewhere (e.g. an ffmpeg frame) to a cache file the same
+    way; returns their size.
+    """
+    (n,) = _write_atomic([str(dest)], lambda tmps: Path(tmps[0]).write_bytes(data))
+    return n
+
+
+def read_headers(paths: List[Path]) -> List[Optional[dict]]:
+    """
+    read_image_header() for a batch of files, in one worker round trip.
+    """
+    if not pool_enabled():
+        return _headers([str(p) for p in paths])
+    return _run(_headers, [str(p) for p in paths])
@@ -0,0 +1,58 @@
+import importlib.util
+import threading
+from functools import lru_cache
+
+# Pillow and pillow-heif are imported on first use (first thumbnail / HEIC preview)
+# instead of at startup; availability checks only look the modules up.
+
+_lock = threading.Lock()
+_loaded = False
+_Image = None
+_heif_ok = False
+
+
+@lru_cache(maxsize=None)
+def pillow_available() -> bool:
+    return importlib.util.find_spec("PIL") is not None
+
+
+def heif_available() -> bool:
+    """
+    Whether HEIC/HEIF can be decoded (pillow + pillow-heif installed), without importing them.
+    """
+    if _loaded:
+        return _heif_ok
+    return pillow_available() and importlib.util.find_spec("pillow_heif") is not None
+
+
+def load_image_module():
+    """
+    Returns PIL.Image (registering the HEIF opener once), or None if Pillow is missing.
+    """
+    global _loaded, _Image, _heif_ok
+    if _loaded:
+        return _Image
+    with _lock:
+        if _loaded:
+            return _Image
+        try:
+            from PIL import Image
+
+            _Image = Image
+            try:
+                import pillow_heif  # noqa: F401
+
+                pillow_heif.register_heif_opener()
+                _heif_ok = True
+            except Exception:
+                _heif_ok = False
+        except Exception:
+            _Image = None
+            _heif_ok = False
+        _loaded = True
+    return _Image
+
+
+def heif_ok() -> bool:
+    load_image_module()
+    return _heif_ok
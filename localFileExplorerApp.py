@@ -1,13 +1,26 @@
 if __name__ == "__main__":
     from config import ACCESS_TOKEN, HOST, PORT, app, root_path
+    import profiling  # noqa: F401  (registers the request hooks when enabled)
+    import tracing  # noqa: F401  (slow-request log and trace export when enabled)
+    from routes_assets import asset as _asset  # noqa: F401
     from routes_browse import index as _  # noqa: F401  (ensure routes are registered)
     from routes_download import download as _download  # noqa: F401
+    from routes_events import events as _events  # noqa: F401
+    from routes_health import readyz as _readyz  # noqa: F401
+    from routes_metrics import metrics as _metrics  # noqa: F401
+    from routes_search import search as _search  # noqa: F401
     from routes_thumbs import thumb as _thumb  # noqa: F401
-    from thumb_cache import ensure_thumb_cache_dir, maintain_thumb_cache
+    from startup import start_background_tasks
+    import transfer_scheduler  # noqa: F401  (throttles large transfers when caps are set)
 
-    ensure_thumb_cache_dir()
-    maintain_thumb_cache(max_age_days=1, max_mb=500)
+    # after_request hooks run in reverse order of registration: registering compression
+    # last makes it run first, so the metrics hook counts compressed bytes
+    import compression  # noqa: F401
+
+    # cache maintenance, indexing and the watcher run in the background;
+    # GET /readyz reports when the startup work is done
+    start_background_tasks()
 
     print(f"Sharing folder: {root_path}")
     print(f"Open: http://{HOST}:{PORT}/?token={ACCESS_TOKEN}")
-    app.run(host=HOST, port=PORT, debug=False)
\ No newline at end of file
+    app.run(host=HOST, port=PORT, debug=False)
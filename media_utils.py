@@ -1,17 +1,41 @@
+import json
 import mimetypes
 import subprocess
+import threading
+import time
+from contextlib import contextmanager
 from io import BytesIO
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 
 from config import (
     FFMPEG_BIN,
     FFPROBE_BIN,
-    HEIF_OK,
-    Image,
+    FFPROBE_TIMEOUT,
     MEDIA_EXTS_IMG,
     MEDIA_EXTS_VID,
 )
+from imaging import heif_ok, load_image_module
+from metrics import IMAGE_STAGE_SECONDS, SUBPROCESS_SECONDS
+from tracing import add_stages, span
+
+
+class Cancelled(Exception):
+    """
+    Raised when thumbnail work is abandoned because nobody is waiting for it any more.
+    """
+
+
+class ToolUnavailable(RuntimeError):
+    """
+    Raised when the library or binary needed for a file is not installed, which says
+    nothing about the file itself.
+    """
+
+
+def _check_cancel(cancel: Optional[threading.Event]) -> None:
+    if cancel is not None and cancel.is_set():
+        raise Cancelled()
 
 
 def is_video(p: Path) -> bool:
@@ -43,6 +67,12 @@ def format_size(num: int) -> str:
     return f"{num:.1f} PB"
 
 
+def format_duration(seconds: float) -> str:
+    s = int(round(seconds))
+    h, m = divmod(s // 60, 60)
+    return f"{h}:{m:02d}:{s % 60:02d}" if h else f"{m}:{s % 60:02d}"
+
+
 def ffmpeg_exists() -> bool:
     try:
         subprocess.run(
@@ -56,9 +86,66 @@ def ffmpeg_exists() -> bool:
         return False
 
 
-def ffprobe_duration_seconds(fpath: Path) -> Optional[float]:
+def _run_tool(
+    tool: str,
+    cmd: list,
+    cancel: Optional[threading.Event] = None,
+    timeout: Optional[float] = None,
+) -> subprocess.CompletedProcess:
+    """
+    Runs cmd capturing its output. With a cancel event, the child is killed as soon as
+    the event is set and Cancelled is raised; after timeout seconds it is killed and
+    subprocess.TimeoutExpired is raised.
+    """
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(tool):
+            if cancel is None:
+                p = subprocess.run(
+                    cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False, timeout=timeout
+                )
+            else:
+                p = _run_cancellable(cmd, cancel, timeout)
+        if p.returncode == 0 and p.stdout:
+            outcome = "ok"
+        return p
+    except Cancelled:
+        outcome = "cancelled"
+        raise
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+        raise
+    finally:
+        SUBPROCESS_SECONDS.observe(time.perf_counter() - t0, tool, outcome)
+
+
+def _run_cancellable(
+    cmd: list, cancel: threading.Event, timeout: Optional[float] = None
+) -> subprocess.CompletedProcess:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        while True:
+            try:
+                out, err = proc.communicate(timeout=0.1)
+                return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
+            except subprocess.TimeoutExpired:
+                if cancel.is_set():
+                    proc.kill()
+                    proc.communicate()
+                    raise Cancelled()
+                if deadline is not None and time.monotonic() > deadline:
+                    proc.kill()
+                    proc.communicate()
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+
+
+def ffprobe_duration_seconds(
+    fpath: Path, cancel: Optional[threading.Event] = None, timeout: Optional[float] = FFPROBE_TIMEOUT
+) -> Optional[float]:
     try:
-        p = subprocess.run(
+        p = _run_tool(
+            "ffprobe",
             [
                 FFPROBE_BIN,
                 "-v",
@@ -69,19 +156,80 @@ def ffprobe_duration_seconds(fpath: Path) -> Optional[float]:
                 "default=noprint_wrappers=1:nokey=1",
                 str(fpath),
             ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False,
+            cancel,
+            timeout,
         )
         if p.returncode != 0:
             return None
         s = p.stdout.decode("utf-8", "ignore").strip()
         return float(s) if s else None
+    except Cancelled:
+        raise
     except Exception:
         return None
 
 
-def _ffmpeg_grab_frame_jpeg_fastseek(fpath: Path, size: int, seek_seconds: float) -> bytes:
+def ffprobe_video_info(
+    fpath: Path, cancel: Optional[threading.Event] = None, timeout: Optional[float] = FFPROBE_TIMEOUT
+) -> Optional[dict]:
+    """
+    One ffprobe run for everything the views and thumbnails need: duration (s),
+    codec, width, height, bitrate (bit/s) and rotation (degrees). None if ffprobe
+    cannot read the file within timeout seconds.
+    """
+    try:
+        p = _run_tool(
+            "ffprobe",
+            [
+                FFPROBE_BIN,
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "format=duration,bit_rate:stream=codec_name,width,height:"
+                "stream_tags=rotate:stream_side_data=rotation",
+                "-of",
+                "json",
+                str(fpath),
+            ],
+            cancel,
+            timeout,
+        )
+        if p.returncode != 0:
+            return None
+        doc = json.loads(p.stdout.decode("utf-8", "ignore") or "{}")
+    except Cancelled:
+        raise
+    except Exception:
+        return None
+
+    fmt = doc.get("format") or {}
+    stream = (doc.get("streams") or [{}])[0]
+    rotation = stream.get("tags", {}).get("rotate")
+    for side in stream.get("side_data_list") or []:
+        if "rotation" in side:
+            rotation = side["rotation"]
+
+    def num(v, cast):
+        try:
+            return cast(v)
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        "duration": num(fmt.get("duration"), float),
+        "codec": stream.get("codec_name"),
+        "width": num(stream.get("width"), int),
+        "height": num(stream.get("height"), int),
+        "bitrate": num(fmt.get("bit_rate"), int),
+        "rotation": (num(rotation, int) or 0) % 360,
+    }
+
+
+def _ffmpeg_grab_frame_jpeg_fastseek(
+    fpath: Path, size: int, seek_seconds: float, cancel: Optional[threading.Event] = None
+) -> bytes:
     vf = f"scale={size}:{size}:force_original_aspect_ratio=increase,crop={size}:{size}"
     cmd = [
         FFMPEG_BIN,
@@ -102,13 +250,15 @@ def _ffmpeg_grab_frame_jpeg_fastseek(fpath: Path, size: int, seek_seconds: float
         "mjpeg",
         "pipe:1",
     ]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    p = _run_tool("ffmpeg_fastseek", cmd, cancel)
     if p.returncode != 0 or not p.stdout:
         raise RuntimeError(p.stderr.decode("utf-8", "ignore")[:500])
     return p.stdout
 
 
-def _ffmpeg_grab_frame_jpeg_slowseek(fpath: Path, size: int, seek_seconds: float) -> bytes:
+def _ffmpeg_grab_frame_jpeg_slowseek(
+    fpath: Path, size: int, seek_seconds: float, cancel: Optional[threading.Event] = None
+) -> bytes:
     vf = f"scale={size}:{size}:force_original_aspect_ratio=increase,crop={size}:{size}"
     cmd = [
         FFMPEG_BIN,
@@ -129,39 +279,154 @@ def _ffmpeg_grab_frame_jpeg_slowseek(fpath: Path, size: int, seek_seconds: float
         "mjpeg",
         "pipe:1",
     ]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    p = _run_tool("ffmpeg_slowseek", cmd, cancel)
     if p.returncode != 0 or not p.stdout:
         raise RuntimeError(p.stderr.decode("utf-8", "ignore")[:500])
     return p.stdout
 
 
-def generate_thumb_bytes(fpath: Path, size: int) -> Tuple[bytes, str]:
-    """
-    Returns (bytes, mimetype). Generates JPEG thumbnails for images.
-    """
+@contextmanager
+def _stage(timings: Dict[str, float], name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - t0
+
+
+def observe_stages(op: str, timings: Dict[str, float]) -> None:
+    for stage, seconds in timings.items():
+        IMAGE_STAGE_SECONDS.observe(seconds, op, stage)
+    add_stages(op, timings)
+
+
+def _open_image(fpath: Path):
+    Image = load_image_module()
     if Image is None:
-        raise RuntimeError("Pillow not installed")
+        raise ToolUnavailable("Pillow not installed")
 
     # HEIC needs pillow-heif
-    if fpath.suffix.lower() in {".heic", ".heif"} and not HEIF_OK:
-        raise RuntimeError("HEIC/HEIF support not installed (pillow-heif)")
+    if fpath.suffix.lower() in {".heic", ".heif"} and not heif_ok():
+        raise ToolUnavailable("HEIC/HEIF support not installed (pillow-heif)")
+    return Image.open(fpath)  # type: ignore[call-arg]
+
+
+# EXIF tags (IFD0 and the Exif sub-IFD)
+_EXIF_IFD = 0x8769
+_TAG_MAKE, _TAG_MODEL, _TAG_ORIENTATION, _TAG_DATETIME = 271, 272, 274, 306
+_TAG_DATETIME_ORIGINAL = 36867
+
+
+def read_image_header(fpath: Path) -> Optional[dict]:
+    """
+    Date taken ("YYYY-MM-DD HH:MM:SS"), stored width/height, EXIF orientation (1-8)
+    and camera of an image, read from its header and EXIF block without decoding any
+    pixels. None if the file cannot be opened as an image.
+    """
+    try:
+        with _open_image(fpath) as im:
+            width, height = im.size
+            exif = im.getexif()
+            taken = exif.get_ifd(_EXIF_IFD).get(_TAG_DATETIME_ORIGINAL) or exif.get(_TAG_DATETIME)
+            make = str(exif.get(_TAG_MAKE) or "").strip("\x00 ")
+            model = str(exif.get(_TAG_MODEL) or "").strip("\x00 ")
+            orientation = exif.get(_TAG_ORIENTATION) or 1
+    except Exception:
+        return None
+
+    # "2023:05:01 14:22:03" -> "2023-05-01 14:22:03", which sorts and compares as text
+    taken = str(taken or "").strip("\x00 ")
+    if len(taken) >= 19 and taken[4] == ":" and taken[7] == ":":
+        taken = f"{taken[:4]}-{taken[5:7]}-{taken[8:19]}"
+    else:
+        taken = None
+    # models usually repeat the make ("Canon" + "Canon EOS R5")
+    camera = model if make and model.lower().startswith(make.lower()) else f"{make} {model}".strip()
+    return {
+        "taken": taken,
+        "width": width,
+        "height": height,
+        "orientation": orientation if isinstance(orientation, int) and 1 <= orientation <= 8 else 1,
+        "camera": camera or None,
+    }
+
+
+def encode_thumbs(
+    fpath: Path,
+    outputs: List[Tuple[int, Union[str, BinaryIO]]],
+    timings: Dict[str, float],
+    cancel: Optional[threading.Event] = None,
+) -> None:
+    """
+    Writes JPEG thumbnails of fpath at several sizes from a single decode, each size
+    scaled down from the previous (larger) one. outputs are (size, path or binary file
+    object); the time spent per stage is added to timings.
+    The outputs are rotated upright, since the EXIF orientation is not copied to them.
+    Pillow cannot be interrupted mid-stage, so cancel is checked between stages.
+    """
+    _check_cancel(cancel)
+    largest = max(size for size, _out in outputs)
+    with _open_image(fpath) as im:
+        from PIL import ImageOps
+
+        with _stage(timings, "decode"):
+            im.draft("RGB", (largest, largest))  # JPEG: let the decoder downscale
+            im.load()
+        _check_cancel(cancel)
+        with _stage(timings, "resize"):
+            im = ImageOps.exif_transpose(im).convert("RGB")
+        for size, out in sorted(outputs, key=lambda o: -o[0]):
+            with _stage(timings, "resize"):
+                im.thumbnail((size, size))
+            with _stage(timings, "encode"):
+                im.save(out, format="JPEG", quality=82, optimize=True)
 
-    with Image.open(fpath) as im:  # type: ignore[call-arg]
-        if im.mode not in ("RGB", "L"):
-            im = im.convert("RGB")
-        else:
-            im = im.convert("RGB")
-        im.thumbnail((size, size))
-        buf = BytesIO()
-        im.save(buf, format="JPEG", quality=82, optimize=True)
-        return buf.getvalue(), "image/jpeg"
 
+def encode_preview(fpath: Path, out: Union[str, BinaryIO], timings: Dict[str, float]) -> None:
+    """
+    Writes a full-size JPEG of an image browsers cannot display (HEIC/HEIF) to out.
+    """
+    with _open_image(fpath) as im:
+        from PIL import ImageOps
 
-def generate_video_thumb_bytes(fpath: Path, size: int) -> Tuple[bytes, str]:
+        with _stage(timings, "decode"):
+            im.load()
+            im = ImageOps.exif_transpose(im)
+            if im.mode != "RGB":
+                im = im.convert("RGB")
+        with _stage(timings, "encode"):
+            im.save(out, format="JPEG", quality=90, optimize=True)
+
+
+def generate_thumb_bytes(
+    fpath: Path, size: int, cancel: Optional[threading.Event] = None
+) -> Tuple[bytes, str]:
+    """
+    Returns (bytes, mimetype). Generates JPEG thumbnails for images in this process.
+    """
+    buf = BytesIO()
+    timings: Dict[str, float] = {}
+    try:
+        encode_thumbs(fpath, [(size, buf)], timings, cancel)
+    finally:
+        observe_stages("thumb", timings)
+    return buf.getvalue(), "image/jpeg"
+
+
+def generate_video_thumb_bytes(
+    fpath: Path,
+    size: int,
+    cancel: Optional[threading.Event] = None,
+    duration: Optional[float] = None,
+) -> Tuple[bytes, str]:
+    """
+    Returns (bytes, mimetype). duration (seconds) comes from the metadata store when
+    known; otherwise ffprobe is run for it.
+    """
     if not ffmpeg_exists():
-        raise RuntimeError("ffmpeg not installed or not reachable (PATH/FFMPEG_BIN)")
+        raise ToolUnavailable("ffmpeg not installed or not reachable (PATH/FFMPEG_BIN)")
 
-    dur = ffprobe_duration_seconds(fpath)
+    dur = duration if duration is not None else ffprobe_duration_seconds(fpath, cancel)
 
     # Explorer-ish selection: ~10% in, clamp
     if dur and dur > 0:
@@ -174,13 +439,17 @@ def generate_video_thumb_bytes(fpath: Path, size: int) -> Tuple[bytes, str]:
     for seek in candidates:
         # Try fast seek first, then fallback
         try:
-            jpg = _ffmpeg_grab_frame_jpeg_fastseek(fpath, size, seek)
+            jpg = _ffmpeg_grab_frame_jpeg_fastseek(fpath, size, seek, cancel)
             return jpg, "image/jpeg"
+        except Cancelled:
+            raise
         except Exception as e:
             last_err = e
         try:
-            jpg = _ffmpeg_grab_frame_jpeg_slowseek(fpath, size, seek)
+            jpg = _ffmpeg_grab_frame_jpeg_slowseek(fpath, size, seek, cancel)
             return jpg, "image/jpeg"
+        except Cancelled:
+            raise
         except Exception as e:
             last_err = e
 
@@ -0,0 +1,164 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Minimal Prometheus text-format metrics. Updates are one dict operation under a lock,
+# cheap enough for the per-request and per-thumbnail hot paths.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for lv, v in items:
+            yield f"{self.name}{_fmt_labels(self.labels, lv)} {_fmt_value(v)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+    def dec(self, amount: float = 1, *label_values: str) -> None:
+        self.inc(-amount, *label_values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(label_values)
+            if row is None:
+                row = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *label_values)
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            items = sorted((lv, list(row)) for lv, row in self._values.items())
+        for lv, row in items:
+            cumulative = 0
+            for le, n in zip(self.buckets + (float("inf"),), row):
+                cumulative += n
+                le_label = f'le="{"+Inf" if le == float("inf") else le}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, lv, le_label)} {cumulative}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, lv)} {row[-1]!r}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, lv)} {cumulative}"
+
+
+def render_all() -> str:
+    lines: List[str] = []
+    for m in _registry:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------
+# APP METRICS
+# ----------------------------
+REQUEST_SECONDS = Histogram(
+    "lfe_request_duration_seconds", "Time to produce the response, by route.", ["route", "status"]
+)
+IN_FLIGHT = Gauge("lfe_requests_in_flight", "Requests currently being handled.")
+BYTES_SENT = Counter("lfe_response_bytes_total", "Response body bytes sent, by route.", ["route"])
+LIVE_STREAMS = Gauge("lfe_live_streams", "Open live folder update streams (/events).")
+
+THUMB_CACHE = Counter(
+    "lfe_thumb_cache_requests_total", "Thumbnail cache lookups.", ["kind", "result"]
+)
+THUMB_CACHE_EVICTIONS = Counter(
+    "lfe_thumb_cache_evictions_total", "Cached thumbnails deleted.", ["reason"]
+)
+THUMB_CACHE_BYTES = Gauge("lfe_thumb_cache_bytes", "Approximate size of THUMB_CACHE_DIR.")
+STAT_CACHE = Counter(
+    "lfe_stat_cache_lookups_total", "Shared resolve()/stat() cache lookups.", ["op", "result"]
+)
+THUMB_FAILURES = Counter(
+    "lfe_thumb_failures_total", "Thumbnails that could not be generated, by error.", ["kind", "error"]
+)
+THUMB_QUEUE_DEPTH = Gauge("lfe_thumb_queue_depth", "Thumbnail jobs waiting for a worker.")
+THUMB_JOBS = Counter(
+    "lfe_thumb_jobs_total", "Thumbnail jobs by outcome (joined = deduplicated request).", ["result"]
+)
+
+IMAGE_STAGE_SECONDS = Histogram(
+    "lfe_image_stage_seconds", "Pillow time per stage.", ["op", "stage"]
+)
+SUBPROCESS_SECONDS = Histogram(
+    "lfe_subprocess_seconds", "ffmpeg/ffprobe wall time.", ["tool", "outcome"]
+)
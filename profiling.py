@@ -0,0 +1,133 @@
+import cProfile
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from flask import g, request
+
+from config import (
+    ACCESS_TOKEN,
+    PROFILE_DIR,
+    PROFILE_HEADER_ENABLED,
+    PROFILE_MAX_FILES,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_SAMPLE_RATE,
+    app,
+)
+
+# Opt-in request profiling. A request is profiled when it wins the PROFILE_SAMPLE_RATE
+# draw, or when it carries "X-Profile: 1" together with a valid token. For each
+# profiled request a stack sampler writes <id>.collapsed (flamegraph.pl / speedscope
+# input) and, in "cprofile" mode, cProfile writes <id>.prof (snakeviz, pstats).
+# With both switches off no hooks are registered at all.
+
+PROFILING_ENABLED = PROFILE_SAMPLE_RATE > 0 or PROFILE_HEADER_ENABLED
+
+# cProfile can only run once per process on newer Pythons; concurrent profiled
+# requests fall back to the stack sampler alone
+_cprofile_lock = threading.Lock()
+_seq = itertools.count(1)
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, thread_id: int, interval: float) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}:{code.co_firstlineno}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def _wants_profile() -> bool:
+    if PROFILE_HEADER_ENABLED and request.headers.get("X-Profile") == "1":
+        token = request.args.get("token") or request.headers.get("X-Token")
+        if not ACCESS_TOKEN or token == ACCESS_TOKEN:
+            return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _prune_profiles() -> None:
+    files = sorted(PROFILE_DIR.glob("*.collapsed"), key=lambda f: f.stat().st_mtime)
+    for old in files[: max(0, len(files) - PROFILE_MAX_FILES)]:
+        for f in (old, old.with_suffix(".prof")):
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+
+def _start_profile() -> None:
+    if not _wants_profile():
+        return
+
+    profiler: Optional[cProfile.Profile] = None
+    if PROFILE_MODE == "cprofile" and _cprofile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler (e.g. a debugger) is active
+            profiler = None
+            _cprofile_lock.release()
+
+    sampler = _StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000)
+    sampler.start()
+    g._profile = (time.perf_counter(), profiler, sampler)
+    g._profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{next(_seq):06d}"
+
+
+def _tag_response(response):
+    profile_id = g.get("_profile_id")
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def _finish_profile(_exc) -> None:
+    state = g.pop("_profile", None)
+    if state is None:
+        return
+    t0, profiler, sampler = state
+    elapsed_ms = int((time.perf_counter() - t0) * 1000)
+    if profiler is not None:
+        profiler.disable()
+        _cprofile_lock.release()
+    sampler.stop()
+
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stem = f"{g.pop('_profile_id')}_{request.endpoint or 'unmatched'}_{elapsed_ms}ms"
+        (PROFILE_DIR / f"{stem}.collapsed").write_text(
+            "".join(f"{stack} {n}\n" for stack, n in sampler.stacks.most_common())
+        )
+        if profiler is not None:
+            profiler.dump_stats(str(PROFILE_DIR / f"{stem}.prof"))
+        _prune_profiles()
+    except OSError as e:
+        print(f"Could not write request profile: {e}")
+
+
+if PROFILING_ENABLED:
+    app.before_request(_start_profile)
+    app.after_request(_tag_response)
+    app.teardown_request(_finish_profile)
@@ -0,0 +1,48 @@
+from flask import Response, abort, request
+
+from config import SERVICE_WORKER, app
+from static_assets import Asset, get_asset, named_asset
+
+
+def _send_asset(a: Asset, cache_control: str) -> Response:
+    """
+    Bodies were pre-compressed at startup; pick the best one the client accepts.
+    """
+    accepted = request.accept_encodings
+    encoding = "identity"
+    for enc in ("br", "gzip"):
+        if enc in a.bodies and accepted[enc]:
+            encoding = enc
+            break
+
+    resp = Response(a.bodies[encoding], mimetype=a.mimetype)
+    if encoding != "identity":
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = cache_control
+    resp.set_etag(f"{a.etag}-{encoding}")
+    return resp.make_conditional(request)
+
+
+@app.route("/assets/<name>")
+def asset(name):
+    """
+    Page-shell CSS/JS. URLs carry a content hash, so responses are cacheable forever
+    and need no token.
+    """
+    a = get_asset(name)
+    if a is None:
+        abort(404, "Not found")
+    return _send_asset(a, "public, max-age=31536000, immutable")
+
+
+@app.route("/sw.js")
+def service_worker():
+    """
+    The service worker. It has to live at the root to control every page, so its URL
+    cannot carry a hash; browsers revalidate it on each visit and pick up new versions.
+    """
+    a = named_asset("sw.js")
+    if not SERVICE_WORKER or a is None:
+        abort(404, "Not found")
+    return _send_asset(a, "no-cache")
@@ -1,14 +1,58 @@
+import hashlib
+import html
 import mimetypes
-from io import BytesIO
 from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 from urllib.parse import quote
 
-from flask import Response, abort, send_file
+from flask import Response, abort, request, send_file
 
+import image_meta
+import stat_cache
+import video_meta
 from auth_utils import require_token, safe_resolve
-from config import ACCESS_TOKEN, HEIF_OK, Image, app, root_path
-from media_utils import format_size, is_image, is_media, is_video
-from view_utils import VIEW_LABELS, VIEW_SIZES, get_view_type, html_page, view_link
+from config import ACCESS_TOKEN, LIVE_UPDATES, THUMB_CACHE_DIR, app, root_path
+from dir_cache import ListingEntry, list_dir, list_media
+from image_meta import ImageMeta
+from image_pool import render_preview
+from imaging import heif_available, pillow_available
+from media_utils import format_size, is_image, is_video
+from search_index import folder_totals, index_status
+from thumb_cache import (
+    PREVIEW_EXTS,
+    PREVIEW_TIERS,
+    cache_key_for_preview,
+    ensure_thumb_cache_dir,
+    preview_needed,
+    preview_tier,
+    queue_thumb_warmup,
+    record_thumb,
+)
+from routes_thumbs import send_cached
+from tracing import span
+from video_meta import VideoMeta
+from view_utils import (
+    ORIENTATIONS,
+    SORT_LABELS,
+    VIEW_LABELS,
+    VIEW_SIZES,
+    get_filters,
+    get_sort,
+    get_view_type,
+    html_page,
+    listing_query,
+    view_link,
+)
+
+
+def _page_response(title: str, body: str) -> Response:
+    """
+    The page with an ETag of its content, so revalidating an unchanged page (as the
+    service worker does) costs a 304 instead of the whole listing.
+    """
+    resp = Response(html_page(title, body), mimetype="text/html")
+    resp.add_etag()
+    return resp.make_conditional(request)
 
 
 @app.route("/")
@@ -22,24 +66,18 @@ def get_prev_next(rel_file: str):
     fpath = safe_resolve(rel_norm)
     folder = fpath.parent
 
-    media_files = []
-    for p in folder.iterdir():
-        if p.is_file() and is_media(p):
-            media_files.append(p)
-
-    media_files.sort(key=lambda x: x.name.lower())
-
+    media_files = list_media(folder)
     try:
-        idx = next(i for i, p in enumerate(media_files) if p.resolve() == fpath.resolve())
-    except StopIteration:
+        idx = media_files.index(fpath.name)
+    except ValueError:
         return None, None
 
     prev_rel = None
     next_rel = None
     if idx > 0:
-        prev_rel = str(media_files[idx - 1].relative_to(root_path)).replace("\\", "/")
+        prev_rel = str((folder / media_files[idx - 1]).relative_to(root_path)).replace("\\", "/")
     if idx < len(media_files) - 1:
-        next_rel = str(media_files[idx + 1].relative_to(root_path)).replace("\\", "/")
+        next_rel = str((folder / media_files[idx + 1]).relative_to(root_path)).replace("\\", "/")
     return prev_rel, next_rel
 
 
@@ -49,14 +87,20 @@ def browse(rel):
     view = get_view_type()
 
     folder = safe_resolve(rel)
-    if not folder.exists():
+    if not stat_cache.exists(folder):
         abort(404, "Not found")
-    if folder.is_file():
+    if stat_cache.is_file(folder):
         return file_view(rel)
 
     rel_norm = rel.strip("/")
     title = "Local File Browser"
 
+    # listing, in the requested order and filtered by the image index
+    sort, desc = get_sort()
+    filters = get_filters()
+    listing, images, videos, unindexed, cameras = visible_listing(folder, sort, desc, filters)
+    query = listing_query()
+
     # parent link
     if rel_norm:
         parent = str(Path(rel_norm).parent).replace("\\", "/")
@@ -67,16 +111,49 @@ def browse(rel):
 
     # toolbar (view switch)
     view_options = "\n".join(
-        f"<option value='{view_link(rel_norm, v)}' {'selected' if v == view else ''}>"
+        f"<option value='{view_link(rel_norm, v, query)}' {'selected' if v == view else ''}>"
         f"{v}: {VIEW_LABELS[v]}</option>"
         for v in [1, 2, 3, 4, 5, 6]
     )
+    sort_options = "\n".join(
+        f"<option value='{view_link(rel_norm, view, listing_query(sort=k, desc=d))}' "
+        f"{'selected' if (k, d == '1') == (sort, desc) else ''}>{label}{' ↓' if d else ''}</option>"
+        for k, label in SORT_LABELS.items()
+        for d in ("", "1")
+    )
+    camera_options = "".join(
+        f"<option {'selected' if c == filters.get('camera') else ''}>{html.escape(c)}</option>"
+        for c in cameras
+    )
+    orient_options = "".join(
+        f"<option value='{o}' {'selected' if o == filters.get('orient') else ''}>{o.title()}</option>"
+        for o in ORIENTATIONS
+    )
+    clear_filters = (
+        f"<a class='btn' href='{view_link(rel_norm, view, listing_query(**dict.fromkeys(filters, '')))}'>Clear</a>"
+        if filters
+        else ""
+    )
 
     toolbar = f"""
     <div class="toolbar">
       {up}
       <div class="spacer"></div>
+
+      <form method="GET" action="/search" style="display:flex; gap:8px;">
+        <input type="hidden" name="token" value="{ACCESS_TOKEN}">
+        <input type="hidden" name="view" value="{view}">
+        <input type="hidden" name="in" value="{html.escape(rel_norm)}">
+        <input class="btn" style="padding:8px 10px;" name="q" placeholder="Search this folder">
+      </form>
     
+      <label class="muted" style="display:flex; align-items:center; gap:8px;">
+        Sort:
+        <select class="btn" style="padding:8px 10px;" onchange="location.href=this.value">
+          {sort_options}
+        </select>
+      </label>
+
       <label class="muted" style="display:flex; align-items:center; gap:8px;">
         View:
         <select class="btn" style="padding:8px 10px;" onchange="location.href=this.value">
@@ -84,6 +161,24 @@ def browse(rel):
         </select>
       </label>
     </div>
+
+    <form class="toolbar" method="GET" action="{'/browse/' + quote(rel_norm) if rel_norm else '/'}">
+      <input type="hidden" name="token" value="{ACCESS_TOKEN}">
+      <input type="hidden" name="view" value="{view}">
+      <input type="hidden" name="sort" value="{sort}">
+      <input type="hidden" name="desc" value="{'1' if desc else ''}">
+      <span class="muted">Photos:</span>
+      <select class="btn" style="padding:8px 10px;" name="camera">
+        <option value="">Any camera</option>{camera_options}
+      </select>
+      <label class="muted">Taken from <input class="btn" type="date" name="from" value="{html.escape(filters.get('from', ''))}"></label>
+      <label class="muted">to <input class="btn" type="date" name="to" value="{html.escape(filters.get('to', ''))}"></label>
+      <select class="btn" style="padding:8px 10px;" name="orient">
+        <option value="">Any shape</option>{orient_options}
+      </select>
+      <button class="btn" type="submit">Filter</button>
+      {clear_filters}
+    </form>
     """
 
     zip_action = f"/download-zip?token={quote(ACCESS_TOKEN)}"
@@ -107,27 +202,170 @@ def browse(rel):
       <span class="muted">Tip: browser may ask permission for multiple downloads.</span>
     """
 
-    # list directory
-    entries = []
-    for p in sorted(folder.iterdir(), key=lambda x: (x.is_file(), x.name.lower())):
-        try:
-            stat = p.stat()
-        except OSError:
-            continue
+    with span("totals"):
+        totals, pending = totals_for(folder)
+
+    has_pillow = pillow_available()
+
+    with span("entries"):
+        entries = listing_entries(folder, listing, view, query, {**images, **videos}, totals, pending)
+
+    indexing_note = (
+        f"<p class='muted'>Reading photo details: {unindexed} images not indexed yet "
+        "(listed last / not matched until then).</p>"
+        if unindexed and (filters or sort in ("taken", "pixels"))
+        else ""
+    )
+
+    own = totals.get("")
+    current_totals = f" • {format_size(own[0])} in {own[1]} files ({own[2]} media)" if own else ""
+
+    header = f"""
+    <h2>{title}</h2>
+    <p class="muted">Root: <span class="path">{root_path}</span></p>
+    <p class="muted">Current: <span class="path">/{rel_norm}</span>{current_totals}</p>
+    {indexing_note}
+    """
+
+    with span("render"):
+        rendered = "".join(render_entry(e, view, has_pillow) for e in entries)
+    # the page script follows changes to this folder over /events (routes_events.py)
+    live = (
+        f'data-live="/events/{quote(rel_norm)}?token={quote(ACCESS_TOKEN)}&view={view}{query}'
+        f'&since={listing_fingerprint(listing)}"'
+        if LIVE_UPDATES
+        else ""
+    )
+
+    # View rendering
+    if view in (1, 2, 3, 4):
+        cell = {1: 260, 2: 190, 3: 140, 4: 120}[view]
+        thumb = VIEW_SIZES[view]
+
+        body = f"""
+        {header}
+        {toolbar}
+        {selectbar_open}
+        <div class="grid" style="--cell:{cell}px; --thumb:{thumb}px;" {live}>
+          {rendered}
+        </div>
+        </form>
+        """
+
+    elif view == 5:
+        # List view
+        body = f"""
+        {header}
+        {toolbar}
+        {selectbar_open}
+        <div class="list" {live}>
+          {rendered}
+        </div>
+        </form>
+        """
+
+    else:
+        # Details view (table)
+        body = f"""
+        {header}
+        {toolbar}
+        {selectbar_open}
+        <table>
+          <thead><tr><th></th><th>Name</th><th>Type</th><th>Size</th></tr></thead>
+          <tbody {live}>{rendered}</tbody>
+        </table>
+        </form>
+        """
+
+    return _page_response("Browse", body)
+
+
+class VisibleListing(NamedTuple):
+    entries: List[ListingEntry]
+    images: Dict[str, ImageMeta]
+    videos: Dict[str, VideoMeta]
+    unindexed: int  # images not in the index yet
+    cameras: List[str]  # for the camera filter
+
+
+def visible_listing(folder: Path, sort: str, desc: bool, filters: Dict[str, str]) -> VisibleListing:
+    """
+    A folder's entries in the requested order and filtered by the image index, with the
+    details shown next to them.
+    """
+    with span("list_dir"):
+        listing = list_dir(folder)
+    with span("image_meta"):
+        images, unindexed = image_meta.folder_meta(folder, listing)
+    with span("video_meta"):
+        videos = video_meta.folder_meta(folder, listing)
+    cameras = sorted({m.camera for m in images.values() if m.camera})
+    with span("sort", entries=len(listing)):
+        listing = _sort_listing(listing, sort, desc, images)
+        if filters:
+            listing = [e for e in listing if e.is_dir or _matches(images.get(e.name), filters)]
+    return VisibleListing(listing, images, videos, unindexed, cameras)
+
+
+def totals_for(folder: Path) -> Tuple[Dict[str, tuple], str]:
+    """
+    Recursive totals of folder ("") and its subfolders, filled in by the background
+    indexer (search_index.py), and what to show while they are not known yet.
+    """
+    folder_rel = "" if folder == root_path else str(folder.relative_to(root_path)).replace("\\", "/")
+    status = index_status()
+    pending = "computing…" if status["running"] or status["indexed_at"] else ""
+    return folder_totals(folder_rel), pending
+
+
+def content_version(size: int, mtime_ns: int) -> str:
+    """
+    Changes whenever the file does. Thumbnail and preview URLs carry it (v=), so a
+    client can keep those responses until the URL changes (assets/sw.js).
+    """
+    return f"{mtime_ns:x}-{size:x}"
 
-        name = p.name
+
+def listing_fingerprint(listing: List[ListingEntry]) -> str:
+    """
+    Changes whenever an entry is added, removed or rewritten, or the order changes.
+    """
+    h = hashlib.sha1()
+    for e in listing:
+        h.update(f"{e.name}\0{e.size}\0{e.mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return h.hexdigest()[:16]
+
+
+def listing_entries(
+    folder: Path,
+    listing: List[ListingEntry],
+    view: int,
+    query: str,
+    details: Dict[str, Union[ImageMeta, VideoMeta]],
+    totals: Dict[str, tuple],
+    pending: str,
+) -> List[dict]:
+    """
+    What the views show per entry: link, type line (with image/video details), size
+    (recursive totals for folders).
+    """
+    entries = []
+    for item in listing:
+        p = folder / item.name
+        name = item.name
         rel_child = str(p.relative_to(root_path)).replace("\\", "/")
         url_rel = quote(rel_child)
-        link = f"/browse/{url_rel}?token={quote(ACCESS_TOKEN)}&view={view}"
+        link = f"/browse/{url_rel}?token={quote(ACCESS_TOKEN)}&view={view}{query}"
 
-        if p.is_dir():
+        if item.is_dir:
+            t = totals.get(name)
             entries.append(
                 {
                     "kind": "dir",
                     "name": name,
                     "link": link,
-                    "type": "Folder",
-                    "size": "",
+                    "type": f"Folder • {t[1]} files ({t[2]} media)" if t else "Folder",
+                    "size": format_size(t[0]) if t else pending,
                     "rel": rel_child,
                     "path": p,
                 }
@@ -135,166 +373,218 @@ def browse(rel):
         else:
             mt, _ = mimetypes.guess_type(str(p))
             mt = mt or "application/octet-stream"
+            d = details.get(name)
+            if d is not None and d.describe():
+                mt = f"{mt} • {d.describe()}"
             entries.append(
                 {
                     "kind": "file",
                     "name": name,
                     "link": link,
                     "type": mt,
-                    "size": format_size(stat.st_size),
+                    "size": format_size(item.size),
                     "rel": rel_child,
+                    "version": content_version(item.size, item.mtime_ns),
                     "path": p,
                 }
             )
+    return entries
 
-    header = f"""
-    <h2>{title}</h2>
-    <p class="muted">Root: <span class="path">{root_path}</span></p>
-    <p class="muted">Current: <span class="path">/{rel_norm}</span></p>
-    """
 
-    # View rendering
+def render_entry(e: dict, view: int, has_pillow: bool) -> str:
+    """
+    One card (views 1-4), list item (5) or table row (6). data-rel lets the page script
+    replace or remove it when the folder changes.
+    """
+    # names and EXIF/ffprobe details come from the files, so they are escaped
+    data_rel = f'data-rel="{html.escape(e["rel"])}"'
+    name, kind_text, rel_attr = html.escape(e["name"]), html.escape(e["type"]), html.escape(e["rel"])
     if view in (1, 2, 3, 4):
-        cell = {1: 260, 2: 190, 3: 140, 4: 120}[view]
         thumb = VIEW_SIZES[view]
+        if e["kind"] == "dir":
+            check = ""
+            thumb_html = f"<div class='thumb' style='height:{thumb}px'>📁</div>"
+            meta = f"Folder • {e['size']}" if e["size"] else "Folder"
+        else:
+            check = (
+                f"<input class='check filecheck' type='checkbox' name='files' value='{rel_attr}'>"
+            )
+            p = e["path"]
 
-        cards = []
-        for e in entries:
-            if e["kind"] == "dir":
-                check = ""
-                thumb_html = f"<div class='thumb' style='height:{thumb}px'>📁</div>"
-                meta = "Folder"
-            else:
-                check = (
-                    f"<input class='check filecheck' type='checkbox' name='files' value='{e['rel']}'>"
+            if is_image(p) and has_pillow:
+                tlink = f"/thumb/{quote(e['rel'])}?token={quote(ACCESS_TOKEN)}&s={thumb}&v={e['version']}"
+                thumb_html = (
+                    f"<div class='thumb' style='height:{thumb}px'>"
+                    f"<img loading='lazy' src='{tlink}' alt='thumb'></div>"
                 )
-                p = e["path"]
-
-                if is_image(p) and Image is not None:
-                    tlink = f"/thumb/{quote(e['rel'])}?token={quote(ACCESS_TOKEN)}&s={thumb}"
-                    thumb_html = (
-                        f"<div class='thumb' style='height:{thumb}px'>"
-                        f"<img loading='lazy' src='{tlink}' alt='thumb'></div>"
-                    )
-                elif is_video(p):
-                    vt = f"/vthumb/{quote(e['rel'])}?token={quote(ACCESS_TOKEN)}&s={thumb}"
-                    thumb_html = (
-                        f"<div class='thumb' style='height:{thumb}px'>"
-                        f"<img loading='lazy' src='{vt}' alt='video thumb'></div>"
-                    )
-                else:
-                    thumb_html = f"<div class='thumb' style='height:{thumb}px'>📄</div>"
-
-                meta = f"{e['type']} • {e['size']}"
-
-            cards.append(
-                f"""
-                <div class="card cardwrap">
+            elif is_video(p):
+                vt = f"/vthumb/{quote(e['rel'])}?token={quote(ACCESS_TOKEN)}&s={thumb}&v={e['version']}"
+                thumb_html = (
+                    f"<div class='thumb' style='height:{thumb}px'>"
+                    f"<img loading='lazy' src='{vt}' alt='video thumb'></div>"
+                )
+            else:
+                thumb_html = f"<div class='thumb' style='height:{thumb}px'>📄</div>"
+
+            meta = f"{kind_text} • {e['size']}"
+
+        return f"""
+                <div class="card cardwrap" {data_rel}>
                   {check}
                   <a href="{e['link']}" style="display:block">
                     {thumb_html}
-                    <div class="name">{'📁 ' if e['kind']=='dir' else ''}{e['name']}</div>
+                    <div class="name">{'📁 ' if e['kind']=='dir' else ''}{name}</div>
                     <div class="meta">{meta}</div>
                   </a>
                 </div>
                 """
-            )
-
-        body = f"""
-        {header}
-        {toolbar}
-        {selectbar_open}
-        <div class="grid" style="--cell:{cell}px; --thumb:{thumb}px;">
-          {''.join(cards)}
-        </div>
-        </form>
-        """
 
-    elif view == 5:
-        # List view
-        items_html = []
-        for e in entries:
-            if e["kind"] == "dir":
-                check = ""
-                mini = "<div class='mini'>📁</div>"
-                sub = "Folder"
-            else:
-                check = (
-                    f"<input class='check filecheck' type='checkbox' name='files' value='{e['rel']}'>"
+    if view == 5:
+        if e["kind"] == "dir":
+            check = ""
+            mini = "<div class='mini'>📁</div>"
+            sub = f"{kind_text} • {e['size']}" if e["size"] else "Folder"
+        else:
+            check = (
+                f"<input class='check filecheck' type='checkbox' name='files' value='{rel_attr}'>"
+            )
+            p = e["path"]
+            if is_image(p) and has_pillow:
+                tlink = f"/thumb/{quote(e['rel'])}?token={quote(ACCESS_TOKEN)}&s=64&v={e['version']}"
+                mini = (
+                    f"<div class='mini'><img loading='lazy' src='{tlink}' alt='thumb'></div>"
                 )
-                p = e["path"]
-                if is_image(p) and Image is not None:
-                    tlink = f"/thumb/{quote(e['rel'])}?token={quote(ACCESS_TOKEN)}&s=64"
-                    mini = (
-                        f"<div class='mini'><img loading='lazy' src='{tlink}' alt='thumb'></div>"
-                    )
-                elif is_video(p):
-                    vt = f"/vthumb/{quote(e['rel'])}?token={quote(ACCESS_TOKEN)}&s=64"
-                    mini = f"<div class='mini'><img loading='lazy' src='{vt}' alt='video thumb'></div>"
-                else:
-                    mini = "<div class='mini'>📄</div>"
-                sub = f"{e['type']} • {e['size']}"
-
-            items_html.append(
-                f"""
-                <div class="list-item">
+            elif is_video(p):
+                vt = f"/vthumb/{quote(e['rel'])}?token={quote(ACCESS_TOKEN)}&s=64&v={e['version']}"
+                mini = f"<div class='mini'><img loading='lazy' src='{vt}' alt='video thumb'></div>"
+            else:
+                mini = "<div class='mini'>📄</div>"
+            sub = f"{kind_text} • {e['size']}"
+
+        return f"""
+                <div class="list-item" {data_rel}>
                   {check}
                   <a style="display:flex; gap:10px; align-items:center; flex:1" href="{e['link']}">
                     {mini}
                     <div>
-                      <div class="title">{'📁 ' if e['kind']=='dir' else ''}{e['name']}</div>
+                      <div class="title">{'📁 ' if e['kind']=='dir' else ''}{name}</div>
                       <div class="sub">{sub}</div>
                     </div>
                   </a>
                 </div>
                 """
-            )
 
-        body = f"""
-        {header}
-        {toolbar}
-        {selectbar_open}
-        <div class="list">
-          {''.join(items_html)}
-        </div>
-        </form>
-        """
+    checkbox_html = ""
+    icon = "📁 " if e["kind"] == "dir" else "📄 "
+    if e["kind"] != "dir":
+        checkbox_html = f"<input class='filecheck' type='checkbox' name='files' value='{rel_attr}'>"
+    return (
+        f"<tr {data_rel}>"
+        f"<td>{checkbox_html}</td>"
+        f"<td><a href='{e['link']}'>{icon}{name}</a></td>"
+        f"<td class='muted'>{kind_text}</td>"
+        f"<td class='muted'>{e['size']}</td>"
+        "</tr>\n"
+    )
 
-    else:
-        # Details view (table)
-        row_parts = []
-        for e in entries:
-            checkbox_html = ""
-            icon = "📁 " if e["kind"] == "dir" else "📄 "
-
-            if e["kind"] != "dir":
-                checkbox_html = (
-                    f"<input class='filecheck' type='checkbox' name='files' value='{e['rel']}'>"
-                )
 
-            row_parts.append(
-                "<tr>"
-                f"<td>{checkbox_html}</td>"
-                f"<td><a href='{e['link']}'>{icon}{e['name']}</a></td>"
-                f"<td class='muted'>{e['type']}</td>"
-                f"<td class='muted'>{e['size']}</td>"
-                "</tr>"
-            )
+def _sort_listing(
+    listing: List[ListingEntry], sort: str, desc: bool, images: Dict[str, ImageMeta]
+) -> List[ListingEntry]:
+    """
+    Folders stay first, by name. Files are ordered by the chosen key; files without a
+    value for it (not an image, or not indexed yet) follow, by name.
+    """
+    if sort == "name" and not desc:
+        return listing  # list_dir() order
+
+    def key(e: ListingEntry):
+        if sort == "size":
+            return e.size
+        if sort == "modified":
+            return e.mtime_ns
+        if sort == "name":
+            return e.name.lower()
+        m = images.get(e.name)
+        if m is None:
+            return None
+        if sort == "taken":
+            return m.taken
+        dims = m.dimensions
+        return dims[0] * dims[1] if dims else None
+
+    dirs = [e for e in listing if e.is_dir]
+    files = [e for e in listing if not e.is_dir and key(e) is not None]
+    rest = [e for e in listing if not e.is_dir and key(e) is None]
+    files.sort(key=key, reverse=desc)
+    return dirs + files + rest
+
+
+def _matches(m: Optional[ImageMeta], filters: Dict[str, str]) -> bool:
+    if m is None:
+        return False
+    if "camera" in filters and m.camera != filters["camera"]:
+        return False
+    day = (m.taken or "")[:10]
+    if "from" in filters and not (day and day >= filters["from"]):
+        return False
+    if "to" in filters and not (day and day <= filters["to"]):
+        return False
+    if "orient" in filters:
+        dims = m.dimensions
+        if dims is None:
+            return False
+        shape = "landscape" if dims[0] > dims[1] else "portrait" if dims[0] < dims[1] else "square"
+        if shape != filters["orient"]:
+            return False
+    return True
+
+
+def _preview_url(rel: str, width, version: str) -> str:
+    return f"/preview/{quote(rel)}?token={quote(ACCESS_TOKEN)}&w={width}&v={version}"
+
+
+def _image_src(fpath: Path, rel: str) -> str:
+    """
+    src/srcset attributes for the file view image: screen-sized preview tiers where
+    they help, the original otherwise.
+    """
+    if fpath.suffix.lower() not in PREVIEW_EXTS:
+        return f'src="/raw/{quote(rel)}?token={quote(ACCESS_TOKEN)}"'
+    st = stat_cache.stat(fpath)
+    version = content_version(st.st_size, st.st_mtime_ns)
+    srcset = ", ".join(f"{_preview_url(rel, t, version)} {t}w" for t in PREVIEW_TIERS)
+    return f'src="{_preview_url(rel, PREVIEW_TIERS[1], version)}" srcset="{srcset}" sizes="100vw"'
 
-        rows = "\n".join(row_parts)
 
-        body = f"""
-        {header}
-        {toolbar}
-        {selectbar_open}
-        <table>
-          <thead><tr><th></th><th>Name</th><th>Type</th><th>Size</th></tr></thead>
-          <tbody>{rows}</tbody>
-        </table>
-        </form>
-        """
+def _neighbour_hints(prev_rel, next_rel, prev_link, next_link) -> str:
+    """
+    Prefetch hints for Prev/Next: their pages, and image previews at the tier this
+    screen uses (picked by app.js). The server renders those previews in the background
+    right away, at the tier the client reported in the preview_w cookie.
+    """
+    try:
+        tier = preview_tier(int(request.cookies.get("preview_w", PREVIEW_TIERS[1])))
+    except ValueError:
+        tier = PREVIEW_TIERS[1]
 
-    return Response(html_page("Browse", body), mimetype="text/html")
+    hints, previews = [], []
+    for rel_n, link in ((next_rel, next_link), (prev_rel, prev_link)):
+        if not rel_n:
+            continue
+        hints.append(f'<link rel="prefetch" href="{link}">')
+        npath = safe_resolve(rel_n)
+        if npath.suffix.lower() in PREVIEW_EXTS:
+            st = stat_cache.stat(npath)
+            previews.append(_preview_url(rel_n, "{w}", content_version(st.st_size, st.st_mtime_ns)))
+            if preview_needed(npath, tier):
+                queue_thumb_warmup(npath, (tier,))
+    if previews:
+        tiers = ",".join(str(t) for t in PREVIEW_TIERS)
+        hints.append(
+            f'<div id="neighbours" hidden data-tiers="{tiers}" data-previews="{" ".join(previews)}"></div>'
+        )
+    return "\n".join(hints)
 
 
 def file_view(rel):
@@ -302,7 +592,7 @@ def file_view(rel):
     view = get_view_type()
 
     fpath = safe_resolve(rel)
-    if not fpath.exists() or not fpath.is_file():
+    if not stat_cache.is_file(fpath):
         abort(404, "Not found")
 
     rel_norm = rel.strip("/").replace("\\", "/")
@@ -337,12 +627,12 @@ def file_view(rel):
     )
     nav_buttons += "</div>"
 
-    size = format_size(fpath.stat().st_size)
+    size = format_size(stat_cache.stat(fpath).st_size)
     mt, _ = mimetypes.guess_type(str(fpath))
     mt = mt or "application/octet-stream"
 
     if is_image(fpath):
-        if fpath.suffix.lower() in {".heic", ".heif"} and not HEIF_OK:
+        if fpath.suffix.lower() in {".heic", ".heif"} and not heif_available():
             preview_html = """
             <div class="preview">
               <h3>Preview (Image)</h3>
@@ -355,10 +645,15 @@ def file_view(rel):
               <h3>Preview (Image)</h3>
               {nav_buttons}
               <div style="height:10px"></div>
-              <img src="{raw_link}" alt="image preview" />
+              <img {_image_src(fpath, rel_norm)} alt="image preview" />
             </div>
             """
     elif is_video(fpath):
+        vm = video_meta.lookup(fpath)
+        if vm is None:
+            video_meta.queue_folder(fpath.parent)
+        elif vm.describe():
+            mt = f"{mt} • {vm.describe()}"
         preview_html = f"""
         <div class="preview">
           <h3>Preview (Video)</h3>
@@ -379,7 +674,7 @@ def file_view(rel):
     <p><a class="btn" href="{parent_link}">⬅ Back</a></p>
     <h2>📄 {fpath.name}</h2>
     <p class="muted">Path: <span class="path">/{rel_norm}</span></p>
-    <p class="muted">Type: {mt} • Size: {size}</p>
+    <p class="muted">Type: {html.escape(mt)} • Size: {size}</p>
 
     <p>
       <a class="btn" href="{download_link}">⬇ Download</a>
@@ -387,8 +682,9 @@ def file_view(rel):
     </p>
 
     {preview_html}
+    {_neighbour_hints(prev_rel, next_rel, prev_link, next_link)}
     """
-    return Response(html_page(fpath.name, body), mimetype="text/html")
+    return _page_response(fpath.name, body)
 
 
 @app.route("/raw/<path:rel>")
@@ -400,25 +696,27 @@ def raw(rel):
     """
     require_token()
     fpath = safe_resolve(rel)
-    if not fpath.exists() or not fpath.is_file():
+    if not stat_cache.is_file(fpath):
         abort(404, "Not found")
 
     ext = fpath.suffix.lower()
     if ext in {".heic", ".heif"}:
-        if not HEIF_OK or Image is None:
+        if not heif_available():
             abort(415, "HEIC/HEIF preview requires: pip install pillow pillow-heif")
-        with Image.open(fpath) as im:  # type: ignore[call-arg]
-            if im.mode != "RGB":
-                im = im.convert("RGB")
-            buf = BytesIO()
-            im.save(buf, format="JPEG", quality=90, optimize=True)
-            buf.seek(0)
-            return send_file(
-                buf,
-                mimetype="image/jpeg",
-                as_attachment=False,
-                download_name=fpath.stem + ".jpg",
-            )
+        # converted once by an image worker, then served from the thumbnail cache
+        ensure_thumb_cache_dir()
+        cached = THUMB_CACHE_DIR / f"{cache_key_for_preview(fpath)}.jpg"
+        resp = send_cached(cached, download_name=fpath.stem + ".jpg")
+        if resp is not None:
+            return resp
+        with span("heic_convert"):
+            record_thumb(fpath, cached, render_preview(fpath, cached))
+        return send_file(
+            cached,
+            mimetype="image/jpeg",
+            as_attachment=False,
+            download_name=fpath.stem + ".jpg",
+        )
 
     return send_file(fpath, as_attachment=False)
 
@@ -4,8 +4,10 @@ import zipfile
 
 from flask import after_this_request, abort, request, send_file
 
+import stat_cache
 from auth_utils import require_token, safe_resolve
 from config import app
+from tracing import span
 
 
 @app.route("/download-zip", methods=["POST"])
@@ -25,7 +27,7 @@ def download_zip():
     os.close(fd)  # close the OS handle; ZipFile will open it
 
     try:
-        with zipfile.ZipFile(
+        with span("zip_build", files=len(rels)), zipfile.ZipFile(
             zip_path,
             mode="w",
             compression=zipfile.ZIP_DEFLATED,
@@ -34,9 +36,10 @@ def download_zip():
             for rel in rels:
                 rel_norm = rel.strip("/").replace("\\", "/")
                 fpath = safe_resolve(rel_norm)
-                if not fpath.exists() or not fpath.is_file():
+                if not stat_cache.is_file(fpath):
                     continue
-                z.write(fpath, arcname=rel_norm)
+                with span("zip_add"):
+                    z.write(fpath, arcname=rel_norm)
     except Exception:
         # Cleanup if zip creation fails
         try:
@@ -66,7 +69,7 @@ def download_zip():
 def download(rel):
     require_token()
     fpath = safe_resolve(rel)
-    if not fpath.exists() or not fpath.is_file():
+    if not stat_cache.is_file(fpath):
         abort(404, "Not found")
     return send_file(fpath, as_attachment=True, download_name=fpath.name)
 
@@ -0,0 +1,131 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from flask import Response, abort, request
+
+import folder_events
+import stat_cache
+from auth_utils import require_token, safe_resolve
+from config import LIVE_POLL_SECONDS, app, root_path
+from dir_cache import ListingEntry
+from fs_watcher import watch_mode
+from imaging import pillow_available
+from metrics import LIVE_STREAMS
+from routes_browse import listing_entries, listing_fingerprint, render_entry, totals_for, visible_listing
+from view_utils import get_filters, get_sort, get_view_type, listing_query
+
+_HEARTBEAT_SECONDS = 15.0  # comment lines that keep proxies from closing idle streams
+_RETRY_MS = 5000
+
+
+def _event(name: str, data: dict, event_id: str = "") -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def _rel(folder: Path, name: str) -> str:
+    return str((folder / name).relative_to(root_path)).replace("\\", "/")
+
+
+def _delta(folder: Path, old: List[ListingEntry], vis, view: int, query: str) -> Dict[str, list]:
+    """
+    Entries to remove, and entries to (re)insert rendered for the page's view, each
+    with the entry it goes before ("before": null = at the end).
+    """
+    previous = {e.name: e for e in old}
+    names = [e.name for e in vis.entries]
+    following = dict(zip(names, names[1:]))
+    changed = [e for e in vis.entries if previous.get(e.name) != e]
+    removed = previous.keys() - set(names)
+
+    totals, pending = totals_for(folder)
+    has_pillow = pillow_available()
+    upsert = []
+    for e in listing_entries(folder, changed, view, query, {**vis.images, **vis.videos}, totals, pending):
+        nxt = following.get(e["name"])
+        upsert.append(
+            {
+                "rel": e["rel"],
+                "html": render_entry(e, view, has_pillow),
+                "before": _rel(folder, nxt) if nxt else None,
+            }
+        )
+    return {"removed": [_rel(folder, n) for n in sorted(removed)], "upsert": upsert}
+
+
+def _folder_stamp(folder: Path) -> tuple:
+    """
+    Changes when an entry of folder is added, removed or renamed (one stat, unlike a
+    listing, which re-stats every entry while the watcher is off).
+    """
+    st = os.stat(folder)
+    return st.st_mtime_ns, st.st_ctime_ns
+
+
+def _stream(folder: Path, view: int, sort: str, desc: bool, filters, query: str, since: str) -> Iterator[str]:
+    LIVE_STREAMS.inc()
+    try:
+        seen = folder_events.version(folder)
+        stamp = _folder_stamp(folder)
+        listing = visible_listing(folder, sort, desc, filters).entries
+        current = listing_fingerprint(listing)
+        yield f"retry: {_RETRY_MS}\n\n"
+        if since != current:
+            # changed between the page render (or the last event received) and now
+            yield _event("reload", {})
+            return
+
+        polling = watch_mode() == "off"
+        timeout = min(_HEARTBEAT_SECONDS, LIVE_POLL_SECONDS) if polling else _HEARTBEAT_SECONDS
+        while True:
+            # fs_watcher has invalidated the caches before the version changes
+            v = folder_events.wait_for_change(folder, seen, timeout)
+            try:
+                # while polling, only a changed folder stamp is worth a new listing
+                new_stamp = _folder_stamp(folder) if polling or v != seen else stamp
+                if v == seen and new_stamp == stamp:
+                    vis = None
+                else:
+                    vis = visible_listing(folder, sort, desc, filters)
+            except OSError:
+                yield _event("reload", {})  # the folder itself is gone
+                return
+            if vis is None:
+                yield ": ping\n\n"
+                continue
+            seen, stamp = v, new_stamp
+            fingerprint = listing_fingerprint(vis.entries)
+            if fingerprint == current:
+                yield ": ping\n\n"
+                continue
+            delta = _delta(folder, listing, vis, view, query)
+            listing, current = vis.entries, fingerprint
+            yield _event("delta", delta, fingerprint)
+    finally:
+        LIVE_STREAMS.dec()
+
+
+@app.route("/events/", defaults={"rel": ""})
+@app.route("/events/<path:rel>")
+def events(rel):
+    """
+    Server-Sent Events for an open browse page: "delta" events carry the entries added,
+    changed or removed since the last event, rendered for the page's view, sort and
+    filters; "reload" asks for a full reload when the page is out of sync.
+    """
+    require_token()
+    folder = safe_resolve(rel)
+    if not stat_cache.is_dir(folder):
+        abort(404, "Not found")
+
+    sort, desc = get_sort()
+    # after a reconnect the browser reports the last event it got; else the page's listing
+    since = request.headers.get("Last-Event-ID") or request.args.get("since", "")
+    stream = _stream(folder, get_view_type(), sort, desc, get_filters(), listing_query(), since)
+    return Response(
+        stream,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
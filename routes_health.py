@@ -0,0 +1,23 @@
+from flask import jsonify
+
+from config import app
+from startup import pending_tasks, ready
+
+
+@app.route("/healthz")
+def healthz():
+    """
+    Liveness: the process is up and serving. No token needed.
+    """
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+def readyz():
+    """
+    Readiness: startup background work (imaging import, first cache maintenance pass)
+    has finished. 503 until then.
+    """
+    if ready.is_set():
+        return jsonify({"ready": True, "pending": []})
+    return jsonify({"ready": False, "pending": pending_tasks()}), 503
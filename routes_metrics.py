@@ -0,0 +1,45 @@
+import time
+
+from flask import Response, g, request
+
+from auth_utils import require_token
+from config import app
+from metrics import BYTES_SENT, IN_FLIGHT, REQUEST_SECONDS, render_all
+
+
+@app.before_request
+def _metrics_start():
+    g._metrics_t0 = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@app.after_request
+def _metrics_response(response):
+    g._metrics_status = str(response.status_code)
+    # send_file sets Content-Length (partial length for Range requests), so this counts
+    # streamed bytes without wrapping the file iterator
+    if response.content_length:
+        BYTES_SENT.inc(response.content_length, request.endpoint or "unmatched")
+    return response
+
+
+@app.teardown_request
+def _metrics_finish(_exc):
+    t0 = g.pop("_metrics_t0", None)
+    if t0 is None:
+        return
+    IN_FLIGHT.dec()
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - t0,
+        request.endpoint or "unmatched",
+        g.pop("_metrics_status", "500"),
+    )
+
+
+@app.route("/metrics")
+def metrics():
+    """
+    Prometheus text exposition. Send the token as ?token= or the X-Token header.
+    """
+    require_token()
+    return Response(render_all(), mimetype="text/plain; version=0.0.4")
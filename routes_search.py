@@ -0,0 +1,107 @@
+from html import escape
+from urllib.parse import quote, urlencode
+
+from flask import Response, jsonify, request
+
+from auth_utils import require_token
+from config import ACCESS_TOKEN, app
+from media_utils import format_size
+from search_index import KINDS, index_status, search as search_files
+from view_utils import get_view_type, html_page, view_link
+
+PER_PAGE = 100
+
+
+@app.route("/search")
+def search():
+    """
+    Filename search over the persistent index (see search_index.py).
+    Query params: q, kind (dir/image/video/other), in (folder to search below), page, format=json.
+    """
+    require_token()
+    view = get_view_type()
+
+    q = request.args.get("q", "").strip()
+    kind = request.args.get("kind", "")
+    under = request.args.get("in", "").strip("/")
+    try:
+        page = max(1, int(request.args.get("page", "1")))
+    except ValueError:
+        page = 1
+
+    total, rows = search_files(q, kind=kind or None, under=under, page=page, per_page=PER_PAGE)
+    status = index_status()
+
+    if request.args.get("format") == "json":
+        return jsonify(
+            {
+                "q": q,
+                "kind": kind,
+                "in": under,
+                "page": page,
+                "per_page": PER_PAGE,
+                "total": total,
+                "results": rows,
+                "index": status,
+            }
+        )
+
+    def page_link(n: int) -> str:
+        params = {"token": ACCESS_TOKEN, "q": q, "kind": kind, "in": under, "page": n, "view": view}
+        return "/search?" + urlencode(params)
+
+    kind_options = "\n".join(
+        f"<option value='{k}' {'selected' if k == kind else ''}>{k or 'any'}</option>"
+        for k in ("",) + KINDS
+    )
+
+    form = f"""
+    <form class="toolbar" method="GET" action="/search">
+      <a class="btn" href="{view_link(under, view)}">⬅ Back</a>
+      <input type="hidden" name="token" value="{escape(ACCESS_TOKEN or '')}">
+      <input type="hidden" name="view" value="{view}">
+      <input type="hidden" name="in" value="{escape(under)}">
+      <input class="btn" style="padding:8px 10px; min-width:240px;" name="q" value="{escape(q)}"
+             placeholder="Search file names" autofocus>
+      <select class="btn" style="padding:8px 10px;" name="kind">{kind_options}</select>
+      <button class="btn" type="submit">🔍 Search</button>
+    </form>
+    """
+
+    row_parts = []
+    for r in rows:
+        icon = "📁 " if r["kind"] == "dir" else "📄 "
+        link = f"/browse/{quote(r['rel'])}?token={quote(ACCESS_TOKEN)}&view={view}"
+        row_parts.append(
+            "<tr>"
+            f"<td><a href='{link}'>{icon}{escape(r['name'])}</a></td>"
+            f"<td class='muted path'>/{escape(r['rel'])}</td>"
+            f"<td class='muted'>{r['kind']}</td>"
+            f"<td class='muted'>{'' if r['kind'] == 'dir' else format_size(r['size'])}</td>"
+            "</tr>"
+        )
+
+    pages = (total + PER_PAGE - 1) // PER_PAGE
+    pager = ""
+    if pages > 1:
+        prev_html = f"<a class='btn' href='{page_link(page - 1)}'>⬅ Prev</a>" if page > 1 else ""
+        next_html = f"<a class='btn' href='{page_link(page + 1)}'>Next ➡</a>" if page < pages else ""
+        pager = f"<p>{prev_html} <span class='muted'>Page {page} of {pages}</span> {next_html}</p>"
+
+    note = ""
+    if status["indexed_at"] is None:
+        note = "<p class='muted'>The search index is still being built; results may be incomplete.</p>"
+
+    body = f"""
+    <h2>Search</h2>
+    <p class="muted">In: <span class="path">/{escape(under)}</span></p>
+    {form}
+    {note}
+    <p class="muted">{total} match{'es' if total != 1 else ''}</p>
+    <table>
+      <thead><tr><th>Name</th><th>Path</th><th>Kind</th><th>Size</th></tr></thead>
+      <tbody>{''.join(row_parts)}</tbody>
+    </table>
+    {pager}
+    """
+    return Response(html_page("Search", body), mimetype="text/html")
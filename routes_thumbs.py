@@ -1,12 +1,54 @@
-from flask import Response, abort, request, send_file
+from functools import partial
+from pathlib import Path
+from typing import Dict, Optional
 
+from flask import Response, abort, jsonify, request, send_file
+
+import stat_cache
+import thumb_failures
 from auth_utils import require_token, safe_resolve
-from config import app
-from media_utils import generate_thumb_bytes, generate_video_thumb_bytes, is_image, is_video
-from thumb_cache import cache_key_for_thumb, cache_key_for_vthumb, ensure_thumb_cache_dir
+from config import app, root_path
+from media_utils import Cancelled, is_image, is_video
+from metrics import THUMB_CACHE
+from thumb_cache import (
+    cache_key_for_thumb,
+    cache_key_for_vthumb,
+    ensure_thumb_cache_dir,
+    generate_and_store,
+    preview_needed,
+    preview_tier,
+)
+from thumb_queue import submit, wait
+from tracing import span
 from config import THUMB_CACHE_DIR
 
 
+def send_cached(cached: Path, download_name: Optional[str] = None) -> Optional[Response]:
+    """
+    The cached JPEG, or None when there is none. The stat cache can still list a file
+    that cache maintenance has just deleted, so a failed open counts as a miss.
+    """
+    if not stat_cache.exists(cached):
+        return None
+    try:
+        with span("send_cached"):
+            return send_file(
+                cached, mimetype="image/jpeg", as_attachment=False, download_name=download_name
+            )
+    except FileNotFoundError:
+        stat_cache.invalidate(cached)
+        return None
+
+
+def _placeholder(size: int, text: str) -> Response:
+    svg = f"""<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}">
+  <rect width="100%" height="100%" fill="#f3f4f6"/>
+  <text x="50%" y="50%" dominant-baseline="middle" text-anchor="middle" fill="#6b7280"
+        font-family="system-ui, Arial" font-size="{max(10, size//10)}">{text}</text>
+</svg>"""
+    return Response(svg, mimetype="image/svg+xml")
+
+
 @app.route("/thumb/<path:rel>")
 def thumb(rel):
     """
@@ -15,7 +57,7 @@ def thumb(rel):
     """
     require_token()
     fpath = safe_resolve(rel)
-    if not fpath.exists() or not fpath.is_file():
+    if not stat_cache.is_file(fpath):
         abort(404, "Not found")
 
     if not is_image(fpath):
@@ -28,28 +70,30 @@ def thumb(rel):
     size = max(32, min(size, 512))
 
     ensure_thumb_cache_dir()
-    key = cache_key_for_thumb(fpath, size)
+    with span("cache_key"):
+        key = cache_key_for_thumb(fpath, size)
     cached = THUMB_CACHE_DIR / f"{key}.jpg"
 
-    if cached.exists():
-        return send_file(cached, mimetype="image/jpeg", as_attachment=False)
+    resp = send_cached(cached)
+    if resp is not None:
+        THUMB_CACHE.inc(1, "image", "hit")
+        return resp
+    if thumb_failures.lookup(fpath, "image"):
+        THUMB_CACHE.inc(1, "image", "failed")
+        return _placeholder(size, "No thumb")
+    THUMB_CACHE.inc(1, "image", "miss")
 
+    job = submit(key, partial(generate_and_store, fpath, size, cached, False))
     try:
-        data, mt = generate_thumb_bytes(fpath, size)
+        with span("wait"):
+            cached = wait(job)
+    except Cancelled:
+        # client went away; nobody will read this
+        return Response(status=499)
     except Exception:
-        svg = f"""<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}">
-  <rect width="100%" height="100%" fill="#f3f4f6"/>
-  <text x="50%" y="50%" dominant-baseline="middle" text-anchor="middle" fill="#6b7280"
-        font-family="system-ui, Arial" font-size="{max(10, size//10)}">No thumb</text>
-</svg>"""
-        return Response(svg, mimetype="image/svg+xml")
-
-    try:
-        cached.write_bytes(data)
-    except Exception:
-        pass
+        return _placeholder(size, "No thumb")
 
-    return Response(data, mimetype=mt)
+    return send_file(cached, mimetype="image/jpeg", as_attachment=False)
 
 
 @app.route("/vthumb/<path:rel>")
@@ -59,7 +103,7 @@ def vthumb(rel):
     """
     require_token()
     fpath = safe_resolve(rel)
-    if not fpath.exists() or not fpath.is_file():
+    if not stat_cache.is_file(fpath):
         abort(404, "Not found")
 
     if not is_video(fpath):
@@ -72,26 +116,95 @@ def vthumb(rel):
     size = max(32, min(size, 512))
 
     ensure_thumb_cache_dir()
-    key = cache_key_for_vthumb(fpath, size)
+    with span("cache_key"):
+        key = cache_key_for_vthumb(fpath, size)
     cached = THUMB_CACHE_DIR / f"{key}.jpg"
 
-    if cached.exists():
-        return send_file(cached, mimetype="image/jpeg", as_attachment=False)
+    resp = send_cached(cached)
+    if resp is not None:
+        THUMB_CACHE.inc(1, "video", "hit")
+        return resp
+    if thumb_failures.lookup(fpath, "video"):
+        THUMB_CACHE.inc(1, "video", "failed")
+        return _placeholder(size, "No vthumb")
+    THUMB_CACHE.inc(1, "video", "miss")
 
+    job = submit(key, partial(generate_and_store, fpath, size, cached, True))
     try:
-        data, mt = generate_video_thumb_bytes(fpath, size)
+        with span("wait"):
+            cached = wait(job)
+    except Cancelled:
+        # client went away; nobody will read this
+        return Response(status=499)
     except Exception:
-        svg = f"""<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}">
-  <rect width="100%" height="100%" fill="#f3f4f6"/>
-  <text x="50%" y="50%" dominant-baseline="middle" text-anchor="middle" fill="#6b7280"
-        font-family="system-ui, Arial" font-size="{max(10, size//10)}">No vthumb</text>
-</svg>"""
-        return Response(svg, mimetype="image/svg+xml")
+        return _placeholder(size, "No vthumb")
+
+    return send_file(cached, mimetype="image/jpeg", as_attachment=False)
+
+
+@app.route("/preview/<path:rel>")
+def preview(rel):
+    """
+    Screen-sized JPEG for the file view: w (the display width in device pixels) is
+    snapped up to a PREVIEW_TIERS size, rendered once and cached like a thumbnail.
+    Originals that already fit, and formats that may be animated, are sent as they are.
+    """
+    require_token()
+    fpath = safe_resolve(rel)
+    if not stat_cache.is_file(fpath):
+        abort(404, "Not found")
+
+    if not is_image(fpath):
+        abort(415, "Not an image")
 
     try:
-        cached.write_bytes(data)
+        tier = preview_tier(int(request.args.get("w", "1920")))
+    except ValueError:
+        tier = preview_tier(1920)
+
+    if not preview_needed(fpath, tier):
+        return send_file(fpath, as_attachment=False)
+
+    ensure_thumb_cache_dir()
+    with span("cache_key"):
+        key = cache_key_for_thumb(fpath, tier)
+    cached = THUMB_CACHE_DIR / f"{key}.jpg"
+
+    resp = send_cached(cached)
+    if resp is not None:
+        THUMB_CACHE.inc(1, "preview", "hit")
+        return resp
+    if thumb_failures.lookup(fpath, "image"):
+        THUMB_CACHE.inc(1, "preview", "failed")
+        abort(415, "Preview not available")
+    THUMB_CACHE.inc(1, "preview", "miss")
+
+    job = submit(key, partial(generate_and_store, fpath, tier, cached, False))
+    try:
+        with span("wait"):
+            cached = wait(job)
+    except Cancelled:
+        return Response(status=499)
     except Exception:
-        pass
+        abort(415, "Preview not available")
+
+    return send_file(cached, mimetype="image/jpeg", as_attachment=False)
 
-    return Response(data, mimetype=mt)
 
+@app.route("/thumb-failures")
+def thumb_failure_report():
+    """
+    Files whose thumbnails could not be generated (answered with the placeholder until
+    THUMB_FAILURE_TTL expires), newest first, with counts per error type.
+    """
+    require_token()
+    failures = thumb_failures.recent()
+    counts: Dict[str, int] = {}
+    for f in failures:
+        try:
+            f["path"] = Path(f["path"]).relative_to(root_path).as_posix()
+        except ValueError:
+            pass
+        label = f"{f['kind']}: {f['error']}"
+        counts[label] = counts.get(label, 0) + 1
+    return jsonify({"count": len(failures), "by_error": counts, "failures": failures})
@@ -0,0 +1,295 @@
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import INDEX_DIR, SEARCH_REFRESH_SECONDS, root_path
+from db_utils import child_rel, connect, subtree_clause
+from fs_walk import DirScan, walk_tree
+from media_utils import is_image, is_video
+
+SEARCH_DB = INDEX_DIR / "search.sqlite3"
+KINDS = ("dir", "image", "video", "other")
+
+_refresh_lock = threading.Lock()
+_wake = threading.Event()
+_status = {"indexed_at": None, "last_scan_seconds": None, "dirs_rescanned": 0, "running": False}
+_forced: Set[str] = set()  # folders to re-list on the next pass even if their mtime is unchanged
+_schema_ready = False
+
+
+def _db():
+    global _schema_ready
+    conn = connect(SEARCH_DB)
+    if _schema_ready:
+        return conn
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS dirs (
+            rel TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            subdirs TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY,
+            rel TEXT NOT NULL UNIQUE,
+            parent TEXT NOT NULL,
+            name TEXT NOT NULL,
+            ext TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS dir_totals (
+            rel TEXT PRIMARY KEY,
+            bytes INTEGER NOT NULL,
+            files INTEGER NOT NULL,
+            media INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_parent ON files(parent);
+        CREATE INDEX IF NOT EXISTS files_kind ON files(kind);
+        CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+            name, content='files', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+            INSERT INTO files_fts(rowid, name) VALUES (new.id, new.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+            INSERT INTO files_fts(files_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END;
+        """
+    )
+    _schema_ready = True
+    return conn
+
+
+def kind_of(name: str, is_dir: bool) -> str:
+    if is_dir:
+        return "dir"
+    p = Path(name)
+    if is_image(p):
+        return "image"
+    if is_video(p):
+        return "video"
+    return "other"
+
+
+def _apply_scan(conn, scan: DirScan, old_subdirs: Optional[List[str]]) -> None:
+    # Subfolders that disappeared take their whole subtree with them
+    for gone in set(old_subdirs or []) - set(scan.subdirs):
+        sub = child_rel(scan.rel, gone)
+        conn.execute(f"DELETE FROM files WHERE {subtree_clause('rel')}", (sub, sub, sub))
+        conn.execute(f"DELETE FROM dirs WHERE {subtree_clause('rel')}", (sub, sub, sub))
+        conn.execute(f"DELETE FROM dir_totals WHERE {subtree_clause('rel')}", (sub, sub, sub))
+
+    conn.execute("DELETE FROM files WHERE parent = ?", (scan.rel,))
+    conn.executemany(
+        "INSERT INTO files(rel, parent, name, ext, kind, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                child_rel(scan.rel, e.name),
+                scan.rel,
+                e.name,
+                "" if e.is_dir else Path(e.name).suffix.lower(),
+                kind_of(e.name, e.is_dir),
+                e.size,
+                e.mtime_ns,
+            )
+            for e in scan.entries or []
+        ],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO dirs(rel, mtime_ns, subdirs) VALUES (?, ?, ?)",
+        (scan.rel, scan.mtime_ns, "\n".join(scan.subdirs)),
+    )
+
+
+def _parents(rel: str) -> Iterable[str]:
+    while rel:
+        rel = rel.rpartition("/")[0]
+        yield rel
+
+
+def _update_totals(conn, changed: Set[str]) -> None:
+    """
+    Recomputes recursive folder totals for the changed folders and their ancestors,
+    deepest first, so each folder only sums its own files plus its direct subfolders.
+    """
+    affected = set(changed)
+    for rel in changed:
+        affected.update(_parents(rel))
+
+    for rel in sorted(affected, key=lambda r: r.count("/") + (1 if r else 0), reverse=True):
+        own_bytes, own_files, own_media = conn.execute(
+            """
+            SELECT coalesce(sum(size), 0), count(*), coalesce(sum(kind IN ('image', 'video')), 0)
+            FROM files WHERE parent = ? AND kind != 'dir'
+            """,
+            (rel,),
+        ).fetchone()
+        sub_bytes, sub_files, sub_media = conn.execute(
+            """
+            SELECT coalesce(sum(t.bytes), 0), coalesce(sum(t.files), 0), coalesce(sum(t.media), 0)
+            FROM files f JOIN dir_totals t ON t.rel = f.rel
+            WHERE f.parent = ? AND f.kind = 'dir'
+            """,
+            (rel,),
+        ).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO dir_totals(rel, bytes, files, media) VALUES (?, ?, ?, ?)",
+            (rel, own_bytes + sub_bytes, own_files + sub_files, own_media + sub_media),
+        )
+
+
+def refresh_index(start_rel: str = "") -> int:
+    """
+    Incrementally brings the index (and the folder totals) up to date with the tree
+    below start_rel. Only directories whose mtime changed since the last pass, or that
+    were passed to request_refresh(), are re-listed.
+    Returns the number of directories that were re-listed.
+    """
+    with _refresh_lock:
+        _status["running"] = True
+        t0 = time.monotonic()
+        conn = _db()
+        stored: Dict[str, Tuple[int, List[str]]] = {
+            rel: (mtime_ns, subdirs.split("\n") if subdirs else [])
+            for rel, mtime_ns, subdirs in conn.execute("SELECT rel, mtime_ns, subdirs FROM dirs")
+        }
+        forced = set(_forced)
+        _forced.difference_update(forced)
+
+        def known(rel: str, mtime_ns: int) -> Optional[List[str]]:
+            prev = stored.get(rel)
+            if prev is not None and prev[0] == mtime_ns and rel not in forced:
+                return prev[1]
+            return None
+
+        changed: Set[str] = set()
+        try:
+            for scan in walk_tree(root_path, start_rel, known):
+                if scan.entries is None:
+                    continue
+                prev = stored.get(scan.rel)
+                _apply_scan(conn, scan, prev[1] if prev else None)
+                changed.add(scan.rel)
+                if len(changed) % 200 == 0:
+                    conn.commit()
+            if stored and conn.execute("SELECT 1 FROM dir_totals LIMIT 1").fetchone() is None:
+                changed.update(stored)  # index predates folder totals
+            _update_totals(conn, changed)
+            conn.commit()
+        finally:
+            _status["running"] = False
+
+        _status["indexed_at"] = time.time()
+        _status["last_scan_seconds"] = round(time.monotonic() - t0, 3)
+        _status["dirs_rescanned"] = len(changed)
+        return len(changed)
+
+
+def _fts_query(q: str) -> str:
+    # Every word must prefix-match a token of the name ("img 12" -> "img"* AND "12"*)
+    words = re.findall(r"\w+", q, flags=re.UNICODE)
+    return " AND ".join(f'"{w}"*' for w in words)
+
+
+def search(
+    q: str,
+    kind: Optional[str] = None,
+    under: str = "",
+    page: int = 1,
+    per_page: int = 50,
+) -> Tuple[int, List[dict]]:
+    """
+    Returns (total_matches, rows for the requested page), best matches first.
+    """
+    match = _fts_query(q)
+    if not match:
+        return 0, []
+
+    where = ["files_fts MATCH ?"]
+    params: list = [match]
+    if kind in KINDS:
+        where.append("f.kind = ?")
+        params.append(kind)
+    under = under.strip("/")
+    if under:
+        where.append(subtree_clause("f.parent"))
+        params.extend([under, under, under])
+    sql_where = " AND ".join(where)
+
+    conn = _db()
+    total = conn.execute(
+        f"SELECT count(*) FROM files_fts JOIN files f ON f.id = files_fts.rowid WHERE {sql_where}",
+        params,
+    ).fetchone()[0]
+    rows = conn.execute(
+        f"""
+        SELECT f.rel, f.name, f.kind, f.size, f.mtime_ns
+        FROM files_fts JOIN files f ON f.id = files_fts.rowid
+        WHERE {sql_where}
+        ORDER BY rank, f.rel
+        LIMIT ? OFFSET ?
+        """,
+        params + [per_page, (max(1, page) - 1) * per_page],
+    ).fetchall()
+    return total, [
+        {"rel": rel, "name": name, "kind": k, "size": size, "mtime_ns": mtime_ns}
+        for rel, name, k, size, mtime_ns in rows
+    ]
+
+
+def folder_totals(parent: str) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Recursive (bytes, file count, media count) for the subfolders of parent and for
+    parent itself (key ""), keyed by folder name. Folders the walker has not reached
+    yet are missing from the result.
+    """
+    parent = parent.strip("/")
+    conn = _db()
+    out = {
+        name: (b, f, m)
+        for name, b, f, m in conn.execute(
+            """
+            SELECT f.name, t.bytes, t.files, t.media
+            FROM files f JOIN dir_totals t ON t.rel = f.rel
+            WHERE f.parent = ? AND f.kind = 'dir'
+            """,
+            (parent,),
+        )
+    }
+    own = conn.execute("SELECT bytes, files, media FROM dir_totals WHERE rel = ?", (parent,)).fetchone()
+    if own is not None:
+        out[""] = own
+    return out
+
+
+def index_status() -> dict:
+    return dict(_status)
+
+
+def request_refresh(rel: Optional[str] = None) -> None:
+    """
+    Wakes the background indexer for an early pass.
+    rel: a folder to re-list even if its mtime did not change (e.g. a file in it was rewritten).
+    """
+    if rel is not None:
+        _forced.add(rel.strip("/"))
+    _wake.set()
+
+
+def _indexer_loop(interval: int) -> None:
+    while True:
+        try:
+            refresh_index()
+        except Exception as e:
+            print(f"Search index refresh failed: {e}")
+        _wake.wait(timeout=interval)
+        _wake.clear()
+
+
+def start_search_indexer(interval: int = SEARCH_REFRESH_SECONDS) -> None:
+    t = threading.Thread(target=_indexer_loop, args=(interval,), name="search-indexer", daemon=True)
+    t.start()
@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import List
+
+from config import (
+    THUMB_CACHE_MAX_AGE_DAYS,
+    THUMB_CACHE_MAX_MB,
+    THUMB_MAINTENANCE_BUDGET,
+    THUMB_MAINTENANCE_INTERVAL,
+)
+from fs_watcher import start_fs_watcher
+from image_pool import warm_image_pool
+from search_index import start_search_indexer
+from thumb_cache import ensure_thumb_cache_dir, maintain_thumb_cache_step
+
+# Everything slow runs on daemon threads so the server binds its port right away.
+# /readyz reports ready once the tasks in _pending have finished their first run.
+
+_lock = threading.Lock()
+_pending = {"imaging", "thumb_cache_maintenance"}
+_started_at = time.monotonic()
+ready = threading.Event()
+
+
+def _task_done(name: str) -> None:
+    with _lock:
+        _pending.discard(name)
+        if not _pending and not ready.is_set():
+            ready.set()
+            print(f"Ready ({time.monotonic() - _started_at:.2f}s after start)")
+
+
+def pending_tasks() -> List[str]:
+    with _lock:
+        return sorted(_pending)
+
+
+def _warm_imaging() -> None:
+    try:
+        warm_image_pool()
+    except Exception as e:
+        print(f"Image worker startup failed: {e}")
+    _task_done("imaging")
+
+
+def _maintenance_loop() -> None:
+    first = True
+    while True:
+        try:
+            # small slices with pauses in between, so a huge cache never hogs the disk
+            while not maintain_thumb_cache_step(
+                THUMB_CACHE_MAX_AGE_DAYS, THUMB_CACHE_MAX_MB, THUMB_MAINTENANCE_BUDGET
+            ):
+                time.sleep(THUMB_MAINTENANCE_BUDGET)
+        except Exception as e:
+            print(f"Thumbnail cache maintenance failed: {e}")
+        if first:
+            _task_done("thumb_cache_maintenance")
+            first = False
+        time.sleep(THUMB_MAINTENANCE_INTERVAL)
+
+
+def _start(target, name: str) -> None:
+    threading.Thread(target=target, name=name, daemon=True).start()
+
+
+def start_background_tasks() -> None:
+    ensure_thumb_cache_dir()
+    _start(_warm_imaging, "imaging-warmup")
+    _start(_maintenance_loop, "thumb-cache-maintenance")
+    start_search_indexer()
+    _start(start_fs_watcher, "fs-watcher-setup")  # the initial inotify walk can take a while
@@ -0,0 +1,99 @@
+import errno
+import os
+import threading
+import time
+from pathlib import Path
+from stat import S_ISDIR, S_ISREG
+from typing import Dict, Optional, Tuple
+
+from config import STAT_CACHE_TTL
+from metrics import STAT_CACHE
+
+# Short-lived resolve()/stat() results shared by all routes, so a page of thumbnails
+# costs one resolve and one stat per file per STAT_CACHE_TTL window instead of several
+# each. Missing files are cached too. fs_watcher and the thumbnail cache invalidate
+# entries they know changed; anything else is at most STAT_CACHE_TTL seconds stale.
+
+_MAX_ENTRIES = 50000
+
+_lock = threading.Lock()
+_stats: Dict[Path, Tuple[float, Optional[os.stat_result]]] = {}
+_resolved: Dict[Path, Tuple[float, Path]] = {}
+
+
+def _put(cache: dict, key: Path, value) -> None:
+    with _lock:
+        if len(cache) >= _MAX_ENTRIES:
+            cache.pop(next(iter(cache)))
+        cache[key] = (time.monotonic() + STAT_CACHE_TTL, value)
+
+
+def resolve(p: Path) -> Path:
+    hit = _resolved.get(p)
+    if hit is not None and hit[0] > time.monotonic():
+        STAT_CACHE.inc(1, "resolve", "hit")
+        return hit[1]
+    STAT_CACHE.inc(1, "resolve", "miss")
+    target = p.resolve()
+    _put(_resolved, p, target)
+    return target
+
+
+def lookup(p: Path) -> Optional[os.stat_result]:
+    """
+    Cached os.stat(p), or None if p does not exist.
+    """
+    hit = _stats.get(p)
+    if hit is not None and hit[0] > time.monotonic():
+        STAT_CACHE.inc(1, "stat", "hit")
+        return hit[1]
+    STAT_CACHE.inc(1, "stat", "miss")
+    try:
+        st: Optional[os.stat_result] = os.stat(p)
+    except (FileNotFoundError, NotADirectoryError):
+        st = None
+    _put(_stats, p, st)
+    return st
+
+
+def stat(p: Path) -> os.stat_result:
+    """
+    Cached os.stat(p); raises FileNotFoundError like os.stat.
+    """
+    st = lookup(p)
+    if st is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(p))
+    return st
+
+
+def exists(p: Path) -> bool:
+    return lookup(p) is not None
+
+
+def is_file(p: Path) -> bool:
+    st = lookup(p)
+    return st is not None and S_ISREG(st.st_mode)
+
+
+def is_dir(p: Path) -> bool:
+    st = lookup(p)
+    return st is not None and S_ISDIR(st.st_mode)
+
+
+def invalidate(p: Path) -> None:
+    with _lock:
+        _stats.pop(p, None)
+        _resolved.pop(p, None)
+
+
+def invalidate_tree(p: Path) -> None:
+    with _lock:
+        for cache in (_stats, _resolved):
+            for k in [k for k in cache if k == p or p in k.parents]:
+                del cache[k]
+
+
+def clear() -> None:
+    with _lock:
+        _stats.clear()
+        _resolved.clear()
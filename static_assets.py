@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import mimetypes
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+try:
+    import brotli  # optional: pip install brotli
+except Exception:
+    brotli = None  # type: ignore[assignment]
+
+ASSETS_DIR = Path(__file__).resolve().parent / "assets"
+
+
+class Asset(NamedTuple):
+    mimetype: str
+    etag: str
+    # encoding ("identity", "gzip", "br") -> body, compressed once at startup
+    bodies: Dict[str, bytes]
+
+
+_assets: Dict[str, Asset] = {}  # hashed name -> asset
+_urls: Dict[str, str] = {}  # logical name -> /assets/<hashed name>
+
+
+def _load() -> None:
+    for f in sorted(ASSETS_DIR.iterdir()):
+        if not f.is_file():
+            continue
+        data = f.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed = f"{f.stem}.{digest}{f.suffix}"
+
+        bodies = {"identity": data, "gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(data, quality=11)
+
+        mt, _ = mimetypes.guess_type(f.name)
+        if mt and (mt.startswith("text/") or mt.endswith("javascript")):
+            mt += "; charset=utf-8"
+        _assets[hashed] = Asset(mt or "application/octet-stream", digest, bodies)
+        _urls[f.name] = f"/assets/{hashed}"
+
+
+def asset_url(name: str) -> str:
+    """
+    Content-hashed URL of an asset in assets/, e.g. "app.css" -> "/assets/app.3f2a9c1b0d4e.css".
+    """
+    return _urls[name]
+
+
+def get_asset(hashed_name: str) -> Optional[Asset]:
+    return _assets.get(hashed_name)
+
+
+def named_asset(name: str) -> Optional[Asset]:
+    """
+    An asset by its plain name, for files that must keep a fixed URL (the service worker).
+    """
+    url = _urls.get(name)
+    return _assets[url.rsplit("/", 1)[1]] if url else None
+
+
+_load()
@@ -0,0 +1,66 @@
+"""
+Test-client checks, run with `python -m pytest tests`.
+
+config.py reads the environment and resolves cache paths at import time, so the
+environment and cwd are set up here, before any app module is imported: a temporary
+ROOT_DIR, thumbnail cache and indexes, no watcher and no image worker processes
+(test_image_pool.py starts one where it tests the process pool).
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+TOKEN = "test-token"
+REPO_DIR = Path(__file__).resolve().parent.parent
+WORKDIR = Path(tempfile.mkdtemp(prefix="lfe_test_"))
+ROOT = WORKDIR / "root"
+ROOT.mkdir()
+
+os.environ.update(
+    ROOT_DIR=str(ROOT),
+    ACCESS_TOKEN=TOKEN,
+    INDEX_DIR=str(WORKDIR / ".index"),
+    IMAGE_WORKERS="0",
+    THUMB_WORKERS="4",
+    FS_WATCH="off",
+    SERVICE_WORKER="0",
+    TRACE_SLOW_MS="0",
+)
+os.environ.pop("TRACE_DIR", None)
+os.chdir(WORKDIR)
+if str(REPO_DIR) not in sys.path:
+    sys.path.insert(0, str(REPO_DIR))
+
+
+@pytest.fixture(scope="session")
+def app():
+    import compression  # noqa: F401
+    import routes_assets  # noqa: F401
+    import routes_browse  # noqa: F401  (registers routes)
+    import routes_events  # noqa: F401
+    import routes_search  # noqa: F401
+    import routes_thumbs  # noqa: F401
+    from config import app
+
+    yield app
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def folder(request):
+    """
+    An empty folder under ROOT_DIR for one test, and its path relative to the root.
+    """
+    path = ROOT / request.node.name
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir()
+    return path, path.name
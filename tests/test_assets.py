@@ -0,0 +1,17 @@
+import gzip
+
+
+def test_assets_are_hashed_precompressed_and_immutable(client):
+    from static_assets import asset_url
+
+    url = asset_url("app.js")
+    resp = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in resp.headers["Cache-Control"]
+    identity = client.get(url)
+    assert gzip.decompress(resp.get_data()) == identity.get_data()
+
+    again = client.get(url, headers={"If-None-Match": identity.headers["ETag"]})
+    assert again.status_code == 304
+    assert client.get("/assets/app.0000000000.js").status_code == 404
@@ -0,0 +1,33 @@
+from bench.load import check_baseline
+
+
+def _route(requests, errors=0, p95=0.1, p99=0.2):
+    return {"requests": requests, "errors": errors, "p95": p95, "p99": p99}
+
+
+def test_unchanged_run_passes():
+    baseline = {"browse": _route(100, errors=2)}
+    assert check_baseline({"browse": _route(100, errors=2)}, baseline, 0.25) == []
+
+
+def test_latency_regression_fails():
+    failures = check_baseline({"browse": _route(100, p99=0.3)}, {"browse": _route(100)}, 0.25)
+    assert [f.split(":")[0] for f in failures] == ["browse p99"]
+
+
+def test_fast_failing_route_fails():
+    # every request answered quickly with an error: no latency samples at all
+    report = {"thumb": {"requests": 0, "errors": 500, "p95": 0.0, "p99": 0.0}}
+    assert check_baseline(report, {"thumb": _route(100)}, 0.25) == ["thumb: no successful requests (500 errors)"]
+    assert check_baseline({}, {"thumb": _route(100)}, 0.25)
+
+
+def test_new_errors_fail_even_when_faster():
+    failures = check_baseline({"raw": _route(90, errors=10, p95=0.01, p99=0.01)}, {"raw": _route(100)}, 0.25)
+    assert failures and failures[0].startswith("raw errors")
+
+
+def test_error_rate_regression_fails():
+    # same error count as the baseline, over far fewer requests
+    failures = check_baseline({"zip": _route(10, errors=5)}, {"zip": _route(100, errors=5)}, 0.25)
+    assert failures and failures[0].startswith("zip error rate")
@@ -0,0 +1,60 @@
+import pytest
+
+from tests.conftest import TOKEN
+
+
+def test_filter_values_are_escaped(client, folder):
+    _path, rel = folder
+    payload = '"><script>alert(1)</script>'
+    for key in ("from", "to", "camera", "orient"):
+        resp = client.get(f"/browse/{rel}", query_string={"token": TOKEN, key: payload})
+        assert resp.status_code == 200
+        assert "<script>alert(1)" not in resp.get_data(as_text=True)
+
+
+def test_malformed_dates_are_dropped(client, folder):
+    _path, rel = folder
+    resp = client.get(f"/browse/{rel}", query_string={"token": TOKEN, "from": "2024-1-5", "to": "2024-02-30"})
+    page = resp.get_data(as_text=True)
+    assert 'name="from" value=""' in page
+    assert 'name="to" value=""' in page
+
+    resp = client.get(f"/browse/{rel}", query_string={"token": TOKEN, "from": "2024-01-05"})
+    assert 'name="from" value="2024-01-05"' in resp.get_data(as_text=True)
+
+
+def test_listing_sees_files_rewritten_in_place(client, folder):
+    path, rel = folder
+    (path / "notes.txt").write_bytes(b"x" * 5000)
+    (path / "photo.jpg").write_bytes(b"x" * 100)
+    url = f"/browse/{rel}?token={TOKEN}&view=6"
+    assert "4.9 KB" in client.get(url).get_data(as_text=True)
+    versions = client.get(f"/browse/{rel}?token={TOKEN}&view=5").get_data(as_text=True)
+
+    # rewriting a file does not change its folder's mtime
+    mtime_ns = path.stat().st_mtime_ns
+    with open(path / "notes.txt", "ab") as f:
+        f.write(b"x" * 50000)
+    with open(path / "photo.jpg", "ab") as f:
+        f.write(b"x" * 100)
+    assert path.stat().st_mtime_ns == mtime_ns
+
+    page = client.get(url).get_data(as_text=True)
+    assert "53.7 KB" in page and "4.9 KB" not in page
+    assert client.get(f"/browse/{rel}?token={TOKEN}&view=5").get_data(as_text=True) != versions
+
+
+def test_exif_details_are_escaped(client, folder):
+    Image = pytest.importorskip("PIL.Image")
+    import image_meta
+
+    path, rel = folder
+    exif = Image.Exif()
+    exif[272] = "<img src=x onerror=alert(1)>"  # Model
+    Image.new("RGB", (64, 48)).save(path / "camera.jpg", format="JPEG", exif=exif.tobytes())
+    image_meta._index_folder(path)
+
+    for view in (1, 5, 6):
+        page = client.get(f"/browse/{rel}?token={TOKEN}&view={view}").get_data(as_text=True)
+        assert "&lt;img src=x onerror=alert(1)&gt;" in page
+        assert "<img src=x" not in page
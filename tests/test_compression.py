@@ -0,0 +1,49 @@
+import gzip
+
+import pytest
+
+from tests.conftest import TOKEN
+
+
+@pytest.fixture
+def big_folder(folder):
+    path, rel = folder
+    for i in range(40):
+        (path / f"file_{i:03d}.txt").write_bytes(b"x")
+    return path, rel
+
+
+def test_pages_are_gzipped_when_accepted(client, big_folder):
+    _path, rel = big_folder
+    url = f"/browse/{rel}?token={TOKEN}"
+    plain = client.get(url)
+    assert "Content-Encoding" not in plain.headers
+
+    resp = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert gzip.decompress(resp.get_data()) == plain.get_data()
+
+
+def test_compressed_page_revalidates(client, big_folder):
+    _path, rel = big_folder
+    url = f"/browse/{rel}?token={TOKEN}"
+    resp = client.get(url, headers={"Accept-Encoding": "gzip"})
+    etag = resp.headers["ETag"]
+    assert etag.startswith('W/"')  # another representation of the same page
+
+    again = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.get_data() == b""
+
+
+def test_media_is_not_recompressed(client, folder):
+    pytest.importorskip("PIL.Image")
+    from PIL import Image
+
+    path, rel = folder
+    Image.new("RGB", (300, 200)).save(path / "a.jpg")
+    for url in (f"/thumb/{rel}/a.jpg?token={TOKEN}&s=96", f"/raw/{rel}/a.jpg?token={TOKEN}"):
+        resp = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+        assert resp.status_code == 200
+        assert "Content-Encoding" not in resp.headers
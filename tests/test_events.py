@@ -0,0 +1,103 @@
+import json
+import threading
+
+from tests.conftest import TOKEN
+
+
+def _events(resp):
+    for chunk in resp.response:
+        yield chunk.decode() if isinstance(chunk, bytes) else chunk
+
+
+def test_delta_sees_watcher_change_at_once(client, folder, monkeypatch):
+    import dir_cache
+    import fs_watcher
+    from routes_browse import listing_fingerprint
+    from dir_cache import list_dir
+
+    path, rel = folder
+    (path / "notes.txt").write_bytes(b"x" * 100)
+    since = listing_fingerprint(list_dir(path))
+
+    # as with inotify: the cached listing is trusted until an event invalidates it
+    monkeypatch.setattr(dir_cache, "trust_events", True)
+    resp = client.get(f"/events/{rel}?token={TOKEN}&view=6&since={since}", buffered=False)
+    stream = _events(resp)
+    assert next(stream).startswith("retry:")
+
+    def rewrite():
+        (path / "notes.txt").write_bytes(b"x" * 5000)
+        fs_watcher._emit(fs_watcher.MODIFIED, path / "notes.txt", False)
+
+    threading.Timer(0.2, rewrite).start()
+    event = next(stream)
+    resp.close()
+    assert event.startswith("id: ")
+    lines = dict(line.split(": ", 1) for line in event.strip().splitlines())
+    assert lines["event"] == "delta"
+    upsert = json.loads(lines["data"])["upsert"]
+    assert [u["rel"] for u in upsert] == [f"{rel}/notes.txt"]
+    assert "4.9 KB" in upsert[0]["html"]
+
+
+def test_stale_page_is_asked_to_reload(client, folder):
+    _path, rel = folder
+    resp = client.get(f"/events/{rel}?token={TOKEN}&since=0000000000000000", buffered=False)
+    stream = _events(resp)
+    assert next(stream).startswith("retry:")
+    assert next(stream).startswith("event: reload")
+    resp.close()
+
+
+def test_delta_reports_removed_entries(client, folder):
+    import fs_watcher
+    from routes_browse import listing_fingerprint
+    from dir_cache import list_dir
+
+    path, rel = folder
+    (path / "a.txt").write_bytes(b"x")
+    (path / "b.txt").write_bytes(b"x")
+    resp = client.get(f"/events/{rel}?token={TOKEN}&since={listing_fingerprint(list_dir(path))}", buffered=False)
+    stream = _events(resp)
+    next(stream)
+
+    def remove():
+        (path / "a.txt").unlink()
+        fs_watcher._emit(fs_watcher.DELETED, path / "a.txt", False)
+
+    threading.Timer(0.2, remove).start()
+    event = next(stream)
+    resp.close()
+    data = json.loads(event.strip().splitlines()[-1][len("data: "):])
+    assert data == {"removed": [f"{rel}/a.txt"], "upsert": []}
+
+
+def test_polling_lists_the_folder_only_when_it_changed(client, folder, monkeypatch):
+    import routes_events
+    from routes_browse import listing_fingerprint
+    from dir_cache import list_dir
+
+    path, rel = folder
+    for i in range(50):
+        (path / f"{i}.txt").write_bytes(b"x")
+    listings = []
+    visible_listing = routes_events.visible_listing
+
+    def counting(*args):
+        listings.append(args[0])
+        return visible_listing(*args)
+
+    monkeypatch.setattr(routes_events, "visible_listing", counting)
+    monkeypatch.setattr(routes_events, "LIVE_POLL_SECONDS", 0.05)
+    resp = client.get(f"/events/{rel}?token={TOKEN}&since={listing_fingerprint(list_dir(path))}", buffered=False)
+    stream = _events(resp)
+    assert next(stream).startswith("retry:")
+    for _ in range(3):
+        assert next(stream) == ": ping\n\n"
+    assert len(listings) == 1
+
+    (path / "new.txt").write_bytes(b"x")
+    event = next(stream)
+    resp.close()
+    assert "event: delta" in event
+    assert len(listings) == 2
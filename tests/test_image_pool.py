@@ -0,0 +1,85 @@
+import os
+import threading
+from io import BytesIO
+
+import pytest
+
+from tests.conftest import TOKEN
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_concurrent_writes_to_one_cache_file(tmp_path):
+    import image_pool
+
+    dest = tmp_path / "thumb.jpg"
+    both_written = threading.Barrier(2)
+    errors = []
+
+    def write(tmps):
+        with open(tmps[0], "wb") as f:
+            f.write(b"x" * 100)
+        both_written.wait(5)
+
+    def job():
+        try:
+            image_pool._write_atomic([str(dest)], write)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=job) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert dest.read_bytes() == b"x" * 100
+    assert [p.name for p in tmp_path.iterdir()] == ["thumb.jpg"]
+
+
+def test_cache_write_error_is_not_a_thumbnail_failure(client, folder, monkeypatch):
+    import image_pool
+    import thumb_failures
+
+    path, rel = folder
+    Image.new("RGB", (300, 200)).save(path / "a.jpg")
+
+    def disk_full(src, dest):
+        raise OSError(28, "No space left on device")
+
+    with monkeypatch.context() as m:
+        m.setattr(image_pool.os, "replace", disk_full)
+        resp = client.get(f"/thumb/{rel}/a.jpg?token={TOKEN}&s=96")
+        assert resp.mimetype == "image/svg+xml"
+    assert thumb_failures.lookup(path / "a.jpg", "image") is None
+
+    resp = client.get(f"/thumb/{rel}/a.jpg?token={TOKEN}&s=96")
+    assert resp.mimetype == "image/jpeg"
+
+
+@pytest.fixture
+def worker_pool(monkeypatch):
+    """
+    One image worker process, as with IMAGE_WORKERS=1.
+    """
+    import image_pool
+
+    monkeypatch.setattr(image_pool, "IMAGE_WORKERS", 1)
+    monkeypatch.setattr(image_pool, "_executor", None)
+    yield image_pool
+    if image_pool._executor is not None:
+        image_pool._executor.shutdown()
+
+
+def test_thumbnails_from_worker_process(client, folder, worker_pool):
+    path, rel = folder
+    Image.new("RGB", (1200, 900)).save(path / "big.jpg")
+
+    worker_pool.warm_image_pool()
+    (pid,) = {worker_pool._executor.submit(worker_pool._noop).result() for _ in range(3)}
+    assert pid != os.getpid()
+
+    resp = client.get(f"/thumb/{rel}/big.jpg?token={TOKEN}&s=256")
+    assert resp.mimetype == "image/jpeg"
+    assert Image.open(BytesIO(resp.get_data())).size == (256, 192)
+    assert worker_pool.read_headers([path / "big.jpg"])[0]["width"] == 1200
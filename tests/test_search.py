@@ -0,0 +1,44 @@
+from tests.conftest import TOKEN
+
+
+def _search(client, **params):
+    resp = client.get("/search", query_string={"token": TOKEN, "format": "json", **params})
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def test_search_finds_indexed_names(client, folder):
+    from search_index import refresh_index
+
+    path, rel = folder
+    (path / "holiday").mkdir()
+    (path / "holiday" / "Beach_Sunset_0142.jpg").write_bytes(b"x")
+    (path / "holiday" / "notes.txt").write_bytes(b"x")
+    refresh_index()
+
+    doc = _search(client, q="sunset 0142")
+    assert [r["rel"] for r in doc["results"]] == [f"{rel}/holiday/Beach_Sunset_0142.jpg"]
+    assert doc["results"][0]["kind"] == "image"
+
+    assert _search(client, q="beach", kind="other")["total"] == 0
+    assert _search(client, q="notes", **{"in": f"{rel}/holiday"})["total"] == 1
+    assert _search(client, q="notes", **{"in": "elsewhere"})["total"] == 0
+
+
+def test_search_picks_up_changes_incrementally(client, folder):
+    from search_index import refresh_index
+
+    path, rel = folder
+    (path / "draft_report.txt").write_bytes(b"x")
+    refresh_index()
+    assert _search(client, q="draft_report")["total"] == 1
+
+    (path / "draft_report.txt").rename(path / "final_report.txt")
+    assert refresh_index() >= 1  # only the changed folder is re-listed
+    assert _search(client, q="draft_report")["total"] == 0
+    assert _search(client, q="final_report")["total"] == 1
+
+
+def test_search_page_escapes_query(client):
+    resp = client.get("/search", query_string={"token": TOKEN, "q": "<b>x</b>"})
+    assert "<b>x</b>" not in resp.get_data(as_text=True)
@@ -0,0 +1,39 @@
+import re
+
+import pytest
+
+from tests.conftest import TOKEN
+
+
+def test_unchanged_page_revalidates_with_304(client, folder):
+    path, rel = folder
+    (path / "a.txt").write_bytes(b"x")
+    url = f"/browse/{rel}?token={TOKEN}"
+    resp = client.get(url)
+    etag = resp.headers["ETag"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    (path / "b.txt").write_bytes(b"x")
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_thumbnail_urls_carry_content_version(client, folder):
+    pytest.importorskip("PIL")  # thumbnails are only linked with Pillow installed
+    path, rel = folder
+    (path / "a.jpg").write_bytes(b"x")
+    url = f"/browse/{rel}?token={TOKEN}&view=3"
+
+    def version():
+        return re.search(r"/thumb/[^']*&v=([0-9a-f-]+)", client.get(url).get_data(as_text=True)).group(1)
+
+    before = version()
+    assert version() == before
+    (path / "a.jpg").write_bytes(b"xy")
+    assert version() != before
+
+
+def test_service_worker_is_off_by_default(client, folder):
+    _path, rel = folder
+    assert client.get("/sw.js").status_code == 404
+    page = client.get(f"/browse/{rel}?token={TOKEN}").get_data(as_text=True)
+    assert 'name="service-worker"' not in page
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def stat_cache(monkeypatch):
+    import stat_cache
+
+    monkeypatch.setattr(stat_cache, "STAT_CACHE_TTL", 0.2)
+    stat_cache.clear()
+    return stat_cache
+
+
+def test_results_are_reused_until_the_ttl(folder, stat_cache):
+    path, _rel = folder
+    f = path / "a.txt"
+    f.write_bytes(b"x")
+    assert stat_cache.stat(f).st_size == 1
+
+    f.write_bytes(b"xx")
+    assert stat_cache.stat(f).st_size == 1
+    time.sleep(0.25)
+    assert stat_cache.stat(f).st_size == 2
+
+
+def test_missing_files_are_cached_too(folder, stat_cache):
+    path, _rel = folder
+    f = path / "later.txt"
+    assert not stat_cache.exists(f)
+    with pytest.raises(FileNotFoundError):
+        stat_cache.stat(f)
+
+    f.write_bytes(b"x")
+    assert not stat_cache.exists(f)
+    stat_cache.invalidate(f)
+    assert stat_cache.is_file(f)
+
+
+def test_invalidate_tree_drops_everything_below(folder, stat_cache):
+    path, _rel = folder
+    (path / "sub").mkdir()
+    inner, outer = path / "sub" / "a.txt", path / "b.txt"
+    for f in (inner, outer):
+        f.write_bytes(b"x")
+        assert stat_cache.stat(f).st_size == 1
+        f.write_bytes(b"xx")
+    assert stat_cache.resolve(path / "sub") == (path / "sub").resolve()
+
+    stat_cache.invalidate_tree(path / "sub")
+    assert stat_cache.stat(inner).st_size == 2
+    assert stat_cache.stat(outer).st_size == 1
+    assert path / "sub" not in stat_cache._resolved
+
+    stat_cache.clear()
+    assert stat_cache.stat(outer).st_size == 2
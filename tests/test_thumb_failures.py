@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from tests.conftest import TOKEN
+
+pytest.importorskip("PIL.Image")
+
+
+def test_failed_thumbnail_is_not_retried(client, folder, monkeypatch):
+    import stat_cache
+    import thumb_cache
+    import thumb_failures
+
+    path, rel = folder
+    (path / "broken.jpg").write_bytes(b"not a jpeg")
+    attempts = []
+    generate = thumb_cache._generate
+
+    def counting(*args, **kwargs):
+        attempts.append(args[0])
+        return generate(*args, **kwargs)
+
+    monkeypatch.setattr(thumb_cache, "_generate", counting)
+
+    url = f"/thumb/{rel}/broken.jpg?token={TOKEN}&s=96"
+    for _ in range(3):
+        resp = client.get(url)
+        assert resp.status_code == 200
+        assert resp.mimetype == "image/svg+xml"
+    assert len(attempts) == 1
+    assert thumb_failures.lookup(path / "broken.jpg", "image")
+
+    report = client.get(f"/thumb-failures?token={TOKEN}").get_json()
+    assert f"{rel}/broken.jpg" in [f["path"] for f in report["failures"]]
+
+    # a new version of the file is tried again
+    st = (path / "broken.jpg").stat()
+    os.utime(path / "broken.jpg", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    stat_cache.invalidate(path / "broken.jpg")
+    client.get(url)
+    assert len(attempts) == 2
@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+from tests.conftest import TOKEN
+
+
+def _gated(name, log, gate=None, started=None):
+    """
+    Work that records when it runs, then waits for gate (or for cancellation).
+    """
+
+    def work(cancel):
+        log.append(name)
+        if started is not None:
+            started.set()
+        if gate is not None:
+            while not gate.wait(0.01):
+                if cancel.is_set():
+                    log.append(f"{name} cancelled")
+                    from media_utils import Cancelled
+
+                    raise Cancelled()
+        return name
+
+    return work
+
+
+@pytest.fixture
+def busy(request):
+    """
+    Occupies every thumbnail worker until release() is called; jobs submitted
+    meanwhile stay queued.
+    """
+    import thumb_queue
+
+    thumb_queue._ensure_workers()
+    gates, jobs = [], []
+    for i in range(thumb_queue.THUMB_WORKERS):
+        gate, started = threading.Event(), threading.Event()
+        jobs.append(thumb_queue.submit(f"{request.node.name}-blocker-{i}", _gated(i, [], gate, started)))
+        assert started.wait(5)
+        gates.append(gate)
+
+    def release(n=len(gates)):
+        for gate in gates[:n]:
+            gate.set()
+        del gates[:n]
+
+    yield release
+    release()
+    for job in jobs:
+        assert job.done.wait(5)
+
+
+def test_requests_run_before_background_jobs(request, busy):
+    import thumb_queue
+
+    log = []
+    key = request.node.name
+    thumb_queue.submit_background(f"{key}-bg", _gated("background", log))
+    job = thumb_queue.submit(f"{key}-req", _gated("request", log))
+
+    busy(1)
+    assert job.done.wait(5)
+    busy()
+    deadline = time.monotonic() + 5
+    while len(log) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert log == ["request", "background"]
+
+
+def test_request_joins_queued_background_job(app, request, busy):
+    import thumb_queue
+
+    log = []
+    key = f"{request.node.name}-thumb"
+    thumb_queue.submit_background(f"{request.node.name}-other-bg", _gated("other", log))
+    assert thumb_queue.submit_background(key, _gated("warm-up", log))
+    job = thumb_queue.submit(key, _gated("duplicate", log))
+    assert not job.background
+
+    busy(1)
+    with app.test_request_context():
+        assert thumb_queue.wait(job) == "warm-up"
+    # moved ahead of the background job queued before it
+    assert log[0] == "warm-up"
+    assert "duplicate" not in log
+
+
+def test_request_joins_running_background_job(app, request):
+    import thumb_queue
+
+    log = []
+    gate, started = threading.Event(), threading.Event()
+    key = f"{request.node.name}-thumb"
+    assert thumb_queue.submit_background(key, _gated("warm-up", log, gate, started))
+    assert started.wait(5)
+
+    job = thumb_queue.submit(key, _gated("duplicate", log))
+    gate.set()
+    with app.test_request_context():
+        assert thumb_queue.wait(job) == "warm-up"
+    assert log == ["warm-up"]
+
+
+def test_disconnect_cancels_request_job(app, request, monkeypatch):
+    import thumb_queue
+    from media_utils import Cancelled
+
+    log = []
+    gate, started = threading.Event(), threading.Event()
+    job = thumb_queue.submit(request.node.name, _gated("request", log, gate, started))
+    assert started.wait(5)
+
+    monkeypatch.setattr(thumb_queue, "client_connected", lambda: False)
+    with app.test_request_context(), pytest.raises(Cancelled):
+        thumb_queue.wait(job, poll_seconds=0.01)
+    assert job.done.wait(5)
+    assert job.cancel.is_set()
+    assert log == ["request", "request cancelled"]
+
+
+def test_thumb_answers_499_when_client_goes_away(client, folder, monkeypatch):
+    import routes_thumbs
+    import thumb_queue
+
+    Image = pytest.importorskip("PIL.Image")
+    path, rel = folder
+    Image.new("RGB", (1600, 1200)).save(path / "a.jpg")
+    cancelled = threading.Event()
+
+    def generate_and_store(fpath, size, cached, video, cancel):
+        while not cancel.wait(0.01):
+            pass
+        cancelled.set()
+        raise thumb_queue.Cancelled()
+
+    monkeypatch.setattr(routes_thumbs, "generate_and_store", generate_and_store)
+    monkeypatch.setattr(thumb_queue, "client_connected", lambda: False)
+    for route in ("thumb", "preview"):
+        cancelled.clear()
+        resp = client.get(f"/{route}/{rel}/a.jpg?token={TOKEN}&s=96&w=1280")
+        assert resp.status_code == 499
+        assert cancelled.wait(5)
@@ -0,0 +1,183 @@
+import threading
+import time
+from io import BytesIO
+
+import pytest
+
+from tests.conftest import TOKEN
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg(path, size, orientation=None):
+    exif = Image.Exif()
+    if orientation:
+        exif[274] = orientation
+    Image.new("RGB", size, (200, 120, 40)).save(path, format="JPEG", exif=exif.tobytes())
+
+
+def test_preview_is_rotated_upright(client, folder):
+    path, rel = folder
+    _jpeg(path / "rotated.jpg", (3000, 2000), orientation=6)  # shown as 2000x3000
+
+    resp = client.get(f"/preview/{rel}/rotated.jpg?token={TOKEN}&w=1280")
+    assert resp.status_code == 200
+    im = Image.open(BytesIO(resp.get_data()))
+    assert im.size == (853, 1280)
+    assert im.getexif().get(274, 1) == 1
+
+
+def test_thumbnail_is_rotated_upright(client, folder):
+    path, rel = folder
+    _jpeg(path / "rotated.jpg", (400, 200), orientation=8)
+
+    resp = client.get(f"/thumb/{rel}/rotated.jpg?token={TOKEN}&s=96")
+    assert resp.status_code == 200
+    assert Image.open(BytesIO(resp.get_data())).size == (48, 96)
+
+
+def test_small_original_is_sent_as_is(client, folder):
+    path, rel = folder
+    _jpeg(path / "small.jpg", (800, 600))
+
+    # not in the image index yet: the size comes from the header
+    resp = client.get(f"/preview/{rel}/small.jpg?token={TOKEN}&w=1280")
+    assert resp.status_code == 200
+    assert resp.get_data() == (path / "small.jpg").read_bytes()
+
+
+def test_raw_heic_regenerates_evicted_conversion(client, folder, monkeypatch):
+    import routes_browse
+    import stat_cache
+
+    path, rel = folder
+    (path / "photo.heic").write_bytes(b"not really heic")
+    converted = []
+
+    def render_preview(src, dest):
+        converted.append(src)
+        _jpeg(dest, (64, 48))
+        return dest.stat().st_size
+
+    monkeypatch.setattr(routes_browse, "heif_available", lambda: True)
+    monkeypatch.setattr(routes_browse, "render_preview", render_preview)
+
+    url = f"/raw/{rel}/photo.heic?token={TOKEN}"
+    assert client.get(url).status_code == 200
+    cached = routes_browse.THUMB_CACHE_DIR / f"{routes_browse.cache_key_for_preview(path / 'photo.heic')}.jpg"
+    assert stat_cache.exists(cached)
+
+    # cache maintenance deletes it while the stat cache still lists it
+    cached.unlink()
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.mimetype == "image/jpeg"
+    assert len(converted) == 2
+
+
+@pytest.mark.parametrize("evict", ["age", "size", "step"])
+def test_eviction_drops_index_rows(client, folder, evict):
+    import thumb_cache
+
+    path, rel = folder
+    _jpeg(path / "a.jpg", (300, 200))
+    assert client.get(f"/thumb/{rel}/a.jpg?token={TOKEN}&s=96").status_code == 200
+
+    def rows():
+        conn = thumb_cache._index_db()
+        return conn.execute("SELECT COUNT(*) FROM thumbs WHERE src = ?", (str(path / "a.jpg"),)).fetchone()[0]
+
+    assert rows() > 0
+    if evict == "age":
+        thumb_cache.cleanup_thumb_cache_age(max_age_days=-1)
+    elif evict == "size":
+        thumb_cache.enforce_thumb_cache_size_limit(max_mb=0)
+    else:
+        while not thumb_cache.maintain_thumb_cache_step(-1, 500, 1.0):
+            pass
+    assert rows() == 0
+
+
+def _count_decodes(monkeypatch, gate=None):
+    """
+    Records the sizes rendered by each decode; with a gate, the first decode waits for it.
+    """
+    import image_pool
+
+    decodes = []
+    encode = image_pool.encode_thumbs
+
+    def counting(src, outputs, timings, cancel=None):
+        decodes.append(sorted(size for size, _out in outputs))
+        if gate is not None and len(decodes) == 1:
+            assert gate.wait(10)
+        return encode(src, outputs, timings, cancel)
+
+    monkeypatch.setattr(image_pool, "encode_thumbs", counting)
+    return decodes
+
+
+def _drain(timeout=10.0):
+    import thumb_queue
+
+    deadline = time.monotonic() + timeout
+    while thumb_queue._jobs and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not thumb_queue._jobs
+
+
+def test_warmup_decodes_once(client, folder, monkeypatch):
+    import thumb_cache
+
+    path, _rel = folder
+    _jpeg(path / "big.jpg", (1200, 900))
+    decodes = _count_decodes(monkeypatch)
+
+    thumb_cache.queue_thumb_warmup(path / "big.jpg")
+    thumb_cache.queue_thumb_warmup(path / "big.jpg")
+    _drain()
+    assert decodes == [sorted(thumb_cache.WARM_SIZES)]
+    for size in thumb_cache.WARM_SIZES:
+        assert thumb_cache.cached_thumb_path(path / "big.jpg", size, False).exists()
+
+    thumb_cache.queue_thumb_warmup(path / "big.jpg")
+    _drain()
+    assert len(decodes) == 1
+
+
+def test_request_leaves_sizes_to_running_warmup(client, folder, monkeypatch):
+    import thumb_cache
+
+    path, rel = folder
+    _jpeg(path / "big.jpg", (1200, 900))
+    gate = threading.Event()
+    decodes = _count_decodes(monkeypatch, gate)
+
+    thumb_cache.queue_thumb_warmup(path / "big.jpg")
+    deadline = time.monotonic() + 10
+    while not decodes and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # the warm-up holds every size; the request renders only its own
+    resp = client.get(f"/thumb/{rel}/big.jpg?token={TOKEN}&s=64")
+    assert resp.status_code == 200
+    gate.set()
+    _drain()
+    assert decodes == [sorted(thumb_cache.WARM_SIZES), [64]]
+
+
+def test_one_request_writes_the_smaller_sizes(client, folder, monkeypatch):
+    import thumb_cache
+
+    path, rel = folder
+    _jpeg(path / "big.jpg", (1200, 900))
+    decodes = _count_decodes(monkeypatch)
+
+    assert client.get(f"/thumb/{rel}/big.jpg?token={TOKEN}&s=256").status_code == 200
+    assert decodes == [sorted(thumb_cache.WARM_SIZES)]
+    for size in thumb_cache.WARM_SIZES:
+        cached = thumb_cache.cached_thumb_path(path / "big.jpg", size, False)
+        assert max(Image.open(cached).size) == size
+        resp = client.get(f"/thumb/{rel}/big.jpg?token={TOKEN}&s={size}")
+        assert resp.get_data() == cached.read_bytes()
+    assert len(decodes) == 1
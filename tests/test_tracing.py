@@ -0,0 +1,58 @@
+import json
+
+import tracing
+from tracing import Trace, add_stages, attached, span
+
+
+def test_spans_are_noops_outside_a_trace():
+    with span("resolve"):
+        pass
+    add_stages("thumb", {"decode": 0.1})
+    assert tracing.current_trace() is None
+
+
+def test_spans_and_stages_are_recorded():
+    trace = Trace("thumb")
+    with attached(trace):
+        with span("resolve"):
+            pass
+        with span("wait"):
+            add_stages("thumb", {"decode": 0.002, "resize": 0.001})
+        try:
+            with span("render"):
+                raise ValueError("bad file")
+        except ValueError:
+            pass
+
+    names = [s[0] for s in trace.spans]
+    assert names == ["resolve", "thumb.decode", "thumb.resize", "wait", "render"]
+    decode, resize = trace.spans[1], trace.spans[2]
+    assert decode[1] + decode[2] == resize[1]  # consecutive
+    assert trace.spans[-1][4] == {"error": "ValueError"}
+    assert list(trace.phases()) == ["resolve", "thumb.decode", "thumb.resize", "wait", "render"]
+
+
+def test_slow_request_is_logged_and_exported(app, tmp_path, monkeypatch):
+    log = tmp_path / "slow.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 0.0001)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_LOG", str(log))
+    monkeypatch.setattr(tracing, "TRACE_DIR", tmp_path / "traces")
+
+    with app.test_request_context("/browse/photos?token=secret"):
+        tracing._start_trace()
+        with span("list_dir"):
+            pass
+        resp = tracing._tag_response(app.response_class("ok"))
+        tracing._finish_trace(None)
+
+    assert 'desc="list_dir"' in resp.headers["Server-Timing"]
+    record = json.loads(log.read_text())
+    assert record["path"] == "/browse/photos"  # never the query string with the token
+    assert record["status"] == "200"
+    assert list(record["phases"]) == ["list_dir"]
+    assert record["trace_id"] == resp.headers["X-Trace-Id"]
+
+    (exported,) = (tmp_path / "traces").glob("*.trace.json")
+    doc = json.loads(exported.read_text())
+    assert "secret" not in exported.read_text()
+    assert [e["name"] for e in doc["traceEvents"] if e["ph"] == "X"][1:] == ["list_dir"]
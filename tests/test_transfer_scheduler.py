@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+import transfer_scheduler
+from config import RATE_LIMIT_BURST_BYTES
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def global_cap(monkeypatch):
+    monkeypatch.setattr(transfer_scheduler, "_GLOBAL_BPS", 8 * MB)
+    monkeypatch.setattr(transfer_scheduler, "_CLIENT_BPS", 0)
+
+
+def _drain(client, nbytes, chunk=256 * 1024):
+    chunks = [b"x" * chunk] * (nbytes // chunk)
+    t0 = time.monotonic()
+    sent = sum(len(c) for c in transfer_scheduler.throttled(iter(chunks), client))
+    return sent, time.monotonic() - t0
+
+
+def test_stream_is_paced_to_the_cap(global_cap):
+    sent, seconds = _drain("10.0.0.1", 4 * MB)
+    assert sent == 4 * MB
+    expected = (4 * MB - RATE_LIMIT_BURST_BYTES) / (8 * MB)
+    assert expected * 0.8 < seconds < expected * 2
+    assert transfer_scheduler.active_clients() == 0
+
+
+def test_clients_share_the_global_cap(global_cap):
+    results = {}
+
+    def run(client):
+        results[client] = _drain(client, 3 * MB)[1]
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in ("10.0.0.1", "10.0.0.2")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # each gets half of the 8 MB/s
+    expected = (3 * MB - RATE_LIMIT_BURST_BYTES) / (4 * MB)
+    for seconds in results.values():
+        assert expected * 0.7 < seconds < expected * 2
+
+
+def test_client_cap(monkeypatch):
+    monkeypatch.setattr(transfer_scheduler, "_GLOBAL_BPS", 0)
+    monkeypatch.setattr(transfer_scheduler, "_CLIENT_BPS", 16 * MB)
+    bucket = transfer_scheduler._open_stream("10.0.0.3")
+    try:
+        assert transfer_scheduler._client_rate() == 16 * MB
+    finally:
+        transfer_scheduler._close_stream("10.0.0.3", bucket)
@@ -0,0 +1,78 @@
+import sys
+import threading
+import time
+from io import BytesIO
+
+import pytest
+
+from tests.conftest import TOKEN
+
+
+@pytest.fixture
+def hung_ffprobe(tmp_path, monkeypatch):
+    """
+    An ffprobe that never answers, as on a stalled network mount.
+    """
+    if sys.platform.startswith("win"):
+        pytest.skip("needs a POSIX shell")
+    import media_utils
+
+    script = tmp_path / "ffprobe"
+    script.write_text("#!/bin/sh\nexec sleep 30\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(media_utils, "FFPROBE_BIN", str(script))
+
+
+@pytest.mark.parametrize("cancellable", [False, True])
+def test_hung_ffprobe_is_killed(folder, hung_ffprobe, cancellable):
+    from media_utils import ffprobe_video_info
+
+    path, _rel = folder
+    (path / "clip.mp4").write_bytes(b"not really a video")
+    cancel = threading.Event() if cancellable else None
+    t0 = time.monotonic()
+    assert ffprobe_video_info(path / "clip.mp4", cancel, timeout=0.5) is None
+    assert time.monotonic() - t0 < 5
+
+
+def test_unreadable_video_is_probed_once(folder, monkeypatch):
+    import video_meta
+
+    path, _rel = folder
+    (path / "clip.mp4").write_bytes(b"not really a video")
+    probes = []
+
+    def ffprobe_video_info(fpath, cancel=None):
+        probes.append(fpath)
+        return None
+
+    monkeypatch.setattr(video_meta, "_ffprobe_ok", lambda: True)
+    monkeypatch.setattr(video_meta, "ffprobe_video_info", ffprobe_video_info)
+    for _ in range(3):
+        meta = video_meta.ensure(path / "clip.mp4")
+        assert meta is not None and meta.duration is None
+    assert len(probes) == 1
+
+
+def test_vthumb_does_not_probe_unreadable_video_again(client, folder, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    import thumb_cache
+    import video_meta
+
+    path, rel = folder
+    (path / "clip.mp4").write_bytes(b"not really a video")
+    monkeypatch.setattr(video_meta, "_ffprobe_ok", lambda: True)
+    monkeypatch.setattr(video_meta, "ffprobe_video_info", lambda fpath, cancel=None: None)
+    durations = []
+
+    def grab(fpath, size, cancel=None, duration=None):
+        durations.append(duration)
+        buf = BytesIO()
+        Image.new("RGB", (size, size)).save(buf, format="JPEG")
+        return buf.getvalue(), "image/jpeg"
+
+    monkeypatch.setattr(thumb_cache, "generate_video_thumb_bytes", grab)
+    resp = client.get(f"/vthumb/{rel}/clip.mp4?token={TOKEN}&s=96")
+    assert resp.mimetype == "image/jpeg"
+    # a known duration (0.0 = none), so ffprobe is not run for it again
+    assert durations == [0.0]
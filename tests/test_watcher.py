@@ -0,0 +1,108 @@
+import errno
+import os
+
+import pytest
+
+from tests.conftest import TOKEN
+
+
+@pytest.fixture
+def trusted(monkeypatch):
+    """
+    Cached listings trusted as with inotify: only watcher events invalidate them.
+    """
+    import dir_cache
+
+    monkeypatch.setattr(dir_cache, "trust_events", True)
+
+
+def test_events_invalidate_trusted_listings(client, folder, trusted):
+    import fs_watcher
+
+    path, rel = folder
+    url = f"/browse/{rel}?token={TOKEN}&view=6"
+    client.get(url)
+
+    (path / "new.txt").write_bytes(b"x")
+    assert "new.txt" not in client.get(url).get_data(as_text=True)
+
+    fs_watcher._emit(fs_watcher.CREATED, path / "new.txt", False)
+    assert "new.txt" in client.get(url).get_data(as_text=True)
+
+    (path / "new.txt").unlink()
+    fs_watcher._emit(fs_watcher.DELETED, path / "new.txt", False)
+    assert "new.txt" not in client.get(url).get_data(as_text=True)
+
+
+def test_delete_event_purges_thumbnails(client, folder):
+    pytest.importorskip("PIL.Image")
+    from PIL import Image
+
+    import fs_watcher
+    from thumb_cache import cached_thumb_path
+
+    path, rel = folder
+    Image.new("RGB", (300, 200)).save(path / "a.jpg")
+    assert client.get(f"/thumb/{rel}/a.jpg?token={TOKEN}&s=96").status_code == 200
+    cached = cached_thumb_path(path / "a.jpg", 96, False)
+    assert cached.exists()
+
+    fs_watcher._emit(fs_watcher.DELETED, path / "a.jpg", False)
+    assert not cached.exists()
+
+
+class _FakeInotify:
+    """
+    Replays batches of (wd, mask, name) events, then fails like a broken inotify fd.
+    """
+
+    def __init__(self, folder, batches):
+        self.fd = os.open(os.devnull, os.O_RDONLY)
+        self.paths = {1: folder}
+        self.batches = list(batches)
+
+    def read_events(self):
+        if not self.batches:
+            raise OSError(errno.EBADF, "Bad file descriptor")
+        return self.batches.pop(0)
+
+
+@pytest.fixture
+def inotify_loop(monkeypatch, trusted):
+    import fs_watcher
+
+    started = []
+    monkeypatch.setattr(fs_watcher, "_mode", "inotify")
+    monkeypatch.setattr(fs_watcher, "_start_thread", lambda target, *args: started.append(target))
+    return started
+
+
+def test_new_file_is_warmed_once_written(folder, monkeypatch, inotify_loop):
+    import fs_watcher
+
+    path, _rel = folder
+    warmed = []
+    monkeypatch.setattr(fs_watcher, "queue_thumb_warmup", warmed.append)
+
+    fs_watcher._inotify_loop(
+        _FakeInotify(
+            path,
+            [
+                [(1, fs_watcher.IN_CREATE, "a.jpg")],
+                [(1, fs_watcher.IN_CLOSE_WRITE, "a.jpg")],
+                [(1, fs_watcher.IN_MOVED_TO, "b.jpg")],
+            ],
+        )
+    )
+    assert warmed == [path / "a.jpg", path / "b.jpg"]
+
+
+def test_failed_inotify_falls_back_to_polling(folder, inotify_loop):
+    import dir_cache
+    import fs_watcher
+
+    path, _rel = folder
+    fs_watcher._inotify_loop(_FakeInotify(path, []))
+    assert fs_watcher.watch_mode() == "poll"
+    assert dir_cache.trust_events is False
+    assert inotify_loop == [fs_watcher._poll_loop]
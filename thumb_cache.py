@@ -1,13 +1,46 @@
 import hashlib
+import os
+import sqlite3
+import threading
 import time
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
 
-from config import THUMB_CACHE_DIR
+import image_meta
+import stat_cache
+import thumb_failures
+import video_meta
+from config import INDEX_DIR, THUMB_CACHE_DIR
+from db_utils import connect, subtree_clause
+from image_pool import CacheWriteError, render_thumbs, write_cache_file
+from imaging import pillow_available
+from media_utils import (
+    Cancelled,
+    ToolUnavailable,
+    generate_video_thumb_bytes,
+    is_image,
+    is_video,
+    read_image_header,
+)
+from metrics import THUMB_CACHE_BYTES, THUMB_CACHE_EVICTIONS
+from thumb_queue import submit_background
+from tracing import span
+
+# Which source file each cached thumbnail belongs to, so thumbnails of deleted or
+# rewritten files can be purged (the cache key alone cannot be reversed).
+THUMB_INDEX_DB = INDEX_DIR / "thumbs.sqlite3"
+
+# Sizes requested by the icon views (VIEW_SIZES) plus the list view's s=64
+WARM_SIZES = (256, 160, 96, 64)
+
+# Screen-sized renditions for the file view (/preview), cached like thumbnails
+PREVIEW_TIERS = (1280, 1920, 2560)
+PREVIEW_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".heic", ".heif"}  # GIF/WebP may be animated
 
 
 def cache_key_for_thumb(fpath: Path, size: int) -> str:
-    st = fpath.stat()
-    raw = f"{str(fpath.resolve())}|{st.st_mtime_ns}|{st.st_size}|{size}".encode(
+    st = stat_cache.stat(fpath)
+    raw = f"{str(stat_cache.resolve(fpath))}|{st.st_mtime_ns}|{st.st_size}|{size}".encode(
         "utf-8",
         "ignore",
     )
@@ -15,18 +48,276 @@ def cache_key_for_thumb(fpath: Path, size: int) -> str:
 
 
 def cache_key_for_vthumb(fpath: Path, size: int) -> str:
-    st = fpath.stat()
-    raw = f"VID|{str(fpath.resolve())}|{st.st_mtime_ns}|{st.st_size}|{size}".encode(
+    st = stat_cache.stat(fpath)
+    raw = f"VID|{str(stat_cache.resolve(fpath))}|{st.st_mtime_ns}|{st.st_size}|{size}".encode(
+        "utf-8",
+        "ignore",
+    )
+    return hashlib.sha256(raw).hexdigest()
+
+
+def cache_key_for_preview(fpath: Path) -> str:
+    """
+    Full-size JPEG rendition of a HEIC/HEIF file, cached next to the thumbnails.
+    """
+    st = stat_cache.stat(fpath)
+    raw = f"PREVIEW|{str(stat_cache.resolve(fpath))}|{st.st_mtime_ns}|{st.st_size}".encode(
         "utf-8",
         "ignore",
     )
     return hashlib.sha256(raw).hexdigest()
 
 
+def preview_tier(width: int) -> int:
+    """
+    Smallest preview tier covering width pixels (the largest tier beyond that).
+    """
+    for tier in PREVIEW_TIERS:
+        if width <= tier:
+            return tier
+    return PREVIEW_TIERS[-1]
+
+
+def preview_needed(fpath: Path, tier: int) -> bool:
+    """
+    Whether the file view should show a rendition of fpath at tier rather than the
+    original: always for HEIC/HEIF, and for stills larger than the tier. Files not
+    indexed yet have their size read from the header (no pixels are decoded).
+    """
+    ext = fpath.suffix.lower()
+    if ext in {".heic", ".heif"}:
+        return True
+    if ext not in PREVIEW_EXTS:
+        return False
+    meta = image_meta.lookup(fpath)
+    dims = meta.dimensions if meta is not None else None
+    if dims is None:
+        header = read_image_header(fpath)
+        if header is None:
+            return False  # not readable here; let the browser try the original
+        dims = (header["width"], header["height"])
+    return max(dims) > tier
+
+
 def ensure_thumb_cache_dir() -> None:
     THUMB_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _index_db():
+    conn = connect(THUMB_INDEX_DB)
+    conn.execute("CREATE TABLE IF NOT EXISTS thumbs (key TEXT PRIMARY KEY, src TEXT NOT NULL)")
+    conn.execute("CREATE INDEX IF NOT EXISTS thumbs_src ON thumbs(src)")
+    return conn
+
+
+def store_thumb(fpath: Path, cached: Path, data: bytes) -> None:
+    """
+    Writes a generated thumbnail into the cache and records its source file.
+    """
+    with span("write"):
+        write_cache_file(cached, data)
+    record_thumb(fpath, cached, len(data))
+
+
+def record_thumb(fpath: Path, cached: Path, nbytes: int) -> None:
+    """
+    Books a cache file written by someone else (e.g. an image worker process).
+    """
+    THUMB_CACHE_BYTES.inc(nbytes)
+    stat_cache.invalidate(cached)
+    try:
+        with span("record"):
+            conn = _index_db()
+            conn.execute("INSERT OR REPLACE INTO thumbs(key, src) VALUES (?, ?)", (cached.stem, str(fpath)))
+            conn.commit()
+    except sqlite3.Error:
+        pass
+
+
+def _forget(keys: List[str]) -> None:
+    """
+    Drops the index rows of cache files deleted by age or size eviction.
+    """
+    if not keys:
+        return
+    try:
+        conn = _index_db()
+        conn.executemany("DELETE FROM thumbs WHERE key = ?", [(k,) for k in keys])
+        conn.commit()
+    except sqlite3.Error:
+        pass
+
+
+def purge_thumbs_for(src: Path, recursive: bool = False) -> int:
+    """
+    Deletes every cached thumbnail generated from src (or from anything below it).
+    Returns the number of files removed.
+    """
+    s = str(src)
+    try:
+        conn = _index_db()
+        if recursive:
+            where, params = subtree_clause("src", os.sep), (s, s, s)
+        else:
+            where, params = "src = ?", (s,)
+        keys = [k for (k,) in conn.execute(f"SELECT key FROM thumbs WHERE {where}", params)]
+        conn.execute(f"DELETE FROM thumbs WHERE {where}", params)
+        conn.commit()
+    except sqlite3.Error:
+        return 0
+
+    removed = 0
+    for key in keys:
+        f = THUMB_CACHE_DIR / f"{key}.jpg"
+        try:
+            sz = f.stat().st_size
+            f.unlink()
+            stat_cache.invalidate(f)
+            removed += 1
+            THUMB_CACHE_BYTES.dec(sz)
+        except OSError:
+            pass
+    THUMB_CACHE_EVICTIONS.inc(removed, "purge")
+    return removed
+
+
+def generate_and_store(
+    fpath: Path, size: int, cached: Path, video: bool, cancel: Optional[threading.Event] = None
+) -> Path:
+    """
+    Thumbnail job body for thumb_queue: generates the thumbnail into the cache and
+    returns the cached file.
+
+    Thumbnails are made as a pyramid: one source is decoded once and every standard
+    size missing from the cache is written along with the requested one. The source is
+    the smallest cached larger standard size when there is one, otherwise the original
+    (for videos, a single ffmpeg frame grab at the largest size needed). Extra sizes
+    another job is already rendering are left to that job.
+
+    Failures are recorded in thumb_failures, unless they only mean that Pillow or
+    ffmpeg is missing or that the cache could not be written.
+    """
+    try:
+        return _generate(fpath, size, cached, video, cancel)
+    except (Cancelled, ToolUnavailable, CacheWriteError):
+        raise
+    except Exception as e:
+        thumb_failures.record(fpath, "video" if video else "image", e)
+        raise
+
+
+def _generate(
+    fpath: Path, size: int, cached: Path, video: bool, cancel: Optional[threading.Event]
+) -> Path:
+    targets: Dict[int, Path] = {size: cached}
+    source: Optional[Path] = None
+    if pillow_available():
+        limit = None
+        for s in sorted(WARM_SIZES):
+            if s > size and stat_cache.exists(cached_thumb_path(fpath, s, video)):
+                source, limit = cached_thumb_path(fpath, s, video), s
+                break
+        for s in WARM_SIZES:
+            if s not in targets and (limit is None or s < limit):
+                path = cached_thumb_path(fpath, s, video)
+                if not stat_cache.exists(path):
+                    targets[s] = path
+    claimed = _claim(targets, size)
+    try:
+        if source is None and video:
+            grab = max(targets)
+            meta = video_meta.ensure(fpath, cancel)
+            # probed without a duration (0.0): default seek points, no second ffprobe run
+            duration = (meta.duration or 0.0) if meta is not None else None
+            data, _mt = generate_video_thumb_bytes(fpath, grab, cancel, duration)
+            source = targets.pop(grab)
+            store_thumb(fpath, source, data)
+            if not targets:
+                return cached
+        try:
+            with span("render", sizes=len(targets)):
+                sizes = render_thumbs(source or fpath, list(targets.items()), cancel)
+        except FileNotFoundError:
+            if source is None:
+                raise
+            stat_cache.invalidate(source)  # cached source evicted meanwhile; start over
+        else:
+            for path, nbytes in zip(targets.values(), sizes):
+                record_thumb(fpath, path, nbytes)
+            return cached
+    finally:
+        _unclaim(claimed)
+    return _generate(fpath, size, cached, video, cancel)
+
+
+# Cache files some job is rendering right now. A job leaves out the extra sizes another
+# job has claimed (a warm-up and a request for the same file, say), so each size is
+# decoded and written once; the size a job was asked for is always rendered.
+_rendering: Set[Path] = set()
+_rendering_lock = threading.Lock()
+
+
+def _claim(targets: Dict[int, Path], size: int) -> List[Path]:
+    """
+    Removes the extra sizes already being rendered elsewhere from targets and claims
+    the rest. Returns the claimed paths, for _unclaim().
+    """
+    claimed = []
+    with _rendering_lock:
+        for s, path in list(targets.items()):
+            if path in _rendering:
+                if s != size:
+                    del targets[s]
+            else:
+                _rendering.add(path)
+                claimed.append(path)
+    return claimed
+
+
+def _unclaim(claimed: List[Path]) -> None:
+    with _rendering_lock:
+        _rendering.difference_update(claimed)
+
+
+def cached_thumb_path(fpath: Path, size: int, video: bool) -> Path:
+    """
+    Where the size px thumbnail of fpath is (or would be) cached.
+    """
+    key = cache_key_for_vthumb(fpath, size) if video else cache_key_for_thumb(fpath, size)
+    return THUMB_CACHE_DIR / f"{key}.jpg"
+
+
+def queue_thumb_warmup(fpath: Path, sizes: Iterable[int] = WARM_SIZES) -> None:
+    """
+    Generates thumbnails (by default the standard sizes) for a media file in the background,
+    behind any thumbnail a client is waiting for. This is one job, for the largest missing
+    size: it writes the smaller missing standard sizes from the same decode.
+    Dropped silently when the backlog is full.
+    """
+    video = is_video(fpath)
+    if not (video or is_image(fpath)):
+        return
+    if thumb_failures.lookup(fpath, "video" if video else "image"):
+        return
+    ensure_thumb_cache_dir()
+    for size in sorted(sizes, reverse=True):
+        try:
+            cached = cached_thumb_path(fpath, size, video)
+        except OSError:
+            return
+        if not cached.exists():
+            break
+    else:
+        return
+
+    def work(cancel):
+        if cached.exists():
+            return cached
+        return generate_and_store(fpath, size, cached, video, cancel)
+
+    submit_background(cached.stem, work)
+
+
 def cleanup_thumb_cache_age(max_age_days: int = 1) -> None:
     """
     Delete cached thumbnails older than max_age_days (based on file mtime).
@@ -36,12 +327,39 @@ def cleanup_thumb_cache_age(max_age_days: int = 1) -> None:
 
     cutoff = time.time() - (max_age_days * 86400)
 
+    evicted = []
     for f in THUMB_CACHE_DIR.glob("*.jpg"):
         try:
-            if f.stat().st_mtime < cutoff:
+            st = f.stat()
+            if st.st_mtime < cutoff:
                 f.unlink()
+                evicted.append(f.stem)
+                THUMB_CACHE_EVICTIONS.inc(1, "age")
+                THUMB_CACHE_BYTES.dec(st.st_size)
         except OSError:
             pass
+    _forget(evicted)
+
+
+def _evict_oldest(files: list, total: int, max_bytes: int) -> int:
+    """
+    Deletes (path, mtime, size) entries oldest first until total <= max_bytes.
+    Returns the new total.
+    """
+    files.sort(key=lambda x: x[1])  # oldest first
+    evicted = []
+    for f, _mtime, sz in files:
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(f)
+            evicted.append(Path(f).stem)
+            total -= sz
+            THUMB_CACHE_EVICTIONS.inc(1, "size")
+        except OSError:
+            pass
+    _forget(evicted)
+    return total
 
 
 def enforce_thumb_cache_size_limit(max_mb: int = 500) -> None:
@@ -64,21 +382,59 @@ def enforce_thumb_cache_size_limit(max_mb: int = 500) -> None:
         except OSError:
             pass
 
-    if total <= max_bytes:
-        return
-
-    files.sort(key=lambda x: x[1])  # oldest first
-    for f, _mtime, sz in files:
-        if total <= max_bytes:
-            break
-        try:
-            f.unlink()
-            total -= sz
-        except OSError:
-            pass
+    if total > max_bytes:
+        total = _evict_oldest(files, total, max_bytes)
+    THUMB_CACHE_BYTES.set(total)
 
 
 def maintain_thumb_cache(max_age_days: int = 1, max_mb: int = 500) -> None:
     cleanup_thumb_cache_age(max_age_days=max_age_days)
     enforce_thumb_cache_size_limit(max_mb=max_mb)
 
+
+# Resumable maintenance pass: one scandir over the cache, consumed in time-boxed slices
+_pass = {"it": None, "files": [], "total": 0, "cutoff": 0.0}
+
+
+def maintain_thumb_cache_step(max_age_days: int, max_mb: int, budget_seconds: float) -> bool:
+    """
+    Advances the maintenance pass (age cleanup while scanning, size limit at the end)
+    by at most about budget_seconds. Returns True when a full pass has completed.
+    """
+    deadline = time.monotonic() + budget_seconds
+    if _pass["it"] is None:
+        if not THUMB_CACHE_DIR.exists():
+            return True
+        _pass.update(
+            it=os.scandir(THUMB_CACHE_DIR),
+            files=[],
+            total=0,
+            cutoff=time.time() - max_age_days * 86400,
+        )
+
+    evicted = []
+    for de in _pass["it"]:
+        if not de.name.endswith(".jpg"):
+            continue
+        try:
+            st = de.stat()
+            if st.st_mtime < _pass["cutoff"]:
+                os.unlink(de.path)
+                evicted.append(de.name[: -len(".jpg")])
+                THUMB_CACHE_EVICTIONS.inc(1, "age")
+            else:
+                _pass["files"].append((de.path, st.st_mtime, st.st_size))
+                _pass["total"] += st.st_size
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            _forget(evicted)
+            return False
+
+    _forget(evicted)
+    _pass["it"].close()
+    _pass["it"] = None
+    total = _evict_oldest(_pass["files"], _pass["total"], max_mb * 1024 * 1024)
+    THUMB_CACHE_BYTES.set(total)
+    _pass["files"] = []
+    return True
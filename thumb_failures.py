@@ -0,0 +1,100 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import stat_cache
+from config import INDEX_DIR, THUMB_FAILURE_TTL
+from db_utils import connect
+from metrics import THUMB_FAILURES
+
+# Negative thumbnail cache: files whose thumbnail could not be generated, keyed like
+# the thumbnail cache by (path, mtime_ns, size). A corrupt or unsupported file is then
+# answered with the placeholder instead of running the decoder (or ffprobe and up to
+# six ffmpeg attempts) again on every page view. Entries expire after
+# THUMB_FAILURE_TTL seconds; an edited file no longer matches and is retried at once.
+FAILURES_DB = INDEX_DIR / "thumb_failures.sqlite3"
+
+_schema_ready = False
+
+
+def _db():
+    global _schema_ready
+    conn = connect(FAILURES_DB)
+    if not _schema_ready:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS thumb_failures (
+                path TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                error TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                failed_at REAL NOT NULL,
+                PRIMARY KEY (path, kind)
+            );
+            CREATE INDEX IF NOT EXISTS thumb_failures_at ON thumb_failures(failed_at);
+            """
+        )
+        _schema_ready = True
+    return conn
+
+
+def lookup(fpath: Path, kind: str) -> Optional[str]:
+    """
+    Why the last attempt at a thumbnail of fpath failed, if it failed on the file's
+    current version within THUMB_FAILURE_TTL; kind is "image" or "video".
+    """
+    try:
+        st = stat_cache.stat(fpath)
+        row = _db().execute(
+            "SELECT reason FROM thumb_failures "
+            "WHERE path = ? AND kind = ? AND mtime_ns = ? AND size = ? AND failed_at > ?",
+            (str(fpath), kind, st.st_mtime_ns, st.st_size, time.time() - THUMB_FAILURE_TTL),
+        ).fetchone()
+    except (OSError, sqlite3.Error):
+        return None
+    return row[0] if row else None
+
+
+def record(fpath: Path, kind: str, err: Exception) -> None:
+    """
+    Remembers that generating a thumbnail of fpath raised err. Expired entries are
+    dropped on the way.
+    """
+    error = type(err).__name__
+    lines = str(err).strip().splitlines()
+    reason = f"{error}: {lines[0][:200]}" if lines else error
+    THUMB_FAILURES.inc(1, kind, error)
+    try:
+        st = stat_cache.stat(fpath)
+        now = time.time()
+        conn = _db()
+        conn.execute(
+            "INSERT OR REPLACE INTO thumb_failures"
+            "(path, kind, mtime_ns, size, error, reason, failed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(fpath), kind, st.st_mtime_ns, st.st_size, error, reason, now),
+        )
+        conn.execute("DELETE FROM thumb_failures WHERE failed_at <= ?", (now - THUMB_FAILURE_TTL,))
+        conn.commit()
+    except (OSError, sqlite3.Error):
+        pass
+
+
+def recent(limit: int = 500) -> List[dict]:
+    """
+    Unexpired failures, newest first.
+    """
+    try:
+        rows = _db().execute(
+            "SELECT path, kind, error, reason, failed_at FROM thumb_failures "
+            "WHERE failed_at > ? ORDER BY failed_at DESC LIMIT ?",
+            (time.time() - THUMB_FAILURE_TTL, limit),
+        ).fetchall()
+    except sqlite3.Error:
+        return []
+    return [
+        {"path": p, "kind": k, "error": e, "reason": r, "failed_at": round(t, 3)}
+        for p, k, e, r, t in rows
+    ]
@@ -0,0 +1,196 @@
+import heapq
+import itertools
+import select
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import request
+
+from config import THUMB_WORKERS
+from media_utils import Cancelled
+from metrics import THUMB_JOBS, THUMB_QUEUE_DEPTH
+from tracing import Trace, add_stages, attached, current_trace
+
+# Shared, bounded pool for thumbnail generation. Request jobs run newest first (with
+# lazy-loaded grids, the latest requests are the tiles currently on screen); warm-up
+# jobs only run when no request is waiting. A job is cancelled once every request
+# waiting on it has disconnected, which also kills a running ffmpeg child.
+
+PRIORITY_REQUEST = 0
+PRIORITY_BACKGROUND = 1
+
+MAX_BACKGROUND_PENDING = 40000
+
+Work = Callable[[threading.Event], Path]  # returns the cached thumbnail
+
+
+class ThumbJob:
+    def __init__(self, key: str, work: Work, background: bool) -> None:
+        self.key = key
+        self.work = work
+        self.background = background
+        self.waiters = 0
+        self.cancel = threading.Event()
+        self.done = threading.Event()
+        self.result: Optional[Path] = None
+        self.error: Optional[BaseException] = None
+        self.queued = False
+        # the request trace that generation spans are recorded in (none for warm-up)
+        self.trace: Optional[Trace] = None if background else current_trace()
+        self.submitted = time.perf_counter()
+        # bumped on re-prioritisation; stale heap entries are skipped
+        self.stamp = 0
+
+
+_heap: List[Tuple[int, int, int, ThumbJob]] = []  # (priority, -seq, stamp, job)
+_jobs: Dict[str, ThumbJob] = {}  # pending or running, by cache key
+_seq = itertools.count()
+_cond = threading.Condition()
+_background_pending = 0
+_started = False
+
+
+def _push(job: ThumbJob, priority: int) -> None:
+    job.stamp += 1
+    job.queued = True
+    heapq.heappush(_heap, (priority, -next(_seq), job.stamp, job))
+    _cond.notify()
+
+
+def _pop() -> ThumbJob:
+    global _background_pending
+    with _cond:
+        while True:
+            while not _heap:
+                _cond.wait()
+            priority, _neg_seq, stamp, job = heapq.heappop(_heap)
+            if stamp != job.stamp:
+                continue
+            job.queued = False
+            if priority == PRIORITY_BACKGROUND:
+                _background_pending -= 1
+            THUMB_QUEUE_DEPTH.dec()
+            return job
+
+
+def _worker() -> None:
+    while True:
+        job = _pop()
+        try:
+            if job.cancel.is_set():
+                raise Cancelled()
+            with attached(job.trace):
+                add_stages("queue", {"wait": time.perf_counter() - job.submitted})
+                job.result = job.work(job.cancel)
+            THUMB_JOBS.inc(1, "done")
+        except Cancelled as e:
+            job.error = e
+            THUMB_JOBS.inc(1, "cancelled")
+        except Exception as e:
+            job.error = e
+            THUMB_JOBS.inc(1, "error")
+        finally:
+            with _cond:
+                if _jobs.get(job.key) is job:
+                    del _jobs[job.key]
+            job.done.set()
+
+
+def _ensure_workers() -> None:
+    global _started
+    if _started:
+        return
+    with _cond:
+        if _started:
+            return
+        for i in range(THUMB_WORKERS):
+            threading.Thread(target=_worker, name=f"thumb-worker-{i}", daemon=True).start()
+        _started = True
+
+
+def submit(key: str, work: Work) -> ThumbJob:
+    """
+    Queues work for the current request (newest first), or joins the pending/running
+    job for the same cache key, moving it ahead of warm-up work.
+    """
+    global _background_pending
+    _ensure_workers()
+    with _cond:
+        job = _jobs.get(key)
+        if job is None or job.cancel.is_set():
+            job = _jobs[key] = ThumbJob(key, work, background=False)
+            THUMB_QUEUE_DEPTH.inc()
+            _push(job, PRIORITY_REQUEST)
+        else:
+            THUMB_JOBS.inc(1, "joined")
+            if job.background:
+                job.background = False
+                if job.queued:
+                    _background_pending -= 1
+                    _push(job, PRIORITY_REQUEST)
+        job.waiters += 1
+    return job
+
+
+def submit_background(key: str, work: Work) -> bool:
+    """
+    Queues warm-up work behind every request job. Never cancelled; dropped (returns
+    False) when the backlog is full or the key is already queued.
+    """
+    global _background_pending
+    _ensure_workers()
+    with _cond:
+        if key in _jobs or _background_pending >= MAX_BACKGROUND_PENDING:
+            return False
+        job = _jobs[key] = ThumbJob(key, work, background=True)
+        _background_pending += 1
+        THUMB_QUEUE_DEPTH.inc()
+        _push(job, PRIORITY_BACKGROUND)
+    return True
+
+
+def _release(job: ThumbJob) -> None:
+    with _cond:
+        job.waiters -= 1
+        if job.waiters <= 0 and not job.background:
+            job.cancel.set()
+
+
+def client_connected() -> bool:
+    """
+    Best-effort check that the client of the current request is still there: a closed
+    connection polls readable with nothing to read. Unknown servers count as connected.
+    """
+    sock = request.environ.get("werkzeug.socket")
+    if sock is None:
+        return True
+    try:
+        readable, _w, _x = select.select([sock], [], [], 0)
+        if not readable:
+            return True
+        return sock.recv(1, socket.MSG_PEEK) != b""
+    except ValueError:
+        # TLS sockets refuse MSG_PEEK
+        return True
+    except OSError:
+        return False
+
+
+def wait(job: ThumbJob, poll_seconds: float = 0.25) -> Path:
+    """
+    Blocks until job finishes and returns its result, re-raising its error. Raises
+    Cancelled if the client went away first.
+    """
+    try:
+        while not job.done.wait(poll_seconds):
+            if not client_connected():
+                raise Cancelled()
+    finally:
+        _release(job)
+    if job.error is not None:
+        raise job.error
+    assert job.result is not None
+    return job.result
@@ -0,0 +1,200 @@
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from flask import g, request
+
+from config import TRACE_DIR, TRACE_MAX_FILES, TRACE_SLOW_LOG, TRACE_SLOW_MS, app
+
+# Opt-in per-request tracing. Code marks the phases of a request with
+# `with span("name"):`, which is a no-op unless the request is traced. Requests slower
+# than TRACE_SLOW_MS go to the slow-request log as one JSON line with their phase
+# breakdown (TRACE_SLOW_LOG, or stdout). With TRACE_DIR set, each one is also saved as
+# a Chrome trace-event file (Perfetto, chrome://tracing), so breakdowns from different
+# deployments can be compared side by side. Traced responses carry a Server-Timing
+# header with the same breakdown, which browser devtools display per request.
+
+TRACING_ENABLED = TRACE_SLOW_MS > 0 or TRACE_DIR is not None
+
+_MAX_SERVER_TIMING = 20  # phases listed in the Server-Timing header
+
+_seq = itertools.count(1)
+_log_lock = threading.Lock()
+
+# (name, start offset in seconds, duration in seconds, thread name, attributes)
+Span = Tuple[str, float, float, str, Dict[str, object]]
+
+
+class Trace:
+    def __init__(self, name: str) -> None:
+        self.trace_id = os.urandom(16).hex()
+        self.name = name
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.status = "500"
+        self.spans: List[Span] = []  # appended from any thread (thumb workers)
+
+    def phases(self) -> Dict[str, Tuple[float, int]]:
+        """
+        Total seconds and count per span name, in order of first appearance.
+        """
+        out: Dict[str, Tuple[float, int]] = {}
+        for name, _start, dur, _thread, _attrs in self.spans:
+            total, n = out.get(name, (0.0, 0))
+            out[name] = (total + dur, n + 1)
+        return out
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def attached(trace: Optional[Trace]) -> Iterator[None]:
+    """
+    Records spans in trace while the block runs, e.g. on a worker thread doing work
+    for a request.
+    """
+    token = _current.set(trace)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs: object) -> Iterator[None]:
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        t1 = time.perf_counter()
+        trace.spans.append((name, t0 - trace.t0, t1 - t0, threading.current_thread().name, attrs))
+
+
+def add_stages(prefix: str, timings: Dict[str, float]) -> None:
+    """
+    Stage timings measured elsewhere (e.g. in an image worker process), recorded as
+    consecutive spans that end now.
+    """
+    trace = _current.get()
+    if trace is None or not timings:
+        return
+    start = time.perf_counter() - trace.t0 - sum(timings.values())
+    thread = threading.current_thread().name
+    for stage, seconds in timings.items():
+        trace.spans.append((f"{prefix}.{stage}", start, seconds, thread, {}))
+        start += seconds
+
+
+def _start_trace() -> None:
+    g._trace_token = _current.set(Trace(request.endpoint or "unmatched"))
+
+
+def _tag_response(response):
+    trace = _current.get()
+    if trace is not None:
+        trace.status = str(response.status_code)
+        timing = [
+            f'{i};dur={total * 1000:.1f};desc="{name}"'
+            for i, (name, (total, _n)) in enumerate(list(trace.phases().items())[:_MAX_SERVER_TIMING])
+        ]
+        if timing:
+            response.headers["Server-Timing"] = ", ".join(timing)
+        response.headers["X-Trace-Id"] = trace.trace_id
+    return response
+
+
+def _write_slow_log(record: dict) -> None:
+    line = json.dumps(record, ensure_ascii=False)
+    if not TRACE_SLOW_LOG:
+        print(line, flush=True)
+        return
+    with _log_lock, open(TRACE_SLOW_LOG, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def _chrome_trace(trace: Trace, total: float, meta: dict) -> dict:
+    """
+    Chrome trace-event format: one complete ("X") event per span, one row per thread.
+    """
+    tids: Dict[str, int] = {}
+    events = [{"name": trace.name, "ph": "X", "pid": 1, "tid": 0, "ts": 0, "dur": total * 1e6, "args": meta}]
+    for name, start, dur, thread, attrs in trace.spans:
+        tid = tids.setdefault(thread, len(tids) + 1)
+        events.append(
+            {"name": name, "ph": "X", "pid": 1, "tid": tid, "ts": start * 1e6, "dur": dur * 1e6, "args": attrs}
+        )
+    for thread, tid in [("request", 0)] + list(tids.items()):
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread}})
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": trace.trace_id}}
+
+
+def _prune_traces() -> None:
+    files = sorted(TRACE_DIR.glob("*.trace.json"), key=lambda f: f.stat().st_mtime)
+    for old in files[: max(0, len(files) - TRACE_MAX_FILES)]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+def _finish_trace(_exc) -> None:
+    token = g.pop("_trace_token", None)
+    if token is None:
+        return
+    trace = _current.get()
+    _current.reset(token)
+    if trace is None:
+        return
+    total = time.perf_counter() - trace.t0
+    if total * 1000 < TRACE_SLOW_MS:
+        return
+
+    meta = {
+        "method": request.method,
+        "path": request.path,  # never the query string: it holds the token
+        "status": trace.status,
+    }
+    if TRACE_SLOW_MS > 0:
+        _write_slow_log(
+            {
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(trace.started)),
+                "trace_id": trace.trace_id,
+                "endpoint": trace.name,
+                **meta,
+                "ms": round(total * 1000, 1),
+                "phases": {
+                    name: {"ms": round(t * 1000, 1), "n": n} for name, (t, n) in trace.phases().items()
+                },
+            }
+        )
+    if TRACE_DIR is not None:
+        try:
+            TRACE_DIR.mkdir(parents=True, exist_ok=True)
+            stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{next(_seq):06d}_{trace.name}_{int(total * 1000)}ms"
+            (TRACE_DIR / f"{stem}.trace.json").write_text(json.dumps(_chrome_trace(trace, total, meta)))
+            _prune_traces()
+        except OSError as e:
+            print(f"Could not write request trace: {e}")
+
+
+if TRACING_ENABLED:
+    app.before_request(_start_trace)
+    app.after_request(_tag_response)
+    app.teardown_request(_finish_trace)
@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Dict, Iterable, Iterator
+
+from flask import request
+
+from config import (
+    RATE_LIMIT_BURST_BYTES,
+    RATE_LIMIT_CLIENT_MBPS,
+    RATE_LIMIT_GLOBAL_MBPS,
+    RATE_LIMIT_MIN_BYTES,
+    app,
+)
+
+# Bandwidth fair-share for the file-streaming routes. Every client (remote address)
+# has a token bucket refilled at
+#     min(RATE_LIMIT_CLIENT_MBPS, RATE_LIMIT_GLOBAL_MBPS / clients currently streaming)
+# so concurrent clients split the global budget evenly and one client's parallel
+# streams share that client's share. Responses smaller than RATE_LIMIT_MIN_BYTES, and
+# everything outside THROTTLED_ENDPOINTS (pages, thumbnails), are never delayed:
+# keeping the global cap below the uplink leaves them the remaining headroom.
+
+THROTTLED_ENDPOINTS = {"download", "download_zip", "raw"}
+
+_GLOBAL_BPS = RATE_LIMIT_GLOBAL_MBPS * 1024 * 1024
+_CLIENT_BPS = RATE_LIMIT_CLIENT_MBPS * 1024 * 1024
+SCHEDULER_ENABLED = _GLOBAL_BPS > 0 or _CLIENT_BPS > 0
+
+
+class _ClientBucket:
+    def __init__(self) -> None:
+        self.tokens = float(RATE_LIMIT_BURST_BYTES)
+        self.stamp = time.monotonic()
+        self.streams = 0
+        self.lock = threading.Lock()
+
+
+_clients: Dict[str, _ClientBucket] = {}
+_clients_lock = threading.Lock()
+
+
+def _client_rate() -> float:
+    rates = []
+    if _CLIENT_BPS > 0:
+        rates.append(_CLIENT_BPS)
+    if _GLOBAL_BPS > 0:
+        rates.append(_GLOBAL_BPS / max(1, len(_clients)))
+    return min(rates)
+
+
+def _acquire(bucket: _ClientBucket, nbytes: int) -> None:
+    """
+    Takes nbytes from the bucket, sleeping off any debt at the client's current rate.
+    """
+    with bucket.lock:
+        rate = _client_rate()
+        now = time.monotonic()
+        bucket.tokens = min(RATE_LIMIT_BURST_BYTES, bucket.tokens + (now - bucket.stamp) * rate)
+        bucket.stamp = now
+        bucket.tokens -= nbytes
+        debt = -bucket.tokens
+    if debt > 0:
+        time.sleep(debt / rate)
+
+
+def _open_stream(client: str) -> _ClientBucket:
+    with _clients_lock:
+        bucket = _clients.get(client)
+        if bucket is None:
+            bucket = _clients[client] = _ClientBucket()
+        bucket.streams += 1
+        return bucket
+
+
+def _close_stream(client: str, bucket: _ClientBucket) -> None:
+    with _clients_lock:
+        bucket.streams -= 1
+        if bucket.streams <= 0:
+            _clients.pop(client, None)
+
+
+def throttled(chunks: Iterable[bytes], client: str) -> Iterator[bytes]:
+    bucket = _open_stream(client)
+    try:
+        for chunk in chunks:
+            _acquire(bucket, len(chunk))
+            yield chunk
+    finally:
+        _close_stream(client, bucket)
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def active_clients() -> int:
+    return len(_clients)
+
+
+def _throttle_response(response):
+    if request.endpoint not in THROTTLED_ENDPOINTS or not response.is_streamed:
+        return response
+    length = response.content_length
+    if length is not None and length < RATE_LIMIT_MIN_BYTES:
+        return response
+    response.response = throttled(response.response, request.remote_addr or "unknown")
+    return response
+
+
+if SCHEDULER_ENABLED:
+    app.after_request(_throttle_response)
@@ -0,0 +1,210 @@
+import shutil
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import stat_cache
+from config import FFPROBE_BIN, INDEX_DIR
+from db_utils import connect
+from dir_cache import ListingEntry, list_dir
+from folder_queue import FolderQueue
+from media_utils import ffprobe_video_info, format_duration, is_video
+
+# ffprobe results per video, keyed by (path, mtime_ns, size) so edited files are
+# probed again. Filled per folder by a background pass when browse() shows videos
+# that are not in the store yet, and on demand by vthumb generation. A file ffprobe
+# cannot read is stored with empty fields so it is not probed on every page view.
+VIDEO_META_DB = INDEX_DIR / "video_meta.sqlite3"
+
+
+class VideoMeta(NamedTuple):
+    duration: Optional[float]
+    codec: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+    bitrate: Optional[int]
+    rotation: int
+
+    def describe(self) -> str:
+        """
+        Short summary for the views, e.g. "1:23 • 1080×1920 • h264 • 8.1 Mbit/s".
+        """
+        parts = []
+        if self.duration:
+            parts.append(format_duration(self.duration))
+        if self.width and self.height:
+            w, h = (self.height, self.width) if self.rotation in (90, 270) else (self.width, self.height)
+            parts.append(f"{w}×{h}")
+        if self.codec:
+            parts.append(self.codec)
+        if self.bitrate:
+            parts.append(f"{self.bitrate / 1e6:.1f} Mbit/s")
+        return " • ".join(parts)
+
+
+_COLUMNS = "duration, codec, width, height, bitrate, rotation"
+
+_schema_ready = False
+
+
+def _db():
+    global _schema_ready
+    conn = connect(VIDEO_META_DB)
+    if not _schema_ready:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS video_meta (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                duration REAL,
+                codec TEXT,
+                width INTEGER,
+                height INTEGER,
+                bitrate INTEGER,
+                rotation INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS video_meta_parent ON video_meta(parent);
+            """
+        )
+        _schema_ready = True
+    return conn
+
+
+@lru_cache(maxsize=None)
+def _ffprobe_ok() -> bool:
+    return bool(FFPROBE_BIN) and shutil.which(FFPROBE_BIN) is not None
+
+
+def _store(rows: Iterable[tuple]) -> None:
+    try:
+        conn = _db()
+        conn.executemany(
+            f"INSERT OR REPLACE INTO video_meta(path, parent, mtime_ns, size, {_COLUMNS}) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+    except sqlite3.Error:
+        pass
+
+
+def _row(fpath: Path, mtime_ns: int, size: int, info: Optional[dict]) -> tuple:
+    info = info or {}
+    return (
+        str(fpath),
+        str(fpath.parent),
+        mtime_ns,
+        size,
+        info.get("duration"),
+        info.get("codec"),
+        info.get("width"),
+        info.get("height"),
+        info.get("bitrate"),
+        info.get("rotation", 0),
+    )
+
+
+def lookup(fpath: Path) -> Optional[VideoMeta]:
+    """
+    Stored metadata for fpath if it matches the file's current mtime and size.
+    """
+    try:
+        st = stat_cache.stat(fpath)
+        row = _db().execute(
+            f"SELECT {_COLUMNS} FROM video_meta WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (str(fpath), st.st_mtime_ns, st.st_size),
+        ).fetchone()
+    except (OSError, sqlite3.Error):
+        return None
+    return VideoMeta(*row) if row else None
+
+
+def ensure(fpath: Path, cancel: Optional[threading.Event] = None) -> Optional[VideoMeta]:
+    """
+    Stored metadata for fpath, probing (and storing) it first if needed. A file ffprobe
+    cannot read gets empty fields, so it is not probed again until it changes. None only
+    when ffprobe is not installed.
+    """
+    meta = lookup(fpath)
+    if meta is not None or not _ffprobe_ok():
+        return meta
+    st = stat_cache.stat(fpath)
+    row = _row(fpath, st.st_mtime_ns, st.st_size, ffprobe_video_info(fpath, cancel))
+    _store([row])
+    return VideoMeta(*row[4:])
+
+
+def folder_meta(folder: Path, entries: List[ListingEntry]) -> Dict[str, VideoMeta]:
+    """
+    Stored metadata for the videos among a folder's listing entries, by name.
+    Videos missing from the store (or changed since) are probed in the background.
+    """
+    try:
+        rows = _db().execute(
+            f"SELECT path, mtime_ns, size, {_COLUMNS} FROM video_meta WHERE parent = ?",
+            (str(folder),),
+        ).fetchall()
+    except sqlite3.Error:
+        return {}
+    stored = {Path(r[0]).name: r for r in rows}
+
+    out: Dict[str, VideoMeta] = {}
+    missing = False
+    for e in entries:
+        if e.is_dir or not is_video(Path(e.name)):
+            continue
+        r = stored.get(e.name)
+        if r is not None and r[1] == e.mtime_ns and r[2] == e.size:
+            out[e.name] = VideoMeta(*r[3:])
+        else:
+            missing = True
+    if missing:
+        queue_folder(folder)
+    return out
+
+
+def _stored_keys(folder: Path) -> Dict[str, tuple]:
+    try:
+        rows = _db().execute(
+            "SELECT path, mtime_ns, size FROM video_meta WHERE parent = ?", (str(folder),)
+        ).fetchall()
+    except sqlite3.Error:
+        return {}
+    return {Path(p).name: (m, s) for p, m, s in rows}
+
+
+def _probe_folder(folder: Path) -> None:
+    """
+    One batched pass: probes every video in folder that is not stored yet and writes
+    the results in a single transaction.
+    """
+    try:
+        entries = list_dir(folder)
+    except OSError:
+        return
+    known = _stored_keys(folder)
+    rows = []
+    for e in entries:
+        if e.is_dir or not is_video(Path(e.name)):
+            continue
+        if known.get(e.name) == (e.mtime_ns, e.size):
+            continue
+        fpath = folder / e.name
+        rows.append(_row(fpath, e.mtime_ns, e.size, ffprobe_video_info(fpath)))
+    if rows:
+        _store(rows)
+
+
+_passes = FolderQueue("video-meta", _probe_folder)
+
+
+def queue_folder(folder: Path) -> None:
+    """
+    Schedules a background metadata pass over folder.
+    """
+    if _ffprobe_ok():
+        _passes.put(folder)
@@ -0,0 +1,206 @@
+"""
+Offline thumbnail warm-up: generates every standard thumbnail size for the media below
+ROOT_DIR (or a folder inside it) into THUMB_CACHE_DIR, so the first visitors after a
+deploy or a cache wipe do not pay the cold cost.
+
+    python warm_thumbs.py
+    python warm_thumbs.py Photos/2023 --workers 2 --max-mbps 40
+
+Uses the server's cache keys and image worker processes, skips files that are cached
+already and records finished folders in a checkpoint, so an interrupted run resumes
+where it stopped (--restart starts over). Can run while the server is up.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Set, Tuple
+
+GENERATED, CACHED, FAILED = "generated", "cached", "failed"
+
+
+class _Pacer:
+    """
+    Spaces out reads so that source data is consumed at no more than rate bytes/s.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, nbytes: int) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + nbytes / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class _Progress:
+    def __init__(self, every: float) -> None:
+        self.t0 = time.monotonic()
+        self.every = every
+        self.next = self.t0 + every
+        self.counts = {GENERATED: 0, CACHED: 0, FAILED: 0}
+        self.bytes_read = 0
+
+    def add(self, outcome: str, nbytes: int) -> None:
+        self.counts[outcome] += 1
+        if outcome == GENERATED:
+            self.bytes_read += nbytes
+        if self.every > 0 and time.monotonic() >= self.next:
+            self.next += self.every
+            self.report()
+
+    def report(self, prefix: str = "") -> None:
+        dt = max(time.monotonic() - self.t0, 1e-9)
+        c = self.counts
+        print(
+            f"{prefix}{c[GENERATED]} generated, {c[CACHED]} already cached, {c[FAILED]} failed"
+            f" | {c[GENERATED] / dt:.1f} files/s, {self.bytes_read / dt / 1e6:.1f} MB/s read,"
+            f" {dt:.0f}s",
+            flush=True,
+        )
+
+
+def _load_checkpoint(path: Path, root: Path, restart: bool) -> Set[str]:
+    """
+    Folders finished by an earlier run over the same ROOT_DIR; (re)starts the file
+    otherwise.
+    """
+    header = f"# root={root}"
+    if not restart and path.exists():
+        lines = path.read_text(encoding="utf-8").splitlines()
+        if lines and lines[0] == header:
+            return set(lines[1:])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(header + "\n", encoding="utf-8")
+    return set()
+
+
+def _parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Generate thumbnails ahead of time")
+    ap.add_argument("folder", nargs="?", default="", help="folder below ROOT_DIR (default: all of it)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="files processed at once")
+    ap.add_argument("--nice", type=int, default=10, help="lower the CPU priority by this much (POSIX)")
+    ap.add_argument("--max-mbps", type=float, default=0, help="cap on source data read, MB/s (0 = no cap)")
+    ap.add_argument("--no-videos", action="store_true", help="images only")
+    ap.add_argument("--checkpoint", type=Path, help="default: INDEX_DIR/warm_thumbs.checkpoint")
+    ap.add_argument("--restart", action="store_true", help="ignore the checkpoint of an earlier run")
+    ap.add_argument("--report-every", type=float, default=5.0, help="seconds between progress lines")
+    return ap.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    workers = max(1, args.workers)
+    # config.py reads the environment at import time
+    os.environ["IMAGE_WORKERS"] = str(workers)
+    if args.nice and hasattr(os, "nice"):
+        os.nice(args.nice)  # inherited by the image worker processes and ffmpeg
+
+    import thumb_failures
+    from config import INDEX_DIR, root_path
+    from fs_walk import walk_tree
+    from image_pool import warm_image_pool
+    from media_utils import ffmpeg_exists, is_image, is_video
+    from thumb_cache import WARM_SIZES, cached_thumb_path, ensure_thumb_cache_dir, generate_and_store
+
+    start = (root_path / args.folder).resolve()
+    try:
+        start_rel = start.relative_to(root_path).as_posix()
+    except ValueError:
+        sys.exit(f"{args.folder} is not inside ROOT_DIR ({root_path})")
+    start_rel = "" if start_rel == "." else start_rel
+    if not start.is_dir():
+        sys.exit(f"Not a folder: {start}")
+
+    videos = not args.no_videos and ffmpeg_exists()
+    if not args.no_videos and not videos:
+        print("ffmpeg not found: skipping videos")
+
+    checkpoint = args.checkpoint or INDEX_DIR / "warm_thumbs.checkpoint"
+    done_folders = _load_checkpoint(checkpoint, root_path, args.restart)
+    if done_folders:
+        print(f"Resuming: {len(done_folders)} folders already done ({checkpoint})")
+
+    ensure_thumb_cache_dir()
+    warm_image_pool()
+    pacer = _Pacer(args.max_mbps * 1e6)
+    progress = _Progress(args.report_every)
+
+    def warm(fpath: Path, video: bool, nbytes: int) -> str:
+        try:
+            missing = [s for s in WARM_SIZES if not cached_thumb_path(fpath, s, video).exists()]
+        except OSError:
+            return FAILED
+        if not missing:
+            return CACHED
+        if thumb_failures.lookup(fpath, "video" if video else "image"):
+            return FAILED
+        pacer.take(nbytes)
+        size = max(missing)  # the pyramid writes the smaller ones from the same decode
+        try:
+            generate_and_store(fpath, size, cached_thumb_path(fpath, size, video), video)
+        except Exception:
+            return FAILED
+        return GENERATED
+
+    remaining: Dict[str, int] = {}  # folder -> files still in flight
+    in_flight: Dict[Future, Tuple[str, int]] = {}
+
+    with checkpoint.open("a", encoding="utf-8") as ckpt:
+
+        def finish_folder(rel: str) -> None:
+            ckpt.write(rel + "\n")
+            ckpt.flush()
+
+        def collect() -> None:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for fut in done:
+                rel, nbytes = in_flight.pop(fut)
+                progress.add(fut.result(), nbytes)
+                remaining[rel] -= 1
+                if not remaining[rel]:
+                    del remaining[rel]
+                    finish_folder(rel)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warm") as pool:
+            try:
+                for scan in walk_tree(root_path, start_rel):
+                    if scan.rel in done_folders:
+                        continue  # its subfolders are still visited
+                    media = []
+                    for e in scan.entries or []:
+                        video = is_video(Path(e.name))
+                        if not e.is_dir and ((video and videos) or (not video and is_image(Path(e.name)))):
+                            media.append((root_path / scan.rel / e.name, video, e.size))
+                    if not media:
+                        finish_folder(scan.rel)
+                        continue
+                    remaining[scan.rel] = len(media)
+                    for fpath, video, nbytes in media:
+                        while len(in_flight) >= 2 * workers:
+                            collect()
+                        in_flight[pool.submit(warm, fpath, video, nbytes)] = (scan.rel, nbytes)
+                while in_flight:
+                    collect()
+            except KeyboardInterrupt:
+                for fut in in_flight:
+                    fut.cancel()
+                progress.report("Interrupted: ")
+                print(f"Run again to resume ({checkpoint})")
+                sys.exit(130)
+
+    progress.report("Done: ")
+
+
+if __name__ == "__main__":
+    main()